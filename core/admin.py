@@ -3,7 +3,8 @@
 from django.contrib import admin
 from django.template.response import TemplateResponse
 from django.urls import path
-from .models import Product, Category, Brand, Notification, PushSubscription
+from .models import Product, Category, Brand, Lot, StockMovement, ProductForecast, Notification, PushSubscription, TaskRun
+from . import db_router, lookup_cache
 from import_export import resources, fields, widgets
 from import_export.admin import ImportExportModelAdmin
 from import_export.widgets import ForeignKeyWidget
@@ -20,8 +21,18 @@ class PermissiveDateWidget(widgets.DateWidget):
 
 # --- WIDGET DE CHAVE ESTRANGEIRA QUE FUNCIONA ---
 class CreateOrGetForeignKeyWidget(ForeignKeyWidget):
+    def __init__(self, model, field='pk', lookup=None, *args, **kwargs):
+        # lookup: cache local nome -> id (core.lookup_cache), evita um SELECT por linha
+        self.lookup = lookup
+        super().__init__(model, field, *args, **kwargs)
+
     def clean(self, value, row=None, *args, **kwargs):
         if not value: return None
+        if self.lookup is not None:
+            pk = self.lookup.id_for(value)
+            if pk is not None:
+                return self.model(pk=pk, **{self.field: value})
+            return self.model.objects.get_or_create(**{self.field: value})[0]
         try:
             return super().clean(value, row, *args, **kwargs)
         except self.model.DoesNotExist:
@@ -33,17 +44,25 @@ class ProductResource(resources.ModelResource):
     category = fields.Field(
         column_name='Categoria',
         attribute='category',
-        widget=CreateOrGetForeignKeyWidget(Category, 'name'))
+        widget=CreateOrGetForeignKeyWidget(Category, 'name', lookup=lookup_cache.categories))
     
     brand = fields.Field(
         column_name='Marca',
         attribute='brand',
-        widget=CreateOrGetForeignKeyWidget(Brand, 'name'))
+        widget=CreateOrGetForeignKeyWidget(Brand, 'name', lookup=lookup_cache.brands))
+
+    def after_import(self, dataset, result, **kwargs):
+        super().after_import(dataset, result, **kwargs)
+        # Prévia (dry run) ou importação com erro: a transação será desfeita, e com ela
+        # as categorias/marcas criadas nas linhas; descarta os mapas nome -> id
+        if kwargs.get('dry_run') or result.has_errors() or result.has_validation_errors():
+            lookup_cache.categories.clear()
+            lookup_cache.brands.clear()
 
     class Meta:
         model = Product
         # Usamos esta lista para definir os campos e a ordem
-        fields = ('id', 'name', 'category', 'brand', 'price', 'description', 'expiration_date', 'quantity', 'batch')
+        fields = ('id', 'name', 'category', 'brand', 'price', 'description', 'expiration_date', 'quantity', 'batch', 'sku')
         export_order = fields
         import_id_fields = ('id',)
         skip_unchanged = True
@@ -57,6 +76,7 @@ class ProductResource(resources.ModelResource):
                 'Validade': 'expiration_date',
                 'Quantidade em Estoque': 'quantity',
                 'Lote': 'batch',
+                'Código de Barras': 'sku',
             }
             new_headers = []
             for header in dataset.headers:
@@ -69,19 +89,70 @@ class BrandAdmin(admin.ModelAdmin):
     list_display = ('name',)
     search_fields = ('name',)
 
+class LotInline(admin.TabularInline):
+    model = Lot
+    fields = ('code', 'expiration_date', 'quantity')
+    extra = 0
+
 @admin.register(Product)
 class ProductAdmin(ImportExportModelAdmin, admin.ModelAdmin):
     resource_class = ProductResource
     list_display = ('id', 'name', 'category', 'brand', 'price', 'quantity', 'expiration_date')
-    search_fields = ('name', 'description', 'brand__name')
-    list_filter = ('category', 'brand', 'expiration_date')
+    search_fields = ('name', 'description', 'brand__name', '=sku')
+    list_filter = ('category', 'brand', 'expiration_date', 'is_low_stock')
     ordering = ('-id',)
     list_per_page = 20
     autocomplete_fields = ['category', 'brand']
+    inlines = [LotInline]
+
+    def get_readonly_fields(self, request, obj=None):
+        # Com lotes, quantidade e validade são calculadas a partir deles (core.inventory)
+        if obj is not None and obj.lots.exists():
+            return ('quantity', 'expiration_date')
+        return ()
+
+    def get_export_data(self, file_format, request, queryset, **kwargs):
+        # A exportação só lê: roda na réplica do banco (core.db_router)
+        with db_router.use_replica():
+            return super().get_export_data(file_format, request, queryset, **kwargs)
+
+@admin.register(Lot)
+class LotAdmin(admin.ModelAdmin):
+    list_display = ('product', 'code', 'expiration_date', 'quantity', 'updated_at')
+    list_filter = ('expiration_date',)
+    search_fields = ('code', 'product__name')
+    ordering = ('product', 'expiration_date')
+    list_per_page = 20
+    autocomplete_fields = ['product']
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    """Admin somente leitura para o histórico de movimentações"""
+    list_display = ('product', 'delta', 'quantity_after', 'reason', 'created_at')
+    list_filter = ('reason', 'created_at')
+    search_fields = ('product__name',)
+    readonly_fields = ('product', 'delta', 'quantity_after', 'reason', 'created_at')
+    ordering = ('-created_at',)
+    list_per_page = 20
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(ProductForecast)
+class ProductForecastAdmin(admin.ModelAdmin):
+    """Admin somente leitura para as previsões de estoque (recalculadas pelas tasks)"""
+    list_display = ('product', 'daily_rate', 'days_of_stock', 'stockout_date', 'expected_waste', 'waste_value', 'computed_at')
+    search_fields = ('product__name',)
+    readonly_fields = ('product', 'daily_rate', 'days_of_stock', 'stockout_date', 'expected_waste', 'waste_value', 'computed_at')
+    ordering = ('stockout_date',)
+    list_per_page = 20
+
+    def has_add_permission(self, request):
+        return False
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ('name',)
+    list_display = ('name', 'reorder_level')
     search_fields = ('name',)
 
 
@@ -159,6 +230,21 @@ class PushSubscriptionAdmin(admin.ModelAdmin):
     delete_all_subscriptions.short_description = "🗑️ Deletar Subscriptions Selecionadas"
 
 
+
+@admin.register(TaskRun)
+class TaskRunAdmin(admin.ModelAdmin):
+    """Admin somente leitura para a telemetria das tasks"""
+    list_display = ('task_name', 'status', 'started_at', 'duration_ms', 'catalog_size')
+    list_filter = ('task_name', 'status', 'started_at')
+    search_fields = ('task_name', 'result')
+    readonly_fields = ('task_name', 'status', 'started_at', 'finished_at', 'duration_ms',
+                       'catalog_size', 'phases', 'counters', 'result')
+    ordering = ('-started_at',)
+    list_per_page = 20
+
+    def has_add_permission(self, request):
+        return False
+
 # Customização dos modelos do Django Q para tradução
 try:
     from django_q.models import Schedule, Failure, OrmQ, Success
@@ -13,6 +13,9 @@ class CoreConfig(AppConfig):
         Vamos forçar a tradução do nome do app 'django_q' aqui.
         Isso sobrescreve o nome na fonte, antes que o admin o leia.
         """
+        # Conecta os receivers de sinais (invalidação de caches)
+        from . import signals  # noqa: F401
+
         try:
             from django.apps import apps
             apps.get_app_config('django_q').verbose_name = 'Tarefas em Fila (Django Q)'
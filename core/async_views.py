@@ -0,0 +1,92 @@
+# core/async_views.py
+
+"""
+Versões assíncronas (ASGI) das views de leitura mais pesadas.
+
+Usam o ORM assíncrono do Django, então uma chamada lenta não prende um worker
+inteiro: um único processo uvicorn atende muitos clientes simultâneos
+(ex.: dashboards fazendo long-polling). A filtragem reaproveita exatamente
+as views síncronas de core.views, para que as duas versões retornem o mesmo JSON.
+
+Sirva com: gunicorn sistema_gestao.asgi:application -k uvicorn_worker.UvicornWorker
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotAllowed
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import expiry
+from .cache_utils import DASHBOARD_STATS_TIMEOUT, PRODUCTS, aversioned_key
+from .views import (
+    NotificationListCreateView,
+    ProductListCreateView,
+    _dashboard_querysets,
+    _dashboard_response_data,
+    _dashboard_units,
+)
+
+
+def _json_response(data):
+    """Renderiza com o renderer padrão do DRF (DEFAULT_RENDERER_CLASSES), o mesmo das views síncronas"""
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    return HttpResponse(renderer.render(data), content_type=renderer.media_type)
+
+
+def _bind_view(view_class, request):
+    """Instancia uma view DRF síncrona apenas para reaproveitar get_queryset/filtros"""
+    view = view_class()
+    # Com os autenticadores da view: request.user é o mesmo da versão síncrona
+    view.request = Request(request, authenticators=view.get_authenticators())
+    view.args = ()
+    view.kwargs = {}
+    view.format_kwarg = None
+    return view
+
+
+async def dashboard_stats(request):
+    """Versão assíncrona de core.views.dashboard_stats"""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    today = expiry.local_today()
+    # Mesma chave de cache da view síncrona (core.cache_utils.dashboard_stats_key)
+    key = await aversioned_key(PRODUCTS, 'dashboard_stats', today.isoformat())
+    counts = await cache.aget(key)
+    if counts is None:
+        counts = {}
+        for name, queryset in _dashboard_querysets(today).items():
+            counts[name] = await queryset.acount()
+        counts.update(await sync_to_async(_dashboard_units)(today))
+        await cache.aset(key, counts, DASHBOARD_STATS_TIMEOUT)
+    return _json_response(_dashboard_response_data(counts, today))
+
+
+async def product_list(request):
+    """Versão assíncrona (somente leitura) de ProductListCreateView"""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    view = _bind_view(ProductListCreateView, request)
+    # Os filtros podem validar IDs no banco (ex.: ?category=), então rodam em thread
+    queryset = await sync_to_async(view.filter_queryset)(view.get_queryset())
+    products = [product async for product in queryset]
+    # category_name vem de core.lookup_cache, que pode recarregar do banco: serializa em thread.
+    # get_serializer passa a requisição no contexto: o serializer usa os mesmos
+    # ?fields= / ?omit= do .only() aplicado pelo filter_queryset
+    data = await sync_to_async(lambda: view.get_serializer(products, many=True).data)()
+    return _json_response(data)
+
+
+async def notification_list(request):
+    """Versão assíncrona (somente leitura) de NotificationListCreateView"""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    view = _bind_view(NotificationListCreateView, request)
+    # A autenticação consulta sessão/usuário no banco: roda em thread antes do get_queryset
+    await sync_to_async(lambda: view.request.user)()
+    queryset = view.get_queryset().select_related('product')
+    notifications = [notification async for notification in queryset]
+    return _json_response(view.get_serializer(notifications, many=True).data)
@@ -0,0 +1,129 @@
+# core/barcode_cache.py
+
+"""
+Cache local (por processo) SKU/código de barras -> ID do produto, para os
+leitores do caixa e do recebimento.
+
+Guarda só o mapeamento (que quase nunca muda), não o produto: cada leitura
+busca as linhas por chave primária, então preço e estoque estão sempre
+atuais. Um lote de códigos vira no máximo duas consultas (códigos fora do
+cache por SKU e produtos por ID). Códigos inexistentes também ficam em cache,
+para que leituras repetidas de um código desconhecido não voltem ao banco.
+
+Invalidação (mesmo esquema de core.lookup_cache):
+- no próprio processo, os sinais de Product descartam o código antigo e o novo
+  (core.signals);
+- nos demais processos, o cache é esvaziado quando a versão do grupo SKUS muda
+  (core.cache_utils), consultada no máximo a cada CHECK_INTERVAL segundos.
+Mesmo um mapeamento desatualizado nunca devolve o produto errado: lookup()
+confere o SKU da linha lida e, se não bater, consulta de novo pelo código.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .cache_utils import SKUS, get_cache_version
+from .lookup_cache import CHECK_INTERVAL
+from .models import Product
+
+# Marca de "código sem produto" (None já é o retorno de um miss)
+_MISSING = 0
+
+
+class BarcodeCache:
+    """LRU código -> ID do produto, limitado a maxsize entradas"""
+
+    def __init__(self, maxsize=None):
+        self._maxsize = maxsize
+        self._entries = OrderedDict()
+        self._version = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    @property
+    def maxsize(self):
+        return self._maxsize or getattr(settings, 'BARCODE_CACHE_SIZE', 10000)
+
+    def lookup(self, codes, queryset=None):
+        """
+        Produtos dos códigos informados: {código: produto} (só os encontrados).
+
+        queryset: base para buscar as linhas (ex.: com .only()); padrão Product.objects.
+        """
+        queryset = queryset if queryset is not None else Product.objects.all()
+        codes = list(dict.fromkeys(code for code in codes if code))
+        ids = self.resolve(codes)
+
+        wanted = {pk for pk in ids.values() if pk}
+        rows = {product.pk: product for product in queryset.filter(pk__in=wanted)} if wanted else {}
+        found = {}
+        stale = []
+        for code in codes:
+            product = rows.get(ids.get(code))
+            if product is not None and product.sku == code:
+                found[code] = product
+            elif ids.get(code):
+                stale.append(code)
+
+        if stale:
+            # Mapeamento de outro processo ainda não invalidado: confere no banco
+            self.discard(*stale)
+            for product in queryset.filter(sku__in=stale):
+                found[product.sku] = product
+                self._store({product.sku: product.pk})
+        return found
+
+    def resolve(self, codes):
+        """IDs dos códigos: {código: id ou None}; os que faltam no cache vêm de uma consulta"""
+        self._check_version()
+        result, misses = {}, []
+        with self._lock:
+            for code in codes:
+                pk = self._entries.get(code)
+                if pk is None:
+                    misses.append(code)
+                else:
+                    self._entries.move_to_end(code)
+                    result[code] = pk or None
+
+        if misses:
+            rows = dict(Product.objects.filter(sku__in=misses).values_list('sku', 'pk'))
+            loaded = {code: rows.get(code, _MISSING) for code in misses}
+            self._store(loaded)
+            result.update({code: pk or None for code, pk in loaded.items()})
+        return result
+
+    def discard(self, *codes):
+        """Remove códigos deste processo (o SKU de um produto mudou)"""
+        with self._lock:
+            for code in codes:
+                self._entries.pop(code, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, mapping):
+        with self._lock:
+            self._entries.update(mapping)
+            for code in mapping:
+                self._entries.move_to_end(code)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _check_version(self):
+        """Esvazia o cache se outro processo alterou algum SKU"""
+        if time.monotonic() - self._checked_at < CHECK_INTERVAL:
+            return
+        version = get_cache_version(SKUS)
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            self._checked_at = time.monotonic()
+
+
+barcodes = BarcodeCache()
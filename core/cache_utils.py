@@ -0,0 +1,104 @@
+# core/cache_utils.py
+
+"""
+Helpers de cache compartilhado.
+
+Os dados em cache são invalidados por "versões": cada grupo de dados
+(ex.: 'notifications') tem um contador no cache, e as chaves incluem a
+versão atual. Para invalidar tudo de um grupo basta incrementar o contador,
+sem precisar conhecer cada chave gerada (ex.: contadores por usuário).
+"""
+
+from django.core.cache import cache
+
+NOTIFICATIONS = 'notifications'
+PRODUCTS = 'products'
+CATEGORIES = 'categories'
+BRANDS = 'brands'
+SKUS = 'skus'
+
+# Tempo máximo (segundos) que um contador fica em cache, mesmo sem invalidação
+UNREAD_COUNT_TIMEOUT = 300
+DASHBOARD_STATS_TIMEOUT = 300
+CATALOG_GROUPS_TIMEOUT = 300
+
+
+def _version_key(group):
+    return f"cache_version:{group}"
+
+
+def get_cache_version(group):
+    """Retorna a versão atual de um grupo de dados em cache"""
+    version = cache.get(_version_key(group))
+    if version is None:
+        cache.add(_version_key(group), 1, timeout=None)
+        version = cache.get(_version_key(group), 1)
+    return version
+
+
+async def aget_cache_version(group):
+    """Versão assíncrona de get_cache_version (para as views ASGI)"""
+    version = await cache.aget(_version_key(group))
+    if version is None:
+        await cache.aadd(_version_key(group), 1, timeout=None)
+        version = await cache.aget(_version_key(group), 1)
+    return version
+
+
+def bump_cache_version(group):
+    """Invalida todas as entradas de um grupo incrementando sua versão"""
+    try:
+        return cache.incr(_version_key(group))
+    except ValueError:
+        # A chave ainda não existe (ou expirou): começa uma nova versão
+        cache.set(_version_key(group), 2, timeout=None)
+        return 2
+
+
+def versioned_key(group, *parts):
+    """Monta uma chave de cache que muda sempre que o grupo é invalidado"""
+    suffix = ':'.join(str(part) for part in parts)
+    return f"{group}:v{get_cache_version(group)}:{suffix}"
+
+
+async def aversioned_key(group, *parts):
+    """Versão assíncrona de versioned_key"""
+    suffix = ':'.join(str(part) for part in parts)
+    return f"{group}:v{await aget_cache_version(group)}:{suffix}"
+
+
+def get_unread_notification_count(queryset, user=None):
+    """Contador de notificações não lidas (por usuário), em cache até a próxima alteração"""
+    user_key = user.pk if user is not None and user.is_authenticated else 'anon'
+    key = versioned_key(NOTIFICATIONS, 'unread_count', user_key)
+    return cache.get_or_set(key, lambda: queryset.filter(read=False).count(), UNREAD_COUNT_TIMEOUT)
+
+
+def invalidate_notifications():
+    """Invalida contadores e demais caches de notificações"""
+    bump_cache_version(NOTIFICATIONS)
+
+
+def dashboard_stats_key(today):
+    """Chave das estatísticas do dashboard (o dia entra na chave: as faixas mudam à meia-noite)"""
+    return versioned_key(PRODUCTS, 'dashboard_stats', today.isoformat())
+
+
+def invalidate_products():
+    """Invalida estatísticas e demais caches derivados dos produtos"""
+    bump_cache_version(PRODUCTS)
+
+
+def invalidate_categories():
+    """Invalida os caches que dependem dos nomes das categorias"""
+    bump_cache_version(CATEGORIES)
+
+
+def invalidate_brands():
+    """Invalida os caches que dependem dos nomes das marcas"""
+    bump_cache_version(BRANDS)
+
+
+def invalidate_skus():
+    """Invalida os mapas SKU -> produto dos processos (core.barcode_cache)"""
+    bump_cache_version(SKUS)
@@ -0,0 +1,121 @@
+# core/changes.py
+
+"""
+Feed de alterações de produtos (/api/products/changes/) para a sincronização
+incremental do PWA offline: em vez de baixar a lista inteira, o cliente pede
+só o que mudou desde o último cursor.
+
+- Alterados: produtos com (updated_at, id) depois do cursor (índice
+  core_product_updated_idx). Quem altera produtos em massa precisa atualizar
+  updated_at também (ver core.expiry.rollover, core.reorder e os sinais de
+  Category em core.signals: renomear ou excluir uma categoria muda o JSON dos produtos).
+- Excluídos: ProductTombstone (gravados por core.signals), mantidos por
+  CHANGES_TOMBSTONE_DAYS dias e limpos pela task purge_product_tombstones.
+  Um cursor emitido antes disso pode ter perdido exclusões: a API responde
+  410 e o cliente deve baixar a lista completa de novo.
+- Só entram linhas gravadas há mais de CHANGES_SETTLE_SECONDS segundos:
+  updated_at é definido antes do COMMIT, então uma transação demorada pode
+  gravar uma linha "no passado", depois que o cliente já avançou o cursor.
+  O valor precisa cobrir a transação de escrita mais longa (importações do
+  admin, que rodam numa transação só, e o generate_catalog).
+- Lê sempre do primário, nunca da réplica (core.db_router): a janela acima
+  não cobre o atraso da replicação, e o cursor passaria por linhas que a
+  réplica ainda não recebeu (o cliente as perderia de vez).
+
+O cursor é opaco para o cliente: "<updated_at em µs>.<id>.<emitido em (s)>".
+"""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import db_router
+from .models import Product, ProductTombstone
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 1000
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class ExpiredCursor(Exception):
+    """Cursor anterior à retenção dos tombstones: o cliente precisa sincronizar tudo de novo"""
+
+
+def retention_days():
+    return getattr(settings, 'CHANGES_TOMBSTONE_DAYS', 30)
+
+
+def settle_seconds():
+    return getattr(settings, 'CHANGES_SETTLE_SECONDS', 120)
+
+
+def encode_cursor(moment, pk, issued_at):
+    micros = (moment - EPOCH) // timedelta(microseconds=1)
+    return f"{micros}.{pk}.{int(issued_at.timestamp())}"
+
+
+def decode_cursor(cursor):
+    """(updated_at, id, emitido em); ValueError se o cursor for inválido"""
+    micros, pk, issued = (int(part) for part in cursor.split('.'))
+    return (
+        EPOCH + timedelta(microseconds=micros),
+        pk,
+        datetime.fromtimestamp(issued, tz=dt_timezone.utc),
+    )
+
+
+def changes(cursor=None, limit=DEFAULT_LIMIT, queryset=None):
+    """
+    Próximo lote de alterações depois do cursor (None = sincronização inicial).
+
+    Retorna {'changed': [produtos], 'deleted': [ids], 'cursor': próximo cursor,
+    'has_more': bool}. O cursor só avança até a última linha devolvida; com
+    has_more, o cliente repete a chamada com o novo cursor.
+    """
+    now = timezone.now()
+    settled = now - timedelta(seconds=settle_seconds())
+    queryset = queryset if queryset is not None else Product.objects.all()
+
+    if cursor is None:
+        after, after_pk = EPOCH, 0
+    else:
+        after, after_pk, issued_at = decode_cursor(cursor)
+        if issued_at < now - timedelta(days=retention_days()):
+            raise ExpiredCursor(cursor)
+
+    with db_router.pin_primary():
+        # Intervalo simples + exclude (em vez de um OR): o índice é lido em ordem, sem ordenação extra
+        products = list(
+            queryset.filter(updated_at__gte=after, updated_at__lt=settled)
+            .exclude(updated_at=after, id__lte=after_pk)
+            .order_by('updated_at', 'id')[:limit + 1]
+        )
+        rows = [(product.updated_at, product.pk, product) for product in products]
+        if cursor is not None:
+            # Na sincronização inicial o cliente não tem nada a remover
+            rows += [
+                (deleted_at, product_id, None)
+                for deleted_at, product_id in ProductTombstone.objects.filter(deleted_at__gte=after, deleted_at__lt=settled)
+                .exclude(deleted_at=after, product_id__lte=after_pk)
+                .order_by('deleted_at', 'product_id').values_list('deleted_at', 'product_id')[:limit + 1]
+            ]
+    rows.sort(key=lambda row: (row[0], row[1]))
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        after, after_pk = rows[-1][0], rows[-1][1]
+    return {
+        'changed': [product for _moment, _pk, product in rows if product is not None],
+        'deleted': [pk for _moment, pk, product in rows if product is None],
+        'cursor': encode_cursor(after, after_pk, now),
+        'has_more': has_more,
+    }
+
+
+def purge_tombstones():
+    """Remove os tombstones mais antigos que a retenção; retorna quantos foram removidos"""
+    cutoff = timezone.now() - timedelta(days=retention_days())
+    deleted, _ = ProductTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
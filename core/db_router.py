@@ -0,0 +1,107 @@
+# core/db_router.py
+
+"""
+Leituras em uma réplica do banco (alias 'replica' em DATABASES, configurado
+por DATABASE_REPLICA_URL em produção).
+
+Por padrão tudo vai para o primário; a réplica só é usada dentro de um
+contexto de leitura:
+
+- ReplicaReadMiddleware (core.middleware): GET/HEAD/OPTIONS das rotas em
+  REPLICA_READ_PATHS (listas, dashboard, relatórios);
+- use_replica(): fases de varredura das tasks (core.tasks) e exportações do admin.
+
+Mesmo dentro do contexto, a leitura fica no primário quando:
+- o mesmo contexto já gravou algo (a réplica pode ainda não ter a gravação);
+- há uma transação aberta no primário;
+- o cliente gravou há menos de REPLICA_PIN_SECONDS segundos (cookie do middleware).
+
+Só os modelos do app core são roteados: sessões, usuários e a fila do
+django-q sempre leem do primário.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = 'replica'
+ROUTED_APPS = {'core'}
+
+# Estado da requisição/fase atual; um dict mutável, para que as threads de
+# sync_to_async (que copiam o contexto) vejam a mesma marcação de gravação
+_state = ContextVar('db_router_state', default=None)
+
+
+def replica_configured():
+    return REPLICA in connections.databases
+
+
+def activate(replica=True):
+    """Abre um contexto de roteamento; retorna o token para deactivate()"""
+    return _state.set({'replica': replica, 'pinned': False})
+
+
+def deactivate(token=None):
+    if token is None:
+        _state.set(None)
+    else:
+        _state.reset(token)
+
+
+@contextmanager
+def use_replica():
+    """Leituras do bloco vão para a réplica (até a primeira gravação)"""
+    token = activate(replica=True)
+    try:
+        yield
+    finally:
+        deactivate(token)
+
+
+@contextmanager
+def pin_primary():
+    """Leituras do bloco vão para o primário (ex.: logo depois de uma gravação)"""
+    token = activate(replica=False)
+    try:
+        yield
+    finally:
+        deactivate(token)
+
+
+def wrote():
+    """True se o contexto atual gravou algo no banco"""
+    state = _state.get()
+    return bool(state and state['pinned'])
+
+
+class ReplicaRouter:
+    """Router do Django (DATABASE_ROUTERS): leituras na réplica quando permitido"""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            state is None
+            or not state['replica']
+            or state['pinned']
+            or model._meta.app_label not in ROUTED_APPS
+            or not replica_configured()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return None
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            # Daqui em diante o contexto lê do primário (ler o que acabou de gravar)
+            state['pinned'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # A réplica tem os mesmos dados do primário
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # A réplica recebe o esquema pela replicação do banco
+        return db != REPLICA
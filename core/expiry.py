@@ -0,0 +1,98 @@
+# core/expiry.py
+
+"""
+Faixas de validade dos produtos (coluna Product.expiry_bucket).
+
+A faixa é calculada no Product.save() e recalculada uma vez por dia pela task
+rollover_expiry_buckets, logo após a meia-noite. As views, o dashboard e as
+tasks filtram por igualdade nessa coluna indexada, em vez de recalcular
+intervalos de datas a cada requisição, e todos usam o mesmo "hoje": local_today()
+no fuso horário configurado (TIME_ZONE).
+"""
+
+from datetime import timedelta
+
+from django.utils import timezone
+
+EXPIRED = 'expired'     # vencido
+CRITICAL = 'critical'   # 0-3 dias
+WARNING = 'warning'     # 4-7 dias
+UPCOMING = 'upcoming'   # 8-30 dias
+OK = 'ok'               # mais de 30 dias
+NONE = 'none'           # sem data de validade
+
+BUCKET_CHOICES = [
+    (EXPIRED, 'Vencido'),
+    (CRITICAL, 'Crítico (0-3 dias)'),
+    (WARNING, 'Aviso (4-7 dias)'),
+    (UPCOMING, 'Próximo (8-30 dias)'),
+    (OK, 'Em dia (mais de 30 dias)'),
+    (NONE, 'Sem validade'),
+]
+
+# Agrupamentos usados pelas views e tasks
+EXPIRING_BUCKETS = (CRITICAL, WARNING, UPCOMING)   # 0-30 dias
+WEEK_BUCKETS = (CRITICAL, WARNING)                 # 0-7 dias
+
+# Limite superior (em dias até o vencimento) de cada faixa com data
+_LIMITS = (
+    (CRITICAL, 3),
+    (WARNING, 7),
+    (UPCOMING, 30),
+)
+
+
+def local_today():
+    """Data de hoje no fuso configurado (a mesma para views, dashboard e tasks)"""
+    return timezone.localdate()
+
+
+def bucket_for(expiration_date, today=None):
+    """Faixa de validade de uma data"""
+    if expiration_date is None:
+        return NONE
+    days_left = (expiration_date - (today or local_today())).days
+    if days_left < 0:
+        return EXPIRED
+    for bucket, limit in _LIMITS:
+        if days_left <= limit:
+            return bucket
+    return OK
+
+
+def date_filters(today):
+    """Filtro por expiration_date equivalente a cada faixa (para recalcular a coluna)"""
+    filters = {
+        EXPIRED: {'expiration_date__lt': today},
+        NONE: {'expiration_date__isnull': True},
+    }
+    start = 0
+    for bucket, limit in _LIMITS:
+        filters[bucket] = {
+            'expiration_date__gte': today + timedelta(days=start),
+            'expiration_date__lte': today + timedelta(days=limit),
+        }
+        start = limit + 1
+    filters[OK] = {'expiration_date__gt': today + timedelta(days=start - 1)}
+    return filters
+
+
+def rollover(today=None):
+    """
+    Recalcula a faixa dos produtos que mudaram de faixa (um UPDATE por faixa,
+    só nas linhas que mudam). Retorna quantos produtos foram alterados.
+    """
+    from .cache_utils import invalidate_products
+    from .models import Product
+
+    today = today or local_today()
+    now = timezone.now()
+    changed = 0
+    for bucket, filters in date_filters(today).items():
+        # updated_at também muda: a faixa aparece na API e entra nas ETags (core.http_cache)
+        changed += Product.objects.filter(**filters).exclude(expiry_bucket=bucket).update(
+            expiry_bucket=bucket, updated_at=now
+        )
+    if changed:
+        invalidate_products()
+    return changed
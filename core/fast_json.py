@@ -0,0 +1,105 @@
+# core/fast_json.py
+
+"""
+Renderer e parser JSON do DRF com orjson (configurados em REST_FRAMEWORK).
+
+O JSON tem os mesmos valores do JSONRenderer padrão: datas, horas, Decimal,
+UUID e textos traduzíveis passam pelo mesmo encoder do DRF (datetimes em ISO
+8601, UTC como 'Z'; Decimal como número); \\u2028/\\u2029 continuam escapados.
+Não é byte a byte igual: floats com expoente saem como 1e16 (padrão: 1e+16).
+NaN/Infinity, que o orjson gravaria como null, vão para o renderer padrão,
+que os rejeita (JSON estrito) como antes.
+Sem orjson, com indentação (?format / Accept: ...; indent=4) ou com
+UNICODE_JSON/COMPACT_JSON alterados, cai no JSONRenderer/JSONParser padrão.
+"""
+
+import logging
+import math
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+    logger.warning("Biblioteca 'orjson' não encontrada. A API usará o JSON padrão do Python (mais lento).")
+
+LINE_SEPARATOR = '\u2028'.encode()
+PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+
+def _has_non_finite(value):
+    """True se houver algum float NaN/Infinity nos dados (dicts, listas e tuplas)"""
+    kind = type(value)
+    if kind is float:
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        value = value.values()
+    elif not isinstance(value, (list, tuple)):
+        return False
+    for item in value:
+        kind = type(item)
+        if kind is float:
+            if not math.isfinite(item):
+                return True
+        elif kind is not str and kind is not int and kind is not bool and item is not None:
+            if _has_non_finite(item):
+                return True
+    return False
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer com orjson; mesmos valores do padrão"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (
+            not ORJSON_AVAILABLE
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                # datetime/date/time vão para o encoder do DRF (mesmo formato do padrão)
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            # Tipos que o orjson não aceita (ex.: inteiros acima de 64 bits)
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # NaN/Infinity viram null no orjson: sem null na saída, não há o que conferir
+        if b'null' in ret and _has_non_finite(data):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if LINE_SEPARATOR in ret or PARAGRAPH_SEPARATOR in ret:
+            ret = ret.replace(LINE_SEPARATOR, b'\\u2028').replace(PARAGRAPH_SEPARATOR, b'\\u2029')
+        return ret
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser com orjson (corpo em UTF-8; outras codificações usam o padrão)"""
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if not ORJSON_AVAILABLE or not self.strict or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,116 @@
+# core/fieldsets.py
+
+"""
+Campos esparsos nas views de produto: ?fields=id,name,quantity devolve só
+esses campos; ?omit=description devolve todos menos esses.
+
+- SparseFieldsetSerializerMixin: o serializer remove os campos não pedidos;
+- SparseFieldsetMixin (views genéricas) e only_requested() (views de função):
+  levam a seleção para o queryset com .only(), então o banco também deixa de
+  ler as colunas que não vão para a resposta (ex.: description).
+
+Vale só para leitura (GET/HEAD): num PUT/PATCH um objeto com colunas adiadas
+gravaria só parte dos campos. O 'id' sempre vai na resposta.
+"""
+
+from functools import lru_cache
+
+from rest_framework import serializers
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+def _split(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+def requested_fields(request, available):
+    """
+    Campos pedidos em ?fields= / ?omit= (entre os disponíveis), ou None se o
+    cliente não pediu seleção. Campo desconhecido = ValidationError (400).
+    """
+    if request is None or request.method not in READ_METHODS:
+        return None
+    fields = _split(request.query_params.get('fields'))
+    omit = _split(request.query_params.get('omit'))
+    if not fields and not omit:
+        return None
+
+    unknown = (fields | omit) - set(available)
+    if unknown:
+        raise serializers.ValidationError({'fields': f"Campo(s) desconhecido(s): {', '.join(sorted(unknown))}"})
+    selected = (fields or set(available)) - omit
+    if 'id' in available:
+        selected.add('id')
+    return selected
+
+
+@lru_cache(maxsize=None)
+def field_sources(serializer_class):
+    """{campo: atributo de origem} do serializer (montar os campos de um ModelSerializer custa caro)"""
+    return {name: field.source for name, field in serializer_class().fields.items()}
+
+
+def columns_for(serializer_class, selected, extra=()):
+    """
+    Colunas do modelo necessárias para serializar os campos selecionados.
+
+    Campos cuja fonte não é uma coluna (SerializerMethodField, anotações)
+    declaram as colunas que usam em serializer_class.sparse_requires.
+    """
+    model = serializer_class.Meta.model
+    concrete = {field.name for field in model._meta.concrete_fields}
+    requires = getattr(serializer_class, 'sparse_requires', {})
+    sources = field_sources(serializer_class)
+
+    columns = {model._meta.pk.name, *extra}
+    for name in selected:
+        columns.update(requires.get(name, ()))
+        source = sources[name].split('.')[0]
+        if source in concrete:
+            columns.add(source)
+    return columns
+
+
+def only_requested(queryset, request, serializer_class, extra=()):
+    """queryset.only() com as colunas dos campos pedidos (sem seleção, o queryset original)"""
+    selected = requested_fields(request, field_sources(serializer_class))
+    if selected is None:
+        return queryset
+    return queryset.only(*columns_for(serializer_class, selected, extra))
+
+
+class SparseFieldsetSerializerMixin:
+    """Remove do serializer os campos fora de ?fields= / ?omit= (request no contexto)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = requested_fields(self.context.get('request'), self.fields)
+        if selected is not None:
+            for name in set(self.fields) - selected:
+                self.fields.pop(name)
+
+
+class SparseFieldsetMixin:
+    """
+    Mixin para views genéricas do DRF (antes de ConditionalGetMixin na herança):
+    aplica a seleção de campos ao queryset e à ETag.
+
+    Atributos:
+        sparse_extra_columns: colunas sempre lidas (ex.: as usadas pela view)
+    """
+    sparse_extra_columns = ()
+
+    def filter_queryset(self, queryset):
+        # Em filter_queryset (e não get_queryset), que as views costumam sobrescrever
+        queryset = super().filter_queryset(queryset)
+        extra = self.sparse_extra_columns
+        # A data de alteração entra nos validadores do GET condicional (core.http_cache)
+        last_modified_field = getattr(self, 'last_modified_field', None)
+        if last_modified_field:
+            extra = (*extra, last_modified_field)
+        return only_requested(queryset, self.request, self.get_serializer_class(), extra)
+
+    def etag_parts(self):
+        selected = requested_fields(self.request, field_sources(self.get_serializer_class()))
+        return [*super().etag_parts(), ','.join(sorted(selected or ()))]
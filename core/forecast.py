@@ -0,0 +1,204 @@
+# core/forecast.py
+
+"""
+Previsão de ruptura e de perda por vencimento (tabela ProductForecast).
+
+Consumo diário: saídas (delta < 0 em StockMovement) dos últimos
+FORECAST_WINDOW_DAYS dias, divididas pelos dias observados (a janela, ou menos
+se o produto é mais novo que ela).
+
+Com o consumo r e os lotes em ordem FEFO (core.inventory), o lote i
+(quantidade q_i, vendável por t_i dias, acumulado c_i) perde
+
+    perda_i = clip(c_i - P_i - r * t_i, 0, q_i)
+
+onde P_i é a perda dos lotes anteriores (que saem do estoque ao vencer).
+A ruptura acontece quando o estoque vendável (total - perda) acaba:
+hoje + (total - perda) / r.
+
+O cálculo é vetorizado com NumPy sobre o catálogo inteiro (um passo por
+posição de lote, não por produto). Sem NumPy, o mesmo cálculo roda em Python puro.
+
+refresh() recalcula só os produtos com movimentação ou alteração desde o
+último cálculo; refresh(full=True) recalcula todos (toda noite: a janela de
+consumo anda e os prazos de validade encurtam).
+"""
+
+import logging
+import math
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import F, Max, Q, Sum
+from django.utils import timezone
+
+from . import expiry
+from .models import Lot, Product, ProductForecast, StockMovement
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+    logger.warning("Biblioteca 'numpy' não encontrada. As previsões de estoque serão calculadas em Python puro.")
+
+# Produtos calculados por vez (limita a memória das matrizes)
+BATCH_SIZE = 5000
+CENTS = Decimal('0.01')
+FIELDS = ['daily_rate', 'days_of_stock', 'stockout_date', 'expected_waste', 'waste_value', 'computed_at']
+
+
+def window_days():
+    return getattr(settings, 'FORECAST_WINDOW_DAYS', 28)
+
+
+def refresh(full=False):
+    """
+    Recalcula as previsões (só as desatualizadas, ou todas com full=True).
+    Retorna quantos produtos foram calculados.
+    """
+    now = timezone.now()
+    last = None if full else ProductForecast.objects.aggregate(last=Max('computed_at'))['last']
+    if last is None:
+        product_ids = Product.objects.order_by('pk').values_list('pk', flat=True).iterator()
+    else:
+        product_ids = sorted(
+            set(StockMovement.objects.filter(created_at__gt=last).values_list('product_id', flat=True))
+            | set(Product.objects.filter(updated_at__gt=last).values_list('pk', flat=True))
+            | set(Lot.objects.filter(updated_at__gt=last).values_list('product_id', flat=True))
+        )
+
+    computed = 0
+    batch = []
+    for product_id in product_ids:
+        batch.append(product_id)
+        if len(batch) == BATCH_SIZE:
+            computed += compute(batch, now)
+            batch = []
+    if batch:
+        computed += compute(batch, now)
+    return computed
+
+
+def compute(product_ids, now=None):
+    """Calcula e grava a previsão dos produtos informados; retorna quantos foram gravados"""
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    window = window_days()
+
+    products = list(Product.objects.filter(pk__in=product_ids).values_list(
+        'pk', 'quantity', 'price', 'expiration_date', 'created_at'
+    ))
+    if not products:
+        return 0
+
+    consumed = dict(
+        StockMovement.objects.filter(product__in=product_ids, delta__lt=0, created_at__gte=now - timedelta(days=window))
+        .order_by().values('product').annotate(units=Sum('delta')).values_list('product', 'units')
+    )
+    lots = {}
+    for product_id, quantity, expiration_date in (
+        Lot.objects.filter(product__in=product_ids, quantity__gt=0)
+        .order_by('product', F('expiration_date').asc(nulls_last=True), 'id')
+        .values_list('product', 'quantity', 'expiration_date')
+    ):
+        lots.setdefault(product_id, []).append((quantity, _sellable_days(expiration_date, today)))
+
+    rates, stock_lots = [], []
+    for product_id, quantity, _price, expiration_date, created_at in products:
+        observed = min(window, max(1.0, (now - created_at).total_seconds() / 86400))
+        rates.append(-(consumed.get(product_id) or 0) / observed)
+        # Produto sem lotes: o próprio estoque é um lote único
+        stock_lots.append(lots.get(product_id) or (
+            [(quantity, _sellable_days(expiration_date, today))] if quantity else []
+        ))
+
+    waste = _simulate_numpy(stock_lots, rates) if NUMPY_AVAILABLE else _simulate_python(stock_lots, rates)
+
+    forecasts = []
+    for (product_id, _quantity, price, _expiration_date, _created_at), rate, product_lots, wasted in zip(
+        products, rates, stock_lots, waste
+    ):
+        stock = sum(quantity for quantity, _days in product_lots)
+        wasted = int(round(wasted))
+        days_of_stock = (stock - wasted) / rate if rate > 0 else None
+        forecasts.append(ProductForecast(
+            product_id=product_id,
+            daily_rate=round(rate, 4),
+            days_of_stock=round(days_of_stock, 2) if days_of_stock is not None else None,
+            stockout_date=today + timedelta(days=math.floor(days_of_stock)) if days_of_stock is not None else None,
+            expected_waste=wasted,
+            waste_value=(Decimal(str(price or 0)) * wasted).quantize(CENTS),
+            computed_at=now,
+        ))
+
+    ProductForecast.objects.bulk_create(
+        forecasts,
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=FIELDS,
+    )
+    return len(forecasts)
+
+
+def _sellable_days(expiration_date, today):
+    """Dias em que o lote ainda pode ser vendido (o dia do vencimento conta; sem validade = infinito)"""
+    if expiration_date is None:
+        return math.inf
+    return max((expiration_date - today).days + 1, 0)
+
+
+def _simulate_numpy(stock_lots, rates):
+    """Perda prevista por produto; matrizes [produtos, lotes] preenchidas com lotes vazios"""
+    width = max((len(product_lots) for product_lots in stock_lots), default=0)
+    if not width:
+        return [0] * len(stock_lots)
+    quantities = np.zeros((len(stock_lots), width))
+    days = np.full((len(stock_lots), width), np.inf)
+    for row, product_lots in enumerate(stock_lots):
+        for column, (quantity, sellable) in enumerate(product_lots):
+            quantities[row, column] = quantity
+            days[row, column] = sellable
+
+    rates = np.asarray(rates, dtype=float)
+    cumulative = np.cumsum(quantities, axis=1)
+    wasted_before = np.zeros(len(stock_lots))
+    for column in range(width):
+        with np.errstate(invalid='ignore'):
+            sold = np.where(np.isinf(days[:, column]), np.inf, rates * days[:, column])
+        waste = np.clip(cumulative[:, column] - wasted_before - sold, 0, quantities[:, column])
+        wasted_before += waste
+    return wasted_before.tolist()
+
+
+def _simulate_python(stock_lots, rates):
+    """Mesmo cálculo de _simulate_numpy, produto a produto"""
+    result = []
+    for product_lots, rate in zip(stock_lots, rates):
+        cumulative = wasted = 0
+        for quantity, sellable in product_lots:
+            cumulative += quantity
+            sold = math.inf if math.isinf(sellable) else rate * sellable
+            wasted += min(max(cumulative - wasted - sold, 0), quantity)
+        result.append(wasted)
+    return result
+
+
+def at_risk(horizon_days=None, kind='all', today=None):
+    """
+    Previsões em risco: ruptura em até horizon_days dias (FORECAST_HORIZON_DAYS)
+    e/ou perda prevista por vencimento
+    """
+    today = today or expiry.local_today()
+    if horizon_days is None:
+        horizon_days = getattr(settings, 'FORECAST_HORIZON_DAYS', 14)
+    stockout = Q(stockout_date__lte=today + timedelta(days=horizon_days))
+    waste = Q(expected_waste__gt=0)
+    condition = {'stockout': stockout, 'waste': waste}.get(kind, stockout | waste)
+    return ProductForecast.objects.select_related('product').filter(condition).order_by(
+        F('stockout_date').asc(nulls_last=True), '-waste_value', 'pk'
+    )
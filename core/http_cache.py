@@ -0,0 +1,205 @@
+# core/http_cache.py
+
+"""
+GET condicional (ETag / Last-Modified / Cache-Control) para as views do catálogo.
+
+Os validadores são calculados sem serializar nada:
+- listas: COUNT(*) + MAX(updated_at) do queryset já filtrado + query string
+- detalhe: updated_at da linha
+Se o cliente (ou um CDN na frente) mandar If-None-Match / If-Modified-Since
+com o mesmo valor, a view responde 304 sem montar o JSON.
+
+Escritas condicionais (controle de concorrência otimista): em modelos com
+coluna de versão, a ETag do detalhe começa pela versão (W/"<versão>-...") e
+PUT/PATCH/DELETE com If-Match só são aplicados se a versão ainda for a mesma;
+senão a resposta é 412. Também vale If-Match: "<versão>" (o campo version do JSON).
+"""
+
+import contextlib
+import hashlib
+import re
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_etags
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from .cache_utils import get_cache_version
+
+re_etag_version = re.compile(r'^(?:W/)?"(\d+)(?:-[0-9a-f]+)?"$')
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'O registro foi alterado por outra pessoa. Recarregue e tente novamente.'
+    default_code = 'precondition_failed'
+
+
+class PreconditionRequired(APIException):
+    status_code = status.HTTP_428_PRECONDITION_REQUIRED
+    default_detail = 'Informe o cabeçalho If-Match com a ETag (ou a versão) do registro.'
+    default_code = 'precondition_required'
+
+
+def make_etag(*parts, version=None):
+    """
+    ETag fraca (W/): é derivada dos metadados, não dos bytes da resposta.
+    Com version, a versão vem no início (W/"<versão>-<hash>") para o If-Match.
+    """
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode(), usedforsecurity=False).hexdigest()
+    if version is not None:
+        return f'W/"{version}-{digest}"'
+    return f'W/"{digest}"'
+
+
+def if_match_versions(request):
+    """
+    Versões aceitas pelo If-Match: None se o cabeçalho não veio (ou é '*'),
+    senão o conjunto de versões (vazio se nenhuma ETag for reconhecida).
+    """
+    header = request.META.get('HTTP_IF_MATCH')
+    if header is None:
+        return None
+    etags = parse_etags(header)
+    if etags == ['*']:
+        return None
+    return {int(match.group(1)) for match in map(re_etag_version.match, etags) if match}
+
+
+class ConditionalGetMixin:
+    """
+    Mixin para views genéricas do DRF (antes da classe genérica na herança).
+
+    Atributos:
+        last_modified_field: campo de data de alteração do modelo (None se não houver)
+        cache_groups: grupos de core.cache_utils cuja versão entra na ETag
+                      (ex.: CATEGORIES, porque o produto serializa o nome da categoria)
+        version_field: coluna de versão (If-Match / 412); com API_REQUIRE_IF_MATCH
+                       as escritas sem If-Match recebem 428
+    """
+    last_modified_field = 'updated_at'
+    cache_groups = ()
+    # Coluna de versão para PUT/PATCH/DELETE condicionais (None = sem controle)
+    version_field = None
+
+    def etag_parts(self):
+        return [get_cache_version(group) for group in self.cache_groups]
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        aggregates = {'count': Count('pk')}
+        if self.last_modified_field:
+            aggregates['last_modified'] = Max(self.last_modified_field)
+        stats = queryset.order_by().aggregate(**aggregates)
+        last_modified = stats.get('last_modified')
+
+        etag = make_etag('list', request.get_full_path(), stats['count'], last_modified, *self.etag_parts())
+        # Na lista o Last-Modified é só informativo: apagar um produto não muda o
+        # MAX(updated_at), então apenas a ETag (que inclui o COUNT) decide o 304
+        not_modified = self._not_modified(request, etag)
+        if not_modified is not None:
+            return self._add_cache_headers(not_modified, etag, last_modified)
+
+        return self._add_cache_headers(self.list_response(queryset), etag, last_modified)
+
+    def list_response(self, queryset):
+        """Serializa a lista (mesmo fluxo do ListModelMixin; sobrescreva para cachear)"""
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    def detail_etag(self, instance):
+        last_modified = getattr(instance, self.last_modified_field) if self.last_modified_field else None
+        version = getattr(instance, self.version_field) if self.version_field else None
+        return make_etag('detail', instance.pk, last_modified, *self.etag_parts(), version=version)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+
+        last_modified = getattr(instance, self.last_modified_field) if self.last_modified_field else None
+        etag = self.detail_etag(instance)
+        not_modified = self._not_modified(request, etag, last_modified)
+        if not_modified is not None:
+            return self._add_cache_headers(not_modified, etag, last_modified)
+
+        serializer = self.get_serializer(instance)
+        return self._add_cache_headers(Response(serializer.data), etag, last_modified)
+
+    def update(self, request, *args, **kwargs):
+        response = super().update(request, *args, **kwargs)
+        if self.version_field and getattr(self, 'updated_instance', None) is not None:
+            # Nova ETag, para o cliente encadear a próxima alteração
+            response['ETag'] = self.detail_etag(self.updated_instance)
+        return response
+
+    def perform_update(self, serializer):
+        with self._claim_version(serializer.instance):
+            super().perform_update(serializer)
+        self.updated_instance = serializer.instance
+
+    def perform_destroy(self, instance):
+        with self._claim_version(instance):
+            super().perform_destroy(instance)
+
+    @contextlib.contextmanager
+    def _claim_version(self, instance):
+        """
+        Aplica a escrita só se a versão do If-Match ainda for a gravada (412 se não for).
+
+        A versão é reservada com um UPDATE condicional na mesma transação da
+        escrita: de duas escritas concorrentes com a mesma versão, só uma passa
+        (sem SELECT ... FOR UPDATE). O save() do modelo grava a versão seguinte.
+        """
+        if not self.version_field:
+            yield
+            return
+        versions = if_match_versions(self.request)
+        if versions is None:
+            if getattr(settings, 'API_REQUIRE_IF_MATCH', False):
+                raise PreconditionRequired()
+            yield
+            return
+
+        current = getattr(instance, self.version_field)
+        if current not in versions:
+            raise PreconditionFailed()
+        with transaction.atomic():
+            claimed = type(instance).objects.filter(pk=instance.pk, **{self.version_field: current}).update(
+                **{self.version_field: F(self.version_field) + 1}
+            )
+            if not claimed:
+                raise PreconditionFailed()
+            yield
+
+    def _not_modified(self, request, etag, last_modified=None):
+        """Resposta 304 se o cliente já tem a versão atual (None caso contrário)"""
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        return get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=int(last_modified.timestamp()) if last_modified else None,
+        )
+
+    def _add_cache_headers(self, response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        # Usuário logado: só o navegador guarda; anônimo: CDN/proxy também podem guardar
+        user = getattr(self.request, 'user', None)
+        private = user is not None and user.is_authenticated
+        patch_cache_control(
+            response,
+            max_age=getattr(settings, 'API_CACHE_MAX_AGE', 0),
+            must_revalidate=True,
+            **({'private': True} if private else {'public': True}),
+        )
+        return response
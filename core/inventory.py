@@ -0,0 +1,316 @@
+# core/inventory.py
+
+"""
+Estoque por lote (modelo Lot) e alocação FEFO (primeiro a vencer, primeiro a sair).
+
+- allocate() consome o estoque dos lotes em ordem de validade, travando as
+  linhas (SELECT ... FOR UPDATE) e gravando tudo com um único bulk_update,
+  na mesma transação.
+- sync_products() recalcula no banco a quantidade (soma dos lotes) e a
+  validade (lote com estoque que vence primeiro) dos produtos, junto com a
+  faixa de validade e o resumo de estoque (core.inventory_summary).
+- adjust_quantity() soma/subtrai unidades de um produto sem lotes com um
+  único UPDATE condicional (concorrência otimista, sem travas prévias).
+- products_in_buckets() e bucket_units() avaliam as faixas de validade lote a
+  lote em SQL; produtos sem lotes entram pelos próprios campos.
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, Exists, F, IntegerField, Min, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import expiry, inventory_summary, reorder
+from .cache_utils import invalidate_products
+from .models import Lot, Product, StockMovement
+
+# Acima disso um sync em massa reconstrói o resumo inteiro em vez de aplicar produto a produto
+SUMMARY_REBUILD_THRESHOLD = 200
+
+
+class InsufficientStock(Exception):
+    """Estoque (em lotes válidos) insuficiente; shortages = {product_id: unidades faltando}"""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(f"Estoque insuficiente para {len(shortages)} produto(s)")
+
+
+class LotControlled(Exception):
+    """O produto tem lotes: a quantidade muda pelos lotes ou por allocate()"""
+
+
+class StaleVersion(Exception):
+    """A versão do produto não é mais a informada (If-Match)"""
+
+
+def bucket_filter(buckets, today, prefix=''):
+    """Q por expiration_date equivalente às faixas (para tabelas sem a coluna expiry_bucket)"""
+    filters = expiry.date_filters(today)
+    condition = Q()
+    for bucket in buckets:
+        condition |= Q(**{f'{prefix}{field}': value for field, value in filters[bucket].items()})
+    return condition
+
+
+def open_lots(product_ids):
+    """
+    Converte o estoque de produtos ainda sem lotes em um lote inicial
+    (código = Product.batch), para que passem a ser controlados por lote.
+    Retorna quantos lotes foram criados.
+    """
+    legacy = Product.objects.filter(pk__in=product_ids, quantity__gt=0).exclude(
+        Exists(Lot.objects.filter(product=OuterRef('pk')))
+    )
+    lots = [
+        Lot(product_id=product.pk, code=product.batch or '', expiration_date=product.expiration_date, quantity=product.quantity)
+        for product in legacy.only('pk', 'batch', 'expiration_date', 'quantity')
+    ]
+    Lot.objects.bulk_create(lots)
+    return len(lots)
+
+
+def record_movements(changes, reason):
+    """
+    Registra no StockMovement as mudanças de quantidade (base de core.forecast).
+
+    changes: [(product_id, quantidade anterior, quantidade nova)]
+    """
+    now = timezone.now()
+    StockMovement.objects.bulk_create([
+        StockMovement(product_id=product_id, delta=new - old, quantity_after=new, reason=reason, created_at=now)
+        for product_id, old, new in changes
+        if new != old
+    ])
+
+
+def sync_products(product_ids, reason='lot'):
+    """
+    Recalcula quantidade, validade, faixa e estoque baixo dos produtos a partir dos lotes.
+
+    Um produto sem nenhum lote com estoque fica com quantidade 0 (a validade é
+    mantida); se os lotes com estoque não têm validade, o produto fica sem.
+    Grava com bulk_update (sem sinais): o resumo de estoque, o cache de
+    produtos e as movimentações (com `reason`) são atualizados aqui.
+    Retorna quantos produtos mudaram.
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return 0
+
+    with transaction.atomic():
+        products = list(Product.objects.select_for_update().filter(pk__in=product_ids).order_by('pk'))
+        totals = {
+            row['product']: row
+            for row in Lot.objects.filter(product__in=product_ids).order_by().values('product').annotate(
+                units=Sum('quantity'),
+                earliest=Min('expiration_date', filter=Q(quantity__gt=0)),
+                stocked=Count('id', filter=Q(quantity__gt=0)),
+            )
+        }
+
+        now = timezone.now()
+        changed, before = [], {}
+        for product in products:
+            row = totals.get(product.pk, {})
+            quantity = row.get('units') or 0
+            if row.get('stocked'):
+                # Lotes com estoque, todos sem validade: o produto também fica sem
+                expiration_date = row['earliest']
+            else:
+                expiration_date = product.expiration_date
+            if (quantity, expiration_date) == (product.quantity, product.expiration_date):
+                continue
+            before[product.pk] = inventory_summary.snapshot(product)
+            product.quantity = quantity
+            product.expiration_date = expiration_date
+            product.expiry_bucket = expiry.bucket_for(expiration_date)
+            product.version += 1
+            product.updated_at = now
+            changed.append(product)
+
+        if not changed:
+            return 0
+        Product.objects.bulk_update(changed, ['quantity', 'expiration_date', 'expiry_bucket', 'version', 'updated_at'])
+        reorder.refresh_low_stock(Product.objects.filter(pk__in=[product.pk for product in changed]))
+        record_movements(
+            [(product.pk, before[product.pk]['quantity'], product.quantity) for product in changed],
+            reason,
+        )
+
+        if not inventory_summary.is_paused():
+            if len(changed) > SUMMARY_REBUILD_THRESHOLD:
+                transaction.on_commit(inventory_summary.rebuild)
+            else:
+                for product in changed:
+                    inventory_summary.apply_change(before[product.pk], inventory_summary.snapshot(product))
+        transaction.on_commit(invalidate_products)
+    return len(changed)
+
+
+def allocate(items, today=None, allow_expired=False):
+    """
+    Baixa estoque em ordem FEFO.
+
+    items: {product_id: quantidade}. Lotes vencidos são ignorados, a menos que
+    allow_expired=True; lotes sem validade saem por último. Tudo ou nada: se
+    algum produto não tiver estoque suficiente, levanta InsufficientStock e
+    nada é alterado.
+
+    Retorna a lista de baixas: {'product', 'lot', 'code', 'expiration_date', 'quantity'}.
+    """
+    today = today or expiry.local_today()
+    items = {product_id: quantity for product_id, quantity in items.items() if quantity > 0}
+    if not items:
+        return []
+
+    with transaction.atomic():
+        # Trava os produtos primeiro: serializa alocações concorrentes e a conversão para lotes
+        locked = set(Product.objects.select_for_update().filter(pk__in=items).values_list('pk', flat=True))
+        missing = {product_id: quantity for product_id, quantity in items.items() if product_id not in locked}
+        if missing:
+            raise InsufficientStock(missing)
+        open_lots(items)
+
+        lots = Lot.objects.select_for_update().filter(product__in=items, quantity__gt=0)
+        if not allow_expired:
+            lots = lots.filter(Q(expiration_date__isnull=True) | Q(expiration_date__gte=today))
+        lots = lots.order_by('product', F('expiration_date').asc(nulls_last=True), 'id')
+
+        remaining = dict(items)
+        now = timezone.now()
+        changed, allocations = [], []
+        for lot in lots:
+            take = min(lot.quantity, remaining[lot.product_id])
+            if not take:
+                continue
+            remaining[lot.product_id] -= take
+            lot.quantity -= take
+            lot.updated_at = now
+            changed.append(lot)
+            allocations.append({
+                'product': lot.product_id,
+                'lot': lot.pk,
+                'code': lot.code,
+                'expiration_date': lot.expiration_date,
+                'quantity': take,
+            })
+
+        shortages = {product_id: quantity for product_id, quantity in remaining.items() if quantity}
+        if shortages:
+            raise InsufficientStock(shortages)
+
+        Lot.objects.bulk_update(changed, ['quantity', 'updated_at'])
+        sync_products(items, reason='allocation')
+    return allocations
+
+
+def adjust_quantity(product_id, delta, versions=None):
+    """
+    quantity += delta em um único UPDATE condicional, sem SELECT antes e sem
+    travar a linha antes: a mesma instrução confere o estoque (não fica
+    negativo), a ausência de lotes e a versão (versions = as aceitas pelo
+    If-Match), incrementa a versão e recalcula o estoque baixo. A faixa de
+    validade não muda (depende só da data).
+
+    Na mesma transação registra a movimentação e aplica a diferença no resumo
+    de estoque. Retorna o produto atualizado; levanta Product.DoesNotExist,
+    LotControlled, StaleVersion ou InsufficientStock.
+    """
+    conditions = Q(pk=product_id) & ~Exists(Lot.objects.filter(product=OuterRef('pk')))
+    if delta < 0:
+        conditions &= Q(quantity__gte=-delta)
+    if versions is not None:
+        conditions &= Q(version__in=versions)
+
+    with transaction.atomic():
+        updated = Product.objects.filter(conditions).update(
+            quantity=F('quantity') + delta,
+            version=F('version') + 1,
+            # Avaliado com a quantidade anterior: anterior + delta < nível
+            is_low_stock=Case(
+                When(quantity__lt=reorder.level_expression() - delta, then=Value(True)),
+                default=Value(False),
+            ),
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            _adjust_failure(product_id, delta, versions)
+
+        # A linha já está travada pelo UPDATE até o fim da transação
+        product = Product.objects.get(pk=product_id)
+        record_movements([(product.pk, product.quantity - delta, product.quantity)], 'adjustment')
+        if not inventory_summary.is_paused():
+            after = inventory_summary.snapshot(product)
+            inventory_summary.apply_change({**after, 'quantity': product.quantity - delta}, after)
+        transaction.on_commit(invalidate_products)
+    return product
+
+
+def _adjust_failure(product_id, delta, versions):
+    """Por que o UPDATE condicional de adjust_quantity não alterou a linha"""
+    row = Product.objects.filter(pk=product_id).annotate(
+        has_lots=Exists(Lot.objects.filter(product=OuterRef('pk')))
+    ).values('quantity', 'version', 'has_lots').first()
+    if row is None:
+        raise Product.DoesNotExist(f"Produto {product_id} não encontrado")
+    if versions is not None and row['version'] not in versions:
+        raise StaleVersion(product_id)
+    if row['has_lots']:
+        raise LotControlled(product_id)
+    raise InsufficientStock({product_id: -delta - row['quantity']})
+
+
+def products_in_buckets(buckets, today=None, in_stock=True):
+    """
+    Produtos com estoque em alguma das faixas de validade, avaliados por lote.
+
+    Anota lot_quantity (unidades nessas faixas) e lot_expiration (validade mais
+    próxima nessas faixas). Produtos sem lotes entram pela coluna expiry_bucket
+    (com in_stock=False, mesmo sem estoque), com a própria quantidade e validade.
+    """
+    today = today or expiry.local_today()
+    window = Lot.objects.filter(bucket_filter(buckets, today), product=OuterRef('pk'), quantity__gt=0).order_by()
+    has_lots = Exists(Lot.objects.filter(product=OuterRef('pk')))
+    window_totals = window.values('product').annotate(units=Sum('quantity'), earliest=Min('expiration_date'))
+
+    legacy = Q(expiry_bucket__in=buckets)
+    if in_stock:
+        legacy &= Q(quantity__gt=0)
+
+    return Product.objects.annotate(has_lots=has_lots).filter(
+        Q(Exists(window)) | (Q(has_lots=False) & legacy)
+    ).annotate(
+        lot_quantity=Case(
+            When(has_lots=True, then=Coalesce(Subquery(window_totals.values('units')), Value(0))),
+            default=F('quantity'),
+            output_field=IntegerField(),
+        ),
+        lot_expiration=Coalesce(Subquery(window_totals.values('earliest')), F('expiration_date')),
+    )
+
+
+def bucket_units(today=None):
+    """
+    Unidades em estoque por faixa de validade, somando lote a lote
+    (produtos sem lotes entram com a própria quantidade). Duas consultas agrupadas.
+    """
+    today = today or expiry.local_today()
+    units = defaultdict(int)
+    lot_sums = Lot.objects.filter(quantity__gt=0).aggregate(**{
+        bucket: Sum('quantity', filter=bucket_filter([bucket], today))
+        for bucket, _ in expiry.BUCKET_CHOICES
+    })
+    for bucket, total in lot_sums.items():
+        units[bucket] += total or 0
+
+    legacy = (
+        Product.objects.filter(quantity__gt=0)
+        .exclude(Exists(Lot.objects.filter(product=OuterRef('pk'))))
+        .order_by().values('expiry_bucket').annotate(total=Sum('quantity'))
+    )
+    for row in legacy:
+        units[row['expiry_bucket']] += row['total'] or 0
+    return {bucket: units[bucket] for bucket, _ in expiry.BUCKET_CHOICES}
@@ -0,0 +1,152 @@
+# core/inventory_summary.py
+
+"""
+Manutenção da tabela materializada InventorySummary (totais por categoria e por marca).
+
+- Incremental: os sinais de Product (core.signals) aplicam a diferença entre o
+  estado anterior e o novo de cada produto salvo/apagado, com UPDATE ... SET
+  campo = campo + delta.
+- Completa: rebuild() recalcula tudo com duas consultas agrupadas. Roda toda
+  noite (task rebuild_inventory_summary), o que também move para "vencidos" os
+  produtos que venceram no dia, e após operações em massa que não disparam
+  sinais (bulk_create, queryset.update(), exclusão de categoria/marca).
+"""
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import expiry
+from .models import InventorySummary, Product
+
+# Dimensão do resumo -> campo do produto
+DIMENSIONS = {
+    'category': 'category_id',
+    'brand': 'brand_id',
+}
+METRICS = ('products_count', 'units', 'stock_value', 'expired_count', 'expired_units', 'expired_value')
+SNAPSHOT_FIELDS = ('category_id', 'brand_id', 'price', 'quantity', 'expiration_date')
+
+CENTS = Decimal('0.01')
+
+_state = threading.local()
+
+
+@contextmanager
+def paused():
+    """
+    Suspende a manutenção incremental nesta thread (ex.: apagar o catálogo inteiro).
+    Quem usa deve chamar rebuild() no final.
+    """
+    previous = getattr(_state, 'paused', False)
+    _state.paused = True
+    try:
+        yield
+    finally:
+        _state.paused = previous
+
+
+def is_paused():
+    return getattr(_state, 'paused', False)
+
+
+def snapshot(product):
+    """Valores do produto que entram no resumo"""
+    return {field: getattr(product, field) for field in SNAPSHOT_FIELDS}
+
+
+def saved_snapshot(pk):
+    """Estado atualmente gravado no banco (antes de um save)"""
+    return Product.objects.filter(pk=pk).values(*SNAPSHOT_FIELDS).first()
+
+
+def contribution(row, today):
+    """Quanto um produto soma em cada métrica"""
+    quantity = row['quantity'] or 0
+    value = (Decimal(str(row['price'] or 0)) * quantity).quantize(CENTS)
+    expired = row['expiration_date'] is not None and row['expiration_date'] < today
+    return {
+        'products_count': 1,
+        'units': quantity,
+        'stock_value': value,
+        'expired_count': 1 if expired else 0,
+        'expired_units': quantity if expired else 0,
+        'expired_value': value if expired else Decimal(0),
+    }
+
+
+def apply_change(old, new, today=None):
+    """
+    Atualiza o resumo com a troca de estado de um produto.
+
+    old/new: snapshot() antes e depois (None para produto criado/apagado).
+    """
+    today = today or expiry.local_today()
+    deltas = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+    for sign, row in ((-1, old), (1, new)):
+        if row is None:
+            continue
+        amounts = contribution(row, today)
+        for dimension, field in DIMENSIONS.items():
+            delta = deltas[(dimension, row[field] or 0)]
+            for metric in METRICS:
+                delta[metric] += sign * amounts[metric]
+
+    with transaction.atomic():
+        for (dimension, key), delta in deltas.items():
+            changes = {metric: F(metric) + amount for metric, amount in delta.items() if amount}
+            if not changes:
+                continue
+            rows = InventorySummary.objects.filter(dimension=dimension, key=key)
+            if not rows.update(**changes, updated_at=timezone.now()):
+                InventorySummary.objects.get_or_create(dimension=dimension, key=key)
+                rows.update(**changes, updated_at=timezone.now())
+
+
+def compute_rows(today=None, dimensions=None):
+    """Recalcula as linhas do resumo (sem gravar); dimensions limita a categoria/marca"""
+    today = today or expiry.local_today()
+    expired = Q(expiration_date__lt=today)
+    money = DecimalField(max_digits=16, decimal_places=2)
+    value = F('price') * F('quantity')
+
+    rows = []
+    for dimension, field in DIMENSIONS.items():
+        if dimensions is not None and dimension not in dimensions:
+            continue
+        grouped = Product.objects.order_by().values(field).annotate(
+            products_count=Count('id'),
+            units=Coalesce(Sum('quantity'), 0),
+            stock_value=Coalesce(Sum(value, output_field=money), Decimal(0), output_field=money),
+            expired_count=Count('id', filter=expired),
+            expired_units=Coalesce(Sum('quantity', filter=expired), 0),
+            expired_value=Coalesce(Sum(value, filter=expired, output_field=money), Decimal(0), output_field=money),
+        )
+        for group in grouped:
+            group['stock_value'] = Decimal(group['stock_value']).quantize(CENTS)
+            group['expired_value'] = Decimal(group['expired_value']).quantize(CENTS)
+            rows.append(InventorySummary(
+                dimension=dimension,
+                key=group[field] or 0,
+                **{metric: group[metric] for metric in METRICS},
+            ))
+    return rows
+
+
+def replace_rows(rows):
+    """Substitui o conteúdo da tabela pelas linhas recalculadas"""
+    with transaction.atomic():
+        InventorySummary.objects.all().delete()
+        InventorySummary.objects.bulk_create(rows)
+    return len(rows)
+
+
+def rebuild(today=None):
+    """Reconstrói o resumo inteiro; retorna a quantidade de linhas"""
+    return replace_rows(compute_rows(today))
@@ -0,0 +1,127 @@
+# core/lookup_cache.py
+
+"""
+Cache local (por processo) das tabelas de referência Category e Brand.
+
+São tabelas pequenas e lidas o tempo todo: nome da categoria em cada produto
+serializado, nome da marca em cada linha dos alertas, busca por nome em cada
+linha importada no admin. Em vez de um JOIN/SELECT por uso, cada processo
+guarda o mapa id <-> nome inteiro em memória.
+
+Invalidação:
+- no próprio processo, os sinais de post_save/post_delete limpam o mapa na hora
+  (ver core.signals);
+- nos demais processos (workers do gunicorn, qcluster), o mapa é recarregado
+  quando a versão do grupo no cache compartilhado muda (core.cache_utils).
+  A versão é consultada no máximo a cada CHECK_INTERVAL segundos.
+
+Dentro de uma transação, o que é lido do banco só entra no mapa depois do
+COMMIT (transaction.on_commit): a leitura enxerga linhas ainda não
+confirmadas, que somem se a transação for desfeita (ex.: a prévia "dry run"
+da importação do admin), e o mapa ficaria com um id que não existe.
+"""
+
+import threading
+import time
+
+from django.db import transaction
+
+from .cache_utils import BRANDS, CATEGORIES, get_cache_version
+from .models import Brand, Category
+
+# Intervalo (segundos) entre consultas à versão no cache compartilhado
+CHECK_INTERVAL = 5
+
+
+class LookupCache:
+    """Mapa id <-> nome de um modelo com campo `name` único"""
+
+    def __init__(self, model, group):
+        self.model = model
+        self.group = group
+        self._by_id = None
+        self._by_name = None
+        self._version = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def __deepcopy__(self, memo):
+        # Instância única por processo (o import-export copia os widgets que a referenciam)
+        return self
+
+    def name(self, pk):
+        """Nome do registro (None para pk vazio ou inexistente)"""
+        if pk is None:
+            return None
+        by_id = self._maps()[0]
+        if pk not in by_id:
+            by_id = self._on_miss(id=pk)[0]
+        return by_id.get(pk)
+
+    def id_for(self, name):
+        """ID do registro com esse nome (None se não existir)"""
+        by_name = self._maps()[1]
+        if name not in by_name:
+            by_name = self._on_miss(name=name)[1]
+        return by_name.get(name)
+
+    def clear(self):
+        """Descarta o mapa deste processo (recarregado no próximo uso)"""
+        with self._lock:
+            self._by_id = None
+            self._by_name = None
+
+    def _maps(self):
+        by_id, by_name = self._by_id, self._by_name
+        if by_id is not None and time.monotonic() - self._checked_at < CHECK_INTERVAL:
+            return by_id, by_name
+        return self._refresh()
+
+    def _refresh(self):
+        """Recarrega o mapa se ele ainda não existe ou se outro processo alterou a tabela"""
+        with self._lock:
+            version = get_cache_version(self.group)
+            if self._by_id is None or version != self._version:
+                rows = list(self.model.objects.values_list('id', 'name'))
+                by_id = dict(rows)
+                by_name = {name: pk for pk, name in rows}
+                if transaction.get_connection().in_atomic_block:
+                    # Pode conter linhas ainda não confirmadas: guarda só depois do COMMIT
+                    transaction.on_commit(lambda: self._store(by_id, by_name, version))
+                    return by_id, by_name
+                self._by_id, self._by_name, self._version = by_id, by_name, version
+            self._checked_at = time.monotonic()
+            return self._by_id, self._by_name
+
+    def _store(self, by_id, by_name, version):
+        with self._lock:
+            self._by_id, self._by_name, self._version = by_id, by_name, version
+            self._checked_at = time.monotonic()
+
+    def _on_miss(self, **lookup):
+        """
+        Registro fora do mapa: pode ter sido criado por outro processo há menos
+        de CHECK_INTERVAL segundos (ou por bulk_create, que não dispara sinais).
+        """
+        self._checked_at = 0
+        by_id, by_name = self._refresh()
+        key = next(iter(lookup.values()))
+        if key in by_id or key in by_name:
+            return by_id, by_name
+        row = self.model.objects.filter(**lookup).values_list('id', 'name').first()
+        if row is not None:
+            by_id = {**by_id, row[0]: row[1]}
+            by_name = {**by_name, row[1]: row[0]}
+            # A linha pode ser da transação em andamento: entra no mapa só depois do COMMIT
+            transaction.on_commit(lambda: self._add(*row))
+        return by_id, by_name
+
+    def _add(self, pk, name):
+        with self._lock:
+            if self._by_id is not None:
+                self._by_id = {**self._by_id, pk: name}
+                self._by_name = {**self._by_name, name: pk}
+
+
+categories = LookupCache(Category, CATEGORIES)
+brands = LookupCache(Brand, BRANDS)
@@ -27,8 +27,8 @@ class Command(BaseCommand):
         parser.add_argument(
             '--min-quantity',
             type=int,
-            default=2,
-            help='A quantidade mínima para o alerta de estoque baixo. Padrão: 2.'
+            default=None,
+            help='Limite único para o alerta de estoque baixo. Padrão: o nível de reposição de cada produto.'
         )
 
     def handle(self, *args, **options):
@@ -57,13 +57,28 @@ class Command(BaseCommand):
         # --- Funções das tarefas ---
         expiring_func = 'core.tasks.check_expiring_products_and_notify'
         low_stock_func = 'core.tasks.check_low_stock_and_notify'
+        summary_func = 'core.tasks.rebuild_inventory_summary'
+        snapshot_func = 'core.tasks.record_stock_snapshot'
+        rollover_func = 'core.tasks.rollover_expiry_buckets'
+        forecast_func = 'core.tasks.refresh_forecasts'
+        tombstone_func = 'core.tasks.purge_product_tombstones'
 
         # --- Deletar agendamentos antigos ---
         self.stdout.write("\n🗑️  Deletando agendamentos antigos...")
         deleted_expiring, _ = Schedule.objects.filter(func=expiring_func).delete()
         deleted_low_stock, _ = Schedule.objects.filter(func=low_stock_func).delete()
+        deleted_summary, _ = Schedule.objects.filter(func=summary_func).delete()
+        deleted_snapshot, _ = Schedule.objects.filter(func=snapshot_func).delete()
+        deleted_rollover, _ = Schedule.objects.filter(func=rollover_func).delete()
+        deleted_forecast, _ = Schedule.objects.filter(func=forecast_func).delete()
+        deleted_tombstone, _ = Schedule.objects.filter(func=tombstone_func).delete()
         self.stdout.write(f"   - {deleted_expiring} agendamento(s) de validade removido(s).")
         self.stdout.write(f"   - {deleted_low_stock} agendamento(s) de estoque baixo removido(s).")
+        self.stdout.write(f"   - {deleted_summary} agendamento(s) do resumo de estoque removido(s).")
+        self.stdout.write(f"   - {deleted_snapshot} agendamento(s) do histórico de estoque removido(s).")
+        self.stdout.write(f"   - {deleted_rollover} agendamento(s) da virada das faixas de validade removido(s).")
+        self.stdout.write(f"   - {deleted_forecast} agendamento(s) das previsões de estoque removido(s).")
+        self.stdout.write(f"   - {deleted_tombstone} agendamento(s) da limpeza de produtos excluídos removido(s).")
 
         # --- Criar novos agendamentos ---
         self.stdout.write("\n✨ Criando novos agendamentos...")
@@ -82,12 +97,92 @@ class Command(BaseCommand):
         Schedule.objects.create(
             name='Notificação de estoque baixo',
             func=low_stock_func,
-            kwargs={'min_quantity': min_quantity},
+            kwargs={'min_quantity': min_quantity} if min_quantity is not None else {},
             schedule_type=Schedule.DAILY,
             next_run=next_run_datetime,
             repeats=-1  # Infinito
         )
-        self.stdout.write(self.style.SUCCESS(f"   ✅ Agendamento de estoque baixo criado para rodar diariamente às {schedule_time_obj.strftime('%H:%M')} (limite: < {min_quantity} unidades)."))
+        self.stdout.write(self.style.SUCCESS(f"   ✅ Agendamento de estoque baixo criado para rodar diariamente às {schedule_time_obj.strftime('%H:%M')} (limite: {f'< {min_quantity} unidades' if min_quantity is not None else 'nível de reposição de cada produto'})."))
+
+        # 3. Virada diária das faixas de validade (antes das demais tasks noturnas)
+        rollover_time_obj = time(0, 1)
+        rollover_next_run = timezone.make_aware(datetime.combine(now.date(), rollover_time_obj))
+        if rollover_next_run < now:
+            rollover_next_run += timedelta(days=1)
+        Schedule.objects.create(
+            name='Virada das faixas de validade',
+            func=rollover_func,
+            schedule_type=Schedule.DAILY,
+            next_run=rollover_next_run,
+            repeats=-1  # Infinito
+        )
+        self.stdout.write(self.style.SUCCESS(f"   ✅ Agendamento da virada das faixas de validade criado para rodar diariamente às {rollover_time_obj.strftime('%H:%M')}."))
+
+        # 4. Reconstrução noturna do resumo de estoque (logo após a meia-noite,
+        #    quando os produtos do dia anterior passam a contar como vencidos)
+        summary_time_obj = time(0, 5)
+        summary_next_run = timezone.make_aware(datetime.combine(now.date(), summary_time_obj))
+        if summary_next_run < now:
+            summary_next_run += timedelta(days=1)
+        Schedule.objects.create(
+            name='Reconstrução do resumo de estoque',
+            func=summary_func,
+            schedule_type=Schedule.DAILY,
+            next_run=summary_next_run,
+            repeats=-1  # Infinito
+        )
+        self.stdout.write(self.style.SUCCESS(f"   ✅ Agendamento do resumo de estoque criado para rodar diariamente às {summary_time_obj.strftime('%H:%M')}."))
+
+        # 5. Foto diária do estoque (fechamento do dia) para o histórico
+        snapshot_time_obj = time(23, 50)
+        snapshot_next_run = timezone.make_aware(datetime.combine(now.date(), snapshot_time_obj))
+        if snapshot_next_run < now:
+            snapshot_next_run += timedelta(days=1)
+        Schedule.objects.create(
+            name='Foto diária do estoque',
+            func=snapshot_func,
+            schedule_type=Schedule.DAILY,
+            next_run=snapshot_next_run,
+            repeats=-1  # Infinito
+        )
+        self.stdout.write(self.style.SUCCESS(f"   ✅ Agendamento do histórico de estoque criado para rodar diariamente às {snapshot_time_obj.strftime('%H:%M')}."))
+
+        # 6. Previsões de estoque: incremental de hora em hora e completa toda noite
+        #    (depois da virada das faixas, quando os prazos de validade encurtam)
+        Schedule.objects.create(
+            name='Previsões de estoque (incremental)',
+            func=forecast_func,
+            schedule_type=Schedule.HOURLY,
+            next_run=now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1),
+            repeats=-1  # Infinito
+        )
+        forecast_time_obj = time(0, 10)
+        forecast_next_run = timezone.make_aware(datetime.combine(now.date(), forecast_time_obj))
+        if forecast_next_run < now:
+            forecast_next_run += timedelta(days=1)
+        Schedule.objects.create(
+            name='Previsões de estoque (completa)',
+            func=forecast_func,
+            kwargs={'full': True},
+            schedule_type=Schedule.DAILY,
+            next_run=forecast_next_run,
+            repeats=-1  # Infinito
+        )
+        self.stdout.write(self.style.SUCCESS(f"   ✅ Agendamentos das previsões de estoque criados: de hora em hora e completo diariamente às {forecast_time_obj.strftime('%H:%M')}."))
+
+        # 7. Limpeza dos registros de exclusão antigos (feed de alterações do PWA)
+        tombstone_time_obj = time(3, 0)
+        tombstone_next_run = timezone.make_aware(datetime.combine(now.date(), tombstone_time_obj))
+        if tombstone_next_run < now:
+            tombstone_next_run += timedelta(days=1)
+        Schedule.objects.create(
+            name='Limpeza de produtos excluídos',
+            func=tombstone_func,
+            schedule_type=Schedule.DAILY,
+            next_run=tombstone_next_run,
+            repeats=-1  # Infinito
+        )
+        self.stdout.write(self.style.SUCCESS(f"   ✅ Agendamento da limpeza de produtos excluídos criado para rodar diariamente às {tombstone_time_obj.strftime('%H:%M')}."))
 
         self.stdout.write(self.style.SUCCESS("\n" + "=" * 60))
         self.stdout.write(self.style.SUCCESS("🎉 Processo concluído! Reinicie o QCluster para aplicar as mudanças."))
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+"""
+Comando para gerar um catálogo sintético reprodutível (10 mil a 5 milhões de produtos)
+Execute: python manage.py generate_catalog --products 100000 --seed 42
+
+Sem --clear, uma nova execução com a mesma semente continua a sequência do
+catálogo já gerado (os SKUs seguem únicos).
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core import expiry, inventory_summary, reorder
+from core.cache_utils import invalidate_brands, invalidate_categories, invalidate_products, invalidate_skus
+from core.models import Brand, Category, Product
+from core.synthetic import SyntheticCatalog
+
+
+class Command(BaseCommand):
+    help = 'Gera um catálogo sintético reprodutível com bulk inserts (para testes de desempenho)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--products',
+            type=int,
+            default=10000,
+            help='Quantidade de produtos a gerar. Padrão: 10000.'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Semente do gerador. A mesma semente sempre gera o mesmo catálogo. Padrão: 42.'
+        )
+        parser.add_argument(
+            '--categories',
+            type=int,
+            default=20,
+            help='Quantidade de categorias. Padrão: 20.'
+        )
+        parser.add_argument(
+            '--brands',
+            type=int,
+            default=100,
+            help='Quantidade de marcas. Padrão: 100.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Quantidade de produtos por INSERT. Padrão: 5000.'
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Apaga TODOS os produtos, categorias e marcas antes de gerar',
+        )
+
+    def handle(self, *args, **options):
+        total = options['products']
+        batch_size = options['batch_size']
+        if total <= 0 or batch_size <= 0:
+            raise CommandError('--products e --batch-size devem ser maiores que zero.')
+
+        catalog = SyntheticCatalog(
+            seed=options['seed'],
+            categories=options['categories'],
+            brands=options['brands'],
+        )
+
+        self.stdout.write("=" * 60)
+        self.stdout.write(self.style.SUCCESS(f"🏭 Gerando catálogo sintético: {total} produto(s) (seed={options['seed']})"))
+        self.stdout.write("=" * 60)
+
+        if options['clear']:
+            self.stdout.write("🗑️  Apagando catálogo atual...")
+            # O resumo de estoque é reconstruído no final, não produto a produto
+            with inventory_summary.paused():
+                Product.objects.all().delete()
+                Category.objects.all().delete()
+                Brand.objects.all().delete()
+
+        Category.objects.bulk_create(
+            [Category(name=name) for name in catalog.category_names()],
+            ignore_conflicts=True,
+        )
+        Brand.objects.bulk_create(
+            [Brand(name=name) for name in catalog.brand_names()],
+            ignore_conflicts=True,
+        )
+        category_ids = list(
+            Category.objects.filter(name__in=catalog.category_names()).order_by('name').values_list('id', flat=True)
+        )
+        brand_ids = list(
+            Brand.objects.filter(name__in=catalog.brand_names()).order_by('name').values_list('id', flat=True)
+        )
+        self.stdout.write(f"   📂 {len(category_ids)} categoria(s), 🏷️ {len(brand_ids)} marca(s)")
+
+        # Produtos desta semente já no banco: a sequência continua depois deles (SKU único)
+        offset = Product.objects.filter(sku__startswith=catalog.sku_prefix()).count()
+        if offset:
+            self.stdout.write(f"   ➕ {offset} produto(s) desta semente já existe(m): continuando a sequência")
+
+        today = expiry.local_today()
+        started = time.perf_counter()
+        created = 0
+        while created < total:
+            size = min(batch_size, total - created)
+            # bulk_create não chama Product.save(): a faixa de validade é calculada aqui
+            products = [
+                Product(**data, expiry_bucket=expiry.bucket_for(data['expiration_date'], today))
+                for data in catalog.iter_products(size, category_ids, brand_ids, start=offset + created)
+            ]
+            clash = Product.objects.filter(sku__in=[product.sku for product in products]).values_list('sku', flat=True).first()
+            if clash:
+                raise CommandError(
+                    f"O SKU {clash} já existe no banco ({created} produto(s) inserido(s) até aqui). "
+                    "Use --clear ou outra --seed."
+                )
+            with transaction.atomic():
+                Product.objects.bulk_create(products, batch_size=batch_size)
+            created += size
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"   ✅ {created}/{total} produto(s) inserido(s) ({created / elapsed:.0f} produtos/s)")
+
+        # bulk_create não dispara sinais: invalida os caches manualmente
+        reorder.refresh_low_stock()
+        invalidate_products()
+        invalidate_categories()
+        invalidate_brands()
+        invalidate_skus()
+        self.stdout.write("📊 Reconstruindo o resumo de estoque...")
+        inventory_summary.rebuild()
+
+        self.stdout.write()
+        self.stdout.write(self.style.SUCCESS(
+            f"🎉 Catálogo gerado em {time.perf_counter() - started:.1f}s. Total no banco: {Product.objects.count()}"
+        ))
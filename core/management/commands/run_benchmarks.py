@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+"""
+Comando para medir o desempenho dos principais caminhos do sistema
+Execute: python manage.py run_benchmarks --repeat 5 --output bench.json
+
+Gere antes um catálogo com: python manage.py generate_catalog --products 100000
+Use --compare com o JSON de uma versão anterior para acompanhar regressões.
+
+Por que um comando e não pytest-benchmark/asv: o projeto não usa pytest, e os
+cenários precisam do Django configurado e de um banco já populado (às vezes
+com milhões de produtos), que uma suíte desse tipo recriaria a cada execução.
+O comando roda contra qualquer banco (inclusive o PostgreSQL de produção
+restaurado), repete cada cenário (mediana/p95/mínimo) e grava/compara JSON
+entre versões, que é o que o asv ofereceria.
+"""
+
+import contextlib
+import io
+import json
+import platform
+import statistics
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from core.cache_utils import invalidate_products
+from core.fast_json import ORJSONRenderer
+from core.models import Brand, Category, Product
+from core.synthetic import SyntheticCatalog
+
+
+def _render_view(view, path, params=None, **kwargs):
+    """Executa a view e renderiza a resposta (inclui o custo de serialização)"""
+    request = APIRequestFactory().get(path, params or {})
+    response = view(request, **kwargs)
+    response.render()
+    return response
+
+
+def _post_view(view, path, data, **kwargs):
+    """Como _render_view, com POST em JSON"""
+    request = APIRequestFactory().post(path, data, format='json')
+    response = view(request, **kwargs)
+    response.render()
+    return response
+
+
+@contextlib.contextmanager
+def _rollback():
+    """Executa o bloco dentro de uma transação que é sempre desfeita"""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+@contextlib.contextmanager
+def _quiet_task():
+    """Silencia os prints das tasks e evita envio real de e-mails"""
+    with override_settings(
+        EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+        NOTIFICATION_EMAILS=['benchmark@example.com'],
+    ), contextlib.redirect_stdout(io.StringIO()), _rollback():
+        yield
+
+
+class Command(BaseCommand):
+    help = 'Executa a suíte de benchmarks (views, tasks de alerta e importação do admin)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Quantas vezes cada cenário é medido. Padrão: 5.'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=1,
+            help='Execuções de aquecimento (não medidas). Padrão: 1.'
+        )
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            dest='scenarios',
+            help='Executa apenas o(s) cenário(s) informado(s). Pode ser repetido.'
+        )
+        parser.add_argument(
+            '--import-rows',
+            type=int,
+            default=1000,
+            help='Quantidade de linhas usadas no benchmark de importação do admin. Padrão: 1000.'
+        )
+        parser.add_argument(
+            '--output',
+            help='Arquivo JSON onde os resultados serão gravados'
+        )
+        parser.add_argument(
+            '--compare',
+            help='Arquivo JSON de uma execução anterior para comparar os tempos'
+        )
+
+    def get_scenarios(self, options):
+        from core import views
+        from core.tasks import check_expiring_products_and_notify, check_low_stock_and_notify, refresh_forecasts
+
+        product_list = views.ProductListCreateView.as_view()
+        search_term = Product.objects.values_list('name', flat=True).first() or 'Leite'
+        search_term = search_term.split()[0]
+        import_dataset = self._build_import_dataset(options['import_rows'])
+        # Leituras de código de barras: 100 SKUs existentes + 5 inexistentes por lote
+        scan_codes = list(Product.objects.exclude(sku=None).values_list('sku', flat=True)[:100]) + [
+            f"000000000{i:04d}" for i in range(5)
+        ]
+
+        def admin_import():
+            from core.admin import ProductResource
+            result = ProductResource().import_data(import_dataset, dry_run=True)
+            if result.has_errors():
+                raise CommandError('A importação de benchmark gerou erros.')
+
+        # Renderização (JSON) da lista completa já serializada: orjson x json padrão
+        product_data = []
+
+        def render_product_list(renderer_class):
+            def runner():
+                if not product_data:
+                    from core.serializers import ProductSerializer
+                    product_data.append(ProductSerializer(Product.objects.all(), many=True).data)
+                renderer_class().render(product_data[0], 'application/json')
+            return runner
+
+        # Compressão da lista completa já renderizada (CPU por requisição e bytes enviados)
+        rendered = []
+
+        def compress_product_list(encoding):
+            from django.http import HttpResponse
+            from core.middleware import CompressionMiddleware
+
+            middleware = CompressionMiddleware(lambda request: None)
+
+            def runner():
+                if not rendered:
+                    render_product_list(ORJSONRenderer)()
+                    rendered.append(ORJSONRenderer().render(product_data[0], 'application/json'))
+                request = APIRequestFactory().get('/api/products/', HTTP_ACCEPT_ENCODING=encoding)
+                response = middleware.process_response(request, HttpResponse(rendered[0], content_type='application/json'))
+                return {'bytes_raw': len(rendered[0]), 'bytes_sent': len(response.content)}
+            return runner
+
+        def dashboard(cold):
+            def runner():
+                if cold:
+                    # Nova versão do cache de produtos: a rodada recalcula as contagens
+                    invalidate_products()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    _render_view(views.dashboard_stats, '/api/dashboard/stats/')
+            return runner
+
+        def run_task(task, **kwargs):
+            def runner():
+                with _quiet_task():
+                    task(**kwargs)
+            return runner
+
+        return {
+            # 'dashboard_stats' mede o acerto de cache; '_cold' recalcula a cada rodada
+            'dashboard_stats': dashboard(cold=False),
+            'dashboard_stats_cold': dashboard(cold=True),
+            'product_list': lambda: _render_view(product_list, '/api/products/'),
+            'product_search': lambda: _render_view(product_list, '/api/products/', {'search': search_term}),
+            'render_product_list_json': render_product_list(JSONRenderer),
+            'render_product_list_orjson': render_product_list(ORJSONRenderer),
+            'compress_product_list_gzip': compress_product_list('gzip'),
+            'compress_product_list_br': compress_product_list('br, gzip'),
+            'expiring_products': lambda: _render_view(views.ExpiringProductsView.as_view(), '/api/products/expiring-soon/'),
+            'expired_products': lambda: _render_view(views.ExpiredProductsView.as_view(), '/api/products/expired/'),
+            'at_risk_products': lambda: _render_view(views.AtRiskProductsView.as_view(), '/api/products/at-risk/'),
+            'sku_lookup': lambda: [
+                _render_view(views.product_lookup, '/api/products/lookup/', {'code': code}) for code in scan_codes
+            ],
+            'sku_lookup_batch': lambda: _post_view(views.product_lookup, '/api/products/lookup/', {'codes': scan_codes}),
+            'task_check_expiring': run_task(check_expiring_products_and_notify),
+            'task_check_low_stock': run_task(check_low_stock_and_notify),
+            'task_check_low_stock_legacy': run_task(check_low_stock_and_notify, min_quantity=2),
+            'task_refresh_forecasts': run_task(refresh_forecasts, full=True),
+            'admin_import': admin_import,
+        }
+
+    def _build_import_dataset(self, rows):
+        import tablib
+
+        catalog = SyntheticCatalog(seed=7)
+        category_names = dict(Category.objects.values_list('id', 'name'))
+        brand_names = dict(Brand.objects.values_list('id', 'name'))
+        dataset = tablib.Dataset(headers=[
+            'id', 'name', 'Categoria', 'Marca', 'price', 'description', 'expiration_date', 'quantity', 'batch'
+        ])
+        for data in catalog.iter_products(rows, list(category_names), list(brand_names)):
+            dataset.append([
+                '',
+                data['name'],
+                category_names.get(data['category_id'], ''),
+                brand_names.get(data['brand_id'], ''),
+                data['price'],
+                data['description'] or '',
+                data['expiration_date'].isoformat() if data['expiration_date'] else '',
+                data['quantity'],
+                data['batch'],
+            ])
+        return dataset
+
+    def measure(self, func, repeat, warmup):
+        for _ in range(warmup):
+            func()
+        timings = []
+        metrics = {}
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            timings.append((time.perf_counter() - start) * 1000)
+            # Cenários podem devolver métricas extras (ex.: bytes enviados)
+            if isinstance(result, dict):
+                metrics = result
+        timings.sort()
+        return {
+            **metrics,
+            'min_ms': round(timings[0], 3),
+            'median_ms': round(statistics.median(timings), 3),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+            'max_ms': round(timings[-1], 3),
+            'runs': repeat,
+        }
+
+    def handle(self, *args, **options):
+        if options['repeat'] <= 0:
+            raise CommandError('--repeat deve ser maior que zero.')
+
+        scenarios = self.get_scenarios(options)
+        selected = options['scenarios'] or list(scenarios)
+        unknown = [name for name in selected if name not in scenarios]
+        if unknown:
+            raise CommandError(f"Cenário(s) desconhecido(s): {', '.join(unknown)}. Disponíveis: {', '.join(scenarios)}")
+
+        catalog_size = Product.objects.count()
+        self.stdout.write("=" * 70)
+        self.stdout.write(self.style.SUCCESS(f"⏱️  Benchmarks - catálogo com {catalog_size} produto(s)"))
+        self.stdout.write("=" * 70)
+
+        results = {}
+        for name in selected:
+            results[name] = self.measure(scenarios[name], options['repeat'], options['warmup'])
+            stats = results[name]
+            self.stdout.write(
+                f"   {name:<24} mediana {stats['median_ms']:>10.2f} ms   "
+                f"p95 {stats['p95_ms']:>10.2f} ms   min {stats['min_ms']:>10.2f} ms"
+                + (f"   {stats['bytes_raw']} → {stats['bytes_sent']} bytes" if 'bytes_sent' in stats else '')
+            )
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'catalog_size': catalog_size,
+            'database': connection.vendor,
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'results': results,
+        }
+
+        if options['compare']:
+            self.compare(options['compare'], report)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fp:
+                json.dump(report, fp, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"\n💾 Resultados gravados em {options['output']}"))
+
+    def compare(self, path, report):
+        with open(path, encoding='utf-8') as fp:
+            baseline = json.load(fp)
+
+        self.stdout.write()
+        self.stdout.write(f"📊 Comparação com {path} (catálogo: {baseline.get('catalog_size')} produto(s))")
+        for name, stats in report['results'].items():
+            previous = baseline.get('results', {}).get(name)
+            if not previous or not previous.get('median_ms'):
+                self.stdout.write(f"   {name:<24} sem referência")
+                continue
+            change = (stats['median_ms'] - previous['median_ms']) / previous['median_ms'] * 100
+            line = f"   {name:<24} {previous['median_ms']:>10.2f} ms → {stats['median_ms']:>10.2f} ms ({change:+.1f}%)"
+            if change > 10:
+                self.stdout.write(self.style.ERROR(line))
+            elif change < -10:
+                self.stdout.write(self.style.SUCCESS(line))
+            else:
+                self.stdout.write(line)
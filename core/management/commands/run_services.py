@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+"""
+Supervisor dos processos de produção: Gunicorn (web) + QCluster (tasks)
+Execute: python manage.py run_services
+
+- Workers/threads do Gunicorn: WEB_CONCURRENCY / WEB_THREADS (padrão: 2 x 4)
+- Reinicia o QCluster automaticamente se ele cair (com backoff)
+- No SIGTERM/SIGINT repassa o sinal aos dois processos e espera as tasks
+  em andamento terminarem antes de encerrar
+"""
+
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Intervalo máximo (segundos) entre tentativas de reiniciar o QCluster
+MAX_BACKOFF = 60
+# Tempo (segundos) que o QCluster precisa ficar de pé para o backoff ser zerado
+STABLE_AFTER = 60
+
+
+def default_web_workers():
+    """
+    Padrão fixo e pequeno (2): em contêiner os.cpu_count() informa as CPUs do
+    host, não o limite do plano, e (2 x CPUs) + 1 workers estouram a memória
+    (512 MB no plano free do Render) e as conexões do banco.
+    """
+    return int(os.environ.get('WEB_CONCURRENCY', 2))
+
+
+def default_web_threads():
+    return int(os.environ.get('WEB_THREADS', 4))
+
+
+class Command(BaseCommand):
+    help = 'Inicia e supervisiona Gunicorn e QCluster (reinício automático e encerramento gracioso)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--bind',
+            default=f"0.0.0.0:{os.environ.get('PORT', '8000')}",
+            help='Endereço do Gunicorn. Padrão: 0.0.0.0:$PORT.'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=default_web_workers(),
+            help='Workers do Gunicorn. Padrão: WEB_CONCURRENCY ou 2.'
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=default_web_threads(),
+            help='Threads por worker (apenas WSGI). Padrão: WEB_THREADS ou 4.'
+        )
+        parser.add_argument(
+            '--asgi',
+            action='store_true',
+            default=os.environ.get('ASGI_ENABLED', 'False').lower() == 'true',
+            help='Serve asgi.py com workers uvicorn (padrão: ASGI_ENABLED).'
+        )
+        parser.add_argument(
+            '--no-qcluster',
+            action='store_true',
+            default=os.environ.get('RUN_QCLUSTER', 'True').lower() != 'true',
+            help='Não inicia o QCluster (quando ele roda em um serviço separado).'
+        )
+        parser.add_argument(
+            '--graceful-timeout',
+            type=int,
+            default=int(os.environ.get('GRACEFUL_TIMEOUT', 30)),
+            help='Segundos para os processos terminarem o trabalho em andamento no encerramento. Padrão: 30.'
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        self.graceful_timeout = options['graceful_timeout']
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+
+        self.stdout.write(self.style.SUCCESS("🚀 Iniciando serviços..."))
+
+        qcluster = None
+        qcluster_started = 0
+        backoff = 1
+        if not options['no_qcluster']:
+            qcluster = self.start_qcluster()
+            qcluster_started = time.monotonic()
+
+        web = self.start_web(options)
+
+        exit_code = 0
+        while not self.stopping:
+            time.sleep(1)
+
+            if web.poll() is not None:
+                # Sem o web não há serviço: encerra tudo e deixa a plataforma reiniciar
+                self.stdout.write(self.style.ERROR(f"❌ Gunicorn encerrou (código {web.returncode})"))
+                exit_code = web.returncode or 1
+                break
+
+            if qcluster is not None and qcluster.poll() is not None:
+                self.stdout.write(self.style.ERROR(
+                    f"❌ QCluster encerrou (código {qcluster.returncode}). Reiniciando em {backoff}s..."
+                ))
+                if self.sleep_unless_stopping(backoff):
+                    break
+                if time.monotonic() - qcluster_started > STABLE_AFTER:
+                    backoff = 1
+                else:
+                    backoff = min(backoff * 2, MAX_BACKOFF)
+                qcluster = self.start_qcluster()
+                qcluster_started = time.monotonic()
+
+        self.shutdown([process for process in (web, qcluster) if process is not None])
+        sys.exit(exit_code)
+
+    def request_stop(self, signum, frame):
+        self.stdout.write(self.style.WARNING(f"🛑 Sinal {signal.Signals(signum).name} recebido, encerrando..."))
+        self.stopping = True
+
+    def sleep_unless_stopping(self, seconds):
+        """Espera `seconds` segundos; retorna True se o encerramento foi pedido no meio"""
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            if self.stopping:
+                return True
+            time.sleep(0.2)
+        return self.stopping
+
+    def manage_py(self):
+        return os.path.abspath(sys.argv[0])
+
+    def start_qcluster(self):
+        self.stdout.write("📅 Iniciando QCluster...")
+        process = subprocess.Popen([sys.executable, self.manage_py(), 'qcluster'])
+        self.stdout.write(self.style.SUCCESS(f"✅ QCluster iniciado (PID: {process.pid})"))
+        return process
+
+    def start_web(self, options):
+        if options['asgi']:
+            application = 'sistema_gestao.asgi:application'
+            worker_args = ['--worker-class', 'uvicorn_worker.UvicornWorker']
+        else:
+            application = settings.WSGI_APPLICATION.rsplit('.', 1)[0] + ':application'
+            worker_args = ['--worker-class', 'gthread', '--threads', str(options['threads'])]
+
+        command = [
+            sys.executable, '-m', 'gunicorn', application,
+            '--bind', options['bind'],
+            '--workers', str(options['workers']),
+            '--graceful-timeout', str(self.graceful_timeout),
+            *worker_args,
+        ]
+        self.stdout.write(
+            f"🌐 Iniciando Gunicorn ({'ASGI' if options['asgi'] else 'WSGI'}): "
+            f"{options['workers']} worker(s)" + ('' if options['asgi'] else f" x {options['threads']} thread(s)")
+        )
+        return subprocess.Popen(command)
+
+    def shutdown(self, processes):
+        """Repassa SIGTERM e espera o trabalho em andamento terminar (SIGKILL após o timeout)"""
+        for process in processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+
+        deadline = time.monotonic() + self.graceful_timeout
+        for process in processes:
+            remaining = max(0, deadline - time.monotonic())
+            try:
+                process.wait(timeout=remaining)
+            except subprocess.TimeoutExpired:
+                self.stdout.write(self.style.ERROR(f"⏱️ PID {process.pid} não encerrou a tempo, forçando (SIGKILL)"))
+                process.kill()
+                process.wait()
+        self.stdout.write(self.style.SUCCESS("✅ Serviços encerrados"))
@@ -2,9 +2,27 @@
 Middleware para injetar recursos de modernização e acessibilidade no Django Admin
 Funciona mesmo quando admin_interface sobrescreve templates
 """
+import gzip
+import logging
+import zlib
+
+from django.conf import settings
 from django.template.response import TemplateResponse
+from django.utils.cache import patch_vary_headers
 from django.utils.deprecation import MiddlewareMixin
 
+from . import db_router
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+    logger.warning("Biblioteca 'brotli' não encontrada. As respostas da API serão comprimidas só com gzip.")
+
 
 class AdminModernizationMiddleware(MiddlewareMixin):
     """
@@ -219,3 +237,188 @@ class AdminModernizationMiddleware(MiddlewareMixin):
                 pass
         
         return response
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Comprime as respostas da API (COMPRESSION_PATHS, padrão /api/) com brotli
+    ou gzip, conforme o Accept-Encoding do cliente (brotli tem preferência
+    quando os dois são aceitos com o mesmo peso).
+
+    - Respostas menores que COMPRESSION_MIN_SIZE bytes não são comprimidas;
+    - respostas em streaming são comprimidas bloco a bloco (cada bloco é
+      enviado assim que chega), inclusive as assíncronas;
+    - não mexe em respostas já codificadas, em eventos (text/event-stream),
+      com Cache-Control: no-transform ou de tipos que não comprimem bem;
+    - ETags fortes viram fracas (W/), já que os bytes enviados mudam.
+
+    Os arquivos estáticos continuam com o WhiteNoise, que já serve as versões comprimidas.
+    """
+    COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'application/xml')
+
+    def process_response(self, request, response):
+        if not self._should_compress(request, response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encoding = self._negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                original = response.streaming_content
+
+                async def compressed_stream():
+                    compressor = self._compressor(encoding)
+                    async for chunk in original:
+                        data = compressor.compress(chunk) + compressor.flush_chunk()
+                        if data:
+                            yield data
+                    yield compressor.finish()
+
+                response.streaming_content = compressed_stream()
+            else:
+                response.streaming_content = self._compress_stream(encoding, response.streaming_content)
+            # O tamanho final só é conhecido no fim do stream
+            del response.headers['Content-Length']
+        else:
+            compressed = self._compress(encoding, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def _should_compress(self, request, response):
+        if not getattr(settings, 'COMPRESSION_ENABLED', True):
+            return False
+        if not request.path.startswith(tuple(getattr(settings, 'COMPRESSION_PATHS', ('/api/',)))):
+            return False
+        if response.has_header('Content-Encoding') or 'no-transform' in response.get('Cache-Control', ''):
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        # Eventos (SSE) precisam chegar na hora, sem buffer do compressor
+        if content_type == 'text/event-stream' or not content_type.startswith(self.COMPRESSIBLE_TYPES):
+            return False
+        if response.streaming:
+            return True
+        return len(response.content) >= getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+
+    def _negotiate(self, accept_encoding):
+        """'br', 'gzip' ou None, pelos pesos (q=) do Accept-Encoding"""
+        weights = {}
+        for item in accept_encoding.split(','):
+            name, _, params = item.strip().partition(';')
+            name = name.strip().lower()
+            if not name:
+                continue
+            weight = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    weight = float(params[2:])
+                except ValueError:
+                    weight = 0.0
+            weights[name] = weight
+
+        candidates = ['br', 'gzip'] if BROTLI_AVAILABLE else ['gzip']
+        wildcard = weights.get('*', 0.0)
+        scored = [(weights.get(name, wildcard), -index, name) for index, name in enumerate(candidates)]
+        weight, _, name = max(scored)
+        return name if weight > 0 else None
+
+    def _compress(self, encoding, data):
+        if encoding == 'br':
+            return brotli.compress(data, quality=getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 4))
+        return gzip.compress(data, compresslevel=getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6), mtime=0)
+
+    def _compressor(self, encoding):
+        if encoding == 'br':
+            return _BrotliStream(getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 4))
+        return _GzipStream(getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6))
+
+    def _compress_stream(self, encoding, chunks):
+        compressor = self._compressor(encoding)
+        for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush_chunk()
+            if data:
+                yield data
+        yield compressor.finish()
+
+
+class ReplicaReadMiddleware(MiddlewareMixin):
+    """
+    Leituras da réplica do banco (core.db_router) nas rotas de REPLICA_READ_PATHS.
+
+    - Só GET/HEAD/OPTIONS usam a réplica; as demais requisições ficam no primário;
+    - se a requisição gravar algo, as leituras seguintes dela vão para o
+      primário e o cliente recebe o cookie db_pin, que o mantém no primário
+      por REPLICA_PIN_SECONDS segundos (tempo para a réplica alcançar a gravação).
+      O cookie é SameSite=None; Secure: o frontend fica em outro domínio
+      (CORS com credenciais), e um cookie Lax não iria nos fetch entre sites.
+    """
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+    PIN_COOKIE = 'db_pin'
+
+    def process_request(self, request):
+        db_router.activate(replica=self._use_replica(request))
+
+    def process_response(self, request, response):
+        if db_router.wrote():
+            response.set_cookie(
+                self.PIN_COOKIE,
+                '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5),
+                # SameSite=None exige Secure (o localhost conta como origem segura)
+                secure=True,
+                httponly=True,
+                samesite='None',
+            )
+        db_router.deactivate()
+        return response
+
+    def _use_replica(self, request):
+        return (
+            request.method in self.SAFE_METHODS
+            and request.path.startswith(tuple(getattr(settings, 'REPLICA_READ_PATHS', ())))
+            and self.PIN_COOKIE not in request.COOKIES
+            and db_router.replica_configured()
+        )
+
+
+class _GzipStream:
+    """Compressor gzip incremental (um bloco por chunk recebido)"""
+
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush_chunk(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliStream:
+    """Compressor brotli incremental (um bloco por chunk recebido)"""
+
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush_chunk(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_notification_pushsubscription'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='pushsubscription',
+            options={'verbose_name': 'Inscrição de Push', 'verbose_name_plural': 'Inscrições de Push'},
+        ),
+        migrations.CreateModel(
+            name='TaskRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_name', models.CharField(max_length=100, verbose_name='Task')),
+                ('status', models.CharField(choices=[('success', 'Sucesso'), ('error', 'Erro')], default='success', max_length=10, verbose_name='Status')),
+                ('started_at', models.DateTimeField(verbose_name='Início')),
+                ('finished_at', models.DateTimeField(verbose_name='Fim')),
+                ('duration_ms', models.FloatField(verbose_name='Duração (ms)')),
+                ('catalog_size', models.PositiveIntegerField(blank=True, null=True, verbose_name='Tamanho do Catálogo')),
+                ('phases', models.JSONField(blank=True, default=dict, verbose_name='Tempo por Fase (ms)')),
+                ('counters', models.JSONField(blank=True, default=dict, verbose_name='Contadores')),
+                ('result', models.TextField(blank=True, verbose_name='Resultado')),
+            ],
+            options={
+                'verbose_name': 'Execução de Task',
+                'verbose_name_plural': 'Execuções de Tasks',
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['task_name', '-started_at'], name='core_taskrun_task_started_idx')],
+            },
+        ),
+    ]
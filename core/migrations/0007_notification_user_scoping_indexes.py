@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_taskrun'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'read', '-created_at'], name='core_notif_user_read_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pushsubscription',
+            index=models.Index(fields=['user', 'active'], name='core_pushsub_user_active_idx'),
+        ),
+    ]
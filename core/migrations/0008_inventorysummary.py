@@ -0,0 +1,66 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:06
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def build_summary(apps, schema_editor):
+    """Preenche o resumo com o catálogo existente (mesma conta de core.inventory_summary)"""
+    Product = apps.get_model('core', 'Product')
+    InventorySummary = apps.get_model('core', 'InventorySummary')
+    expired = Q(expiration_date__lt=timezone.localdate())
+    money = DecimalField(max_digits=16, decimal_places=2)
+    value = F('price') * F('quantity')
+
+    rows = []
+    for dimension, field in (('category', 'category_id'), ('brand', 'brand_id')):
+        grouped = Product.objects.order_by().values(field).annotate(
+            products_count=Count('id'),
+            units=Coalesce(Sum('quantity'), 0),
+            stock_value=Coalesce(Sum(value, output_field=money), Decimal(0), output_field=money),
+            expired_count=Count('id', filter=expired),
+            expired_units=Coalesce(Sum('quantity', filter=expired), 0),
+            expired_value=Coalesce(Sum(value, filter=expired, output_field=money), Decimal(0), output_field=money),
+        )
+        for group in grouped:
+            key = group.pop(field) or 0
+            group['stock_value'] = Decimal(group['stock_value']).quantize(Decimal('0.01'))
+            group['expired_value'] = Decimal(group['expired_value']).quantize(Decimal('0.01'))
+            rows.append(InventorySummary(dimension=dimension, key=key, **group))
+    InventorySummary.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_notification_user_scoping_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('category', 'Categoria'), ('brand', 'Marca')], max_length=10, verbose_name='Dimensão')),
+                ('key', models.PositiveIntegerField(default=0, verbose_name='ID da Categoria/Marca')),
+                ('products_count', models.IntegerField(default=0, verbose_name='Produtos')),
+                ('units', models.BigIntegerField(default=0, verbose_name='Unidades em Estoque')),
+                ('stock_value', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Valor em Estoque')),
+                ('expired_count', models.IntegerField(default=0, verbose_name='Produtos Vencidos')),
+                ('expired_units', models.BigIntegerField(default=0, verbose_name='Unidades Vencidas')),
+                ('expired_value', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Valor Vencido')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Atualização')),
+            ],
+            options={
+                'verbose_name': 'Resumo de Estoque',
+                'verbose_name_plural': 'Resumos de Estoque',
+                'ordering': ['dimension', 'key'],
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'key'), name='core_invsummary_dimension_key_uniq')],
+            },
+        ),
+        migrations.RunPython(build_summary, migrations.RunPython.noop),
+    ]
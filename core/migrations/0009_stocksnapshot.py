@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_inventorysummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Data')),
+                ('category', models.PositiveIntegerField(default=0, verbose_name='ID da Categoria')),
+                ('products_count', models.IntegerField(default=0, verbose_name='Produtos')),
+                ('units', models.BigIntegerField(default=0, verbose_name='Unidades em Estoque')),
+                ('stock_value', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Valor em Estoque')),
+                ('expired_count', models.IntegerField(default=0, verbose_name='Produtos Vencidos')),
+                ('expired_units', models.BigIntegerField(default=0, verbose_name='Unidades Vencidas')),
+                ('expired_value', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Valor Vencido')),
+            ],
+            options={
+                'verbose_name': 'Foto do Estoque',
+                'verbose_name_plural': 'Fotos do Estoque',
+                'ordering': ['date', 'category'],
+                'indexes': [models.Index(fields=['category', 'date'], name='core_stocksnap_cat_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'category'), name='core_stocksnap_date_category_uniq')],
+            },
+        ),
+    ]
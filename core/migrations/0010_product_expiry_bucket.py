@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:09
+
+from django.db import migrations, models
+from django.utils import timezone
+
+import core.expiry
+
+
+def backfill_expiry_bucket(apps, schema_editor):
+    """Calcula a faixa de validade dos produtos existentes (um UPDATE por faixa)"""
+    Product = apps.get_model('core', 'Product')
+    for bucket, filters in core.expiry.date_filters(timezone.localdate()).items():
+        Product.objects.filter(**filters).update(expiry_bucket=bucket)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_stocksnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='expiry_bucket',
+            field=models.CharField(choices=[('expired', 'Vencido'), ('critical', 'Crítico (0-3 dias)'), ('warning', 'Aviso (4-7 dias)'), ('upcoming', 'Próximo (8-30 dias)'), ('ok', 'Em dia (mais de 30 dias)'), ('none', 'Sem validade')], default='none', editable=False, max_length=10, verbose_name='Faixa de Validade'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['expiry_bucket', 'expiration_date'], name='core_product_bucket_exp_idx'),
+        ),
+        migrations.RunPython(backfill_expiry_bucket, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_product_expiry_bucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Lot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(blank=True, max_length=100, verbose_name='Código do Lote')),
+                ('expiration_date', models.DateField(blank=True, null=True, verbose_name='Data de Validade')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='Quantidade')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Atualização')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lots', to='core.product', verbose_name='Produto')),
+            ],
+            options={
+                'verbose_name': 'Lote',
+                'verbose_name_plural': 'Lotes',
+                'ordering': ['product', 'expiration_date', 'id'],
+                'indexes': [models.Index(fields=['product', 'expiration_date'], name='core_lot_product_exp_idx')],
+            },
+        ),
+    ]
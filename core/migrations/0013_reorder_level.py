@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:18
+
+from django.db import migrations, models
+
+import core.reorder
+
+
+def backfill_low_stock(apps, schema_editor):
+    """Marca os produtos abaixo do nível padrão (nenhum produto/categoria tem nível próprio ainda)"""
+    Product = apps.get_model('core', 'Product')
+    Product.objects.filter(quantity__lt=core.reorder.default_level()).update(is_low_stock=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_product_sku'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='reorder_level',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Nível de Reposição'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='is_low_stock',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Estoque Baixo'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='reorder_level',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Nível de Reposição'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_low_stock', True)), fields=['quantity', 'name'], name='core_product_low_stock_idx'),
+        ),
+        migrations.RunPython(backfill_low_stock, migrations.RunPython.noop),
+    ]
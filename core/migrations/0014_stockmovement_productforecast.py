@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:21
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_reorder_level'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductForecast',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='forecast', serialize=False, to='core.product', verbose_name='Produto')),
+                ('daily_rate', models.FloatField(default=0, verbose_name='Consumo Diário')),
+                ('days_of_stock', models.FloatField(blank=True, null=True, verbose_name='Dias de Estoque')),
+                ('stockout_date', models.DateField(blank=True, null=True, verbose_name='Data Prevista de Ruptura')),
+                ('expected_waste', models.PositiveIntegerField(default=0, verbose_name='Perda Prevista (unidades)')),
+                ('waste_value', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Perda Prevista (R$)')),
+                ('computed_at', models.DateTimeField(verbose_name='Calculado em')),
+            ],
+            options={
+                'verbose_name': 'Previsão de Estoque',
+                'verbose_name_plural': 'Previsões de Estoque',
+                'ordering': ['stockout_date'],
+                'indexes': [models.Index(fields=['stockout_date'], name='core_forecast_stockout_idx'), models.Index(condition=models.Q(('expected_waste__gt', 0)), fields=['-waste_value'], name='core_forecast_waste_idx'), models.Index(fields=['computed_at'], name='core_forecast_computed_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField(verbose_name='Variação')),
+                ('quantity_after', models.PositiveIntegerField(verbose_name='Quantidade Após')),
+                ('reason', models.CharField(choices=[('adjustment', 'Ajuste'), ('allocation', 'Baixa (FEFO)'), ('lot', 'Alteração de Lote')], default='adjustment', max_length=20, verbose_name='Motivo')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='core.product', verbose_name='Produto')),
+            ],
+            options={
+                'verbose_name': 'Movimentação de Estoque',
+                'verbose_name_plural': 'Movimentações de Estoque',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['created_at', 'product'], name='core_movement_created_idx'), models.Index(fields=['product', '-created_at'], name='core_movement_product_idx')],
+            },
+        ),
+    ]
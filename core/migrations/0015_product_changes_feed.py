@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_stockmovement_productforecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.PositiveIntegerField(verbose_name='ID do Produto')),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Excluído em')),
+            ],
+            options={
+                'verbose_name': 'Produto Excluído',
+                'verbose_name_plural': 'Produtos Excluídos',
+                'ordering': ['deleted_at', 'product_id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['updated_at', 'id'], name='core_product_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producttombstone',
+            index=models.Index(fields=['deleted_at', 'product_id'], name='core_tombstone_deleted_idx'),
+        ),
+    ]
@@ -3,8 +3,12 @@ from django.db import models
 from django.utils import timezone # Certifique-se que está importado
 from django.contrib.auth.models import User
 
+from . import expiry, reorder
+
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True, verbose_name="Nome da Categoria")
+    # Nível de reposição dos produtos da categoria que não têm um próprio (vazio = padrão do sistema)
+    reorder_level = models.PositiveIntegerField(null=True, blank=True, verbose_name="Nível de Reposição")
 
     def __str__(self):
         return self.name
@@ -53,16 +57,193 @@ class Product(models.Model):
     
     batch = models.CharField(max_length=100, blank=True, null=True, verbose_name="Lote")
 
+    # Estoque baixo = quantidade abaixo do nível de reposição (ver core.reorder):
+    # do produto, senão da categoria, senão DEFAULT_REORDER_LEVEL
+    reorder_level = models.PositiveIntegerField(null=True, blank=True, verbose_name="Nível de Reposição")
+    is_low_stock = models.BooleanField(default=False, editable=False, verbose_name="Estoque Baixo")
+
+    # Código lido pelos leitores de código de barras (EAN/SKU); único quando informado
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True, verbose_name="SKU / Código de Barras")
+
+    # Faixa de validade desnormalizada (ver core.expiry): mantida pelo save() e
+    # pela virada diária, para as consultas filtrarem por igualdade
+    expiry_bucket = models.CharField(
+        max_length=10,
+        choices=expiry.BUCKET_CHOICES,
+        default=expiry.NONE,
+        editable=False,
+        verbose_name="Faixa de Validade"
+    )
+
+    # Controle de concorrência otimista: muda a cada alteração de dados (não nas
+    # colunas derivadas), vai na ETag do detalhe e é conferida pelo If-Match (core.http_cache)
+    version = models.PositiveIntegerField(default=1, editable=False, verbose_name="Versão")
+
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Data de Criação")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Última Atualização")
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            self.version += 1
+        self.expiry_bucket = expiry.bucket_for(self.expiration_date)
+        # SKU vazio vira NULL: o índice único só vale para os códigos informados
+        self.sku = (self.sku or '').strip() or None
+        self.is_low_stock = self.quantity < reorder.level_for(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            derived = set()
+            if 'expiration_date' in update_fields:
+                derived.add('expiry_bucket')
+            if {'quantity', 'reorder_level', 'category'} & set(update_fields):
+                derived.add('is_low_stock')
+            kwargs['update_fields'] = {*update_fields, *derived, 'version'}
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Produto"
         verbose_name_plural = "Produtos"
         ordering = ['expiration_date']
+        indexes = [
+            # WHERE expiry_bucket = ? ORDER BY expiration_date
+            models.Index(fields=['expiry_bucket', 'expiration_date'], name='core_product_bucket_exp_idx'),
+            # Estoque baixo: WHERE is_low_stock ORDER BY quantity, name (só as linhas marcadas)
+            models.Index(
+                fields=['quantity', 'name'],
+                name='core_product_low_stock_idx',
+                condition=models.Q(is_low_stock=True),
+            ),
+            # Feed de alterações (core.changes): WHERE (updated_at, id) > cursor ORDER BY updated_at, id
+            models.Index(fields=['updated_at', 'id'], name='core_product_updated_idx'),
+        ]
+
+class Lot(models.Model):
+    """
+    Lote de um produto (código, validade e quantidade próprios).
+
+    Quando um produto tem lotes, Product.quantity é a soma dos lotes e
+    Product.expiration_date a validade mais próxima entre os lotes com estoque
+    (mantidos por core.inventory). Produtos sem lotes continuam usando os
+    próprios campos, como antes.
+    """
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='lots',
+        verbose_name="Produto"
+    )
+    code = models.CharField(max_length=100, blank=True, verbose_name="Código do Lote")
+    expiration_date = models.DateField(null=True, blank=True, verbose_name="Data de Validade")
+    quantity = models.PositiveIntegerField(default=0, verbose_name="Quantidade")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Data de Criação")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Última Atualização")
+
+    class Meta:
+        verbose_name = "Lote"
+        verbose_name_plural = "Lotes"
+        ordering = ['product', 'expiration_date', 'id']
+        indexes = [
+            # Alocação FEFO e validade por produto: WHERE product_id = ? ORDER BY expiration_date
+            models.Index(fields=['product', 'expiration_date'], name='core_lot_product_exp_idx'),
+        ]
+
+    def __str__(self):
+        validade = self.expiration_date.strftime('%d/%m/%Y') if self.expiration_date else 'sem validade'
+        return f"{self.product} - lote {self.code or self.pk} ({validade}): {self.quantity}"
+
+class ProductTombstone(models.Model):
+    """
+    Registro da exclusão de um produto (gravado por core.signals), para que o
+    feed de alterações (core.changes) avise os clientes offline
+    """
+    product_id = models.PositiveIntegerField(verbose_name="ID do Produto")
+    deleted_at = models.DateTimeField(default=timezone.now, verbose_name="Excluído em")
+
+    class Meta:
+        verbose_name = "Produto Excluído"
+        verbose_name_plural = "Produtos Excluídos"
+        ordering = ['deleted_at', 'product_id']
+        indexes = [
+            models.Index(fields=['deleted_at', 'product_id'], name='core_tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"Produto {self.product_id} excluído em {self.deleted_at:%d/%m/%Y %H:%M}"
+
+class StockMovement(models.Model):
+    """
+    Registro (somente inserção) de cada mudança na quantidade de um produto.
+    delta < 0 é saída; é a base das taxas de consumo de core.forecast.
+    """
+    REASON_CHOICES = [
+        ('adjustment', 'Ajuste'),
+        ('allocation', 'Baixa (FEFO)'),
+        ('lot', 'Alteração de Lote'),
+    ]
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='movements',
+        verbose_name="Produto"
+    )
+    delta = models.IntegerField(verbose_name="Variação")
+    quantity_after = models.PositiveIntegerField(verbose_name="Quantidade Após")
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES, default='adjustment', verbose_name="Motivo")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Data")
+
+    class Meta:
+        verbose_name = "Movimentação de Estoque"
+        verbose_name_plural = "Movimentações de Estoque"
+        ordering = ['-created_at']
+        indexes = [
+            # Consumo por produto na janela: WHERE created_at >= ? GROUP BY product_id
+            models.Index(fields=['created_at', 'product'], name='core_movement_created_idx'),
+            models.Index(fields=['product', '-created_at'], name='core_movement_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product} {self.delta:+d} ({self.get_reason_display()})"
+
+class ProductForecast(models.Model):
+    """
+    Previsão de ruptura e de perda por vencimento de cada produto
+    (calculada por core.forecast; uma linha por produto).
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='forecast',
+        verbose_name="Produto"
+    )
+    daily_rate = models.FloatField(default=0, verbose_name="Consumo Diário")
+    days_of_stock = models.FloatField(null=True, blank=True, verbose_name="Dias de Estoque")
+    stockout_date = models.DateField(null=True, blank=True, verbose_name="Data Prevista de Ruptura")
+    expected_waste = models.PositiveIntegerField(default=0, verbose_name="Perda Prevista (unidades)")
+    waste_value = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Perda Prevista (R$)")
+    computed_at = models.DateTimeField(verbose_name="Calculado em")
+
+    class Meta:
+        verbose_name = "Previsão de Estoque"
+        verbose_name_plural = "Previsões de Estoque"
+        ordering = ['stockout_date']
+        indexes = [
+            # Em risco: WHERE stockout_date <= ? ... OR expected_waste > 0
+            models.Index(fields=['stockout_date'], name='core_forecast_stockout_idx'),
+            models.Index(
+                fields=['-waste_value'],
+                name='core_forecast_waste_idx',
+                condition=models.Q(expected_waste__gt=0),
+            ),
+            models.Index(fields=['computed_at'], name='core_forecast_computed_idx'),
+        ]
+
+    def __str__(self):
+        ruptura = self.stockout_date.strftime('%d/%m/%Y') if self.stockout_date else 'sem previsão'
+        return f"{self.product}: ruptura {ruptura}, perda {self.expected_waste} unidade(s)"
 
 class Notification(models.Model):
     """Modelo para armazenar notificações enviadas"""
@@ -84,6 +265,10 @@ class Notification(models.Model):
         verbose_name = "Notificação"
         verbose_name_plural = "Notificações"
         ordering = ['-created_at']
+        indexes = [
+            # Listagem por usuário: WHERE user_id = ? AND read = ? ORDER BY created_at DESC
+            models.Index(fields=['user', 'read', '-created_at'], name='core_notif_user_read_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.created_at.strftime('%d/%m/%Y %H:%M')}"
@@ -101,6 +286,101 @@ class PushSubscription(models.Model):
         verbose_name = "Inscrição de Push"
         verbose_name_plural = "Inscrições de Push"
         unique_together = ['endpoint', 'p256dh', 'auth']
+        indexes = [
+            models.Index(fields=['user', 'active'], name='core_pushsub_user_active_idx'),
+        ]
     
     def __str__(self):
-        return f"Subscription de {self.user.username if self.user else 'Anônimo'} - {self.endpoint[:50]}..."
\ No newline at end of file
+        return f"Subscription de {self.user.username if self.user else 'Anônimo'} - {self.endpoint[:50]}..."
+
+class TaskRun(models.Model):
+    """Telemetria de cada execução das tasks do django-q (tempos por fase e contadores)"""
+    STATUS_CHOICES = [
+        ('success', 'Sucesso'),
+        ('error', 'Erro'),
+    ]
+
+    task_name = models.CharField(max_length=100, verbose_name="Task")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='success', verbose_name="Status")
+    started_at = models.DateTimeField(verbose_name="Início")
+    finished_at = models.DateTimeField(verbose_name="Fim")
+    duration_ms = models.FloatField(verbose_name="Duração (ms)")
+    catalog_size = models.PositiveIntegerField(null=True, blank=True, verbose_name="Tamanho do Catálogo")
+    phases = models.JSONField(default=dict, blank=True, verbose_name="Tempo por Fase (ms)")
+    counters = models.JSONField(default=dict, blank=True, verbose_name="Contadores")
+    result = models.TextField(blank=True, verbose_name="Resultado")
+
+    class Meta:
+        verbose_name = "Execução de Task"
+        verbose_name_plural = "Execuções de Tasks"
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['task_name', '-started_at'], name='core_taskrun_task_started_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task_name} - {self.started_at.strftime('%d/%m/%Y %H:%M')} ({self.duration_ms:.0f} ms)"
+
+class InventorySummary(models.Model):
+    """
+    Totais de estoque materializados por categoria e por marca.
+
+    Mantido incrementalmente pelos sinais de Product e reconstruído toda noite
+    (core.inventory_summary). key = 0 agrupa os produtos sem categoria/marca.
+    """
+    DIMENSION_CHOICES = [
+        ('category', 'Categoria'),
+        ('brand', 'Marca'),
+    ]
+
+    dimension = models.CharField(max_length=10, choices=DIMENSION_CHOICES, verbose_name="Dimensão")
+    key = models.PositiveIntegerField(default=0, verbose_name="ID da Categoria/Marca")
+    products_count = models.IntegerField(default=0, verbose_name="Produtos")
+    units = models.BigIntegerField(default=0, verbose_name="Unidades em Estoque")
+    stock_value = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name="Valor em Estoque")
+    expired_count = models.IntegerField(default=0, verbose_name="Produtos Vencidos")
+    expired_units = models.BigIntegerField(default=0, verbose_name="Unidades Vencidas")
+    expired_value = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name="Valor Vencido")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Última Atualização")
+
+    class Meta:
+        verbose_name = "Resumo de Estoque"
+        verbose_name_plural = "Resumos de Estoque"
+        ordering = ['dimension', 'key']
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'key'], name='core_invsummary_dimension_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_dimension_display()} {self.key}: {self.units} unidade(s)"
+
+class StockSnapshot(models.Model):
+    """
+    Foto diária (somente inserção) dos totais de estoque por categoria, para os
+    gráficos de tendência. category = 0 agrupa os produtos sem categoria; o ID é
+    guardado sem chave estrangeira para o histórico sobreviver à exclusão da categoria.
+    """
+    date = models.DateField(verbose_name="Data")
+    category = models.PositiveIntegerField(default=0, verbose_name="ID da Categoria")
+    products_count = models.IntegerField(default=0, verbose_name="Produtos")
+    units = models.BigIntegerField(default=0, verbose_name="Unidades em Estoque")
+    stock_value = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name="Valor em Estoque")
+    expired_count = models.IntegerField(default=0, verbose_name="Produtos Vencidos")
+    expired_units = models.BigIntegerField(default=0, verbose_name="Unidades Vencidas")
+    expired_value = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name="Valor Vencido")
+
+    class Meta:
+        verbose_name = "Foto do Estoque"
+        verbose_name_plural = "Fotos do Estoque"
+        ordering = ['date', 'category']
+        constraints = [
+            # Também serve de índice para consultas por período de todas as categorias
+            models.UniqueConstraint(fields=['date', 'category'], name='core_stocksnap_date_category_uniq'),
+        ]
+        indexes = [
+            # Série de uma categoria: WHERE category = ? AND date BETWEEN ? AND ?
+            models.Index(fields=['category', 'date'], name='core_stocksnap_cat_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date.strftime('%d/%m/%Y')} - categoria {self.category}: {self.units} unidade(s)"
@@ -0,0 +1,20 @@
+# core/pagination.py
+
+from rest_framework.pagination import PageNumberPagination
+
+
+class OptInPageNumberPagination(PageNumberPagination):
+    """
+    Paginação por página, apenas quando o cliente pede (?page= ou ?page_size=).
+
+    Sem esses parâmetros a resposta continua sendo a lista completa, como o
+    frontend espera hoje.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.page_query_param not in request.query_params and self.page_size_query_param not in request.query_params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
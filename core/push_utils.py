@@ -59,6 +59,9 @@ def send_push_notification(title, message, data=None, user=None):
     logger.info("=" * 60)
     
     subscriptions = PushSubscription.objects.filter(active=True)
+    if user is not None:
+        # Filtra no SQL: envia apenas para os dispositivos do usuário
+        subscriptions = subscriptions.filter(user=user)
     subscription_count = subscriptions.count()
     
     # Logs sempre visíveis, mesmo sem subscriptions
@@ -0,0 +1,68 @@
+# core/reorder.py
+
+"""
+Nível de reposição e a coluna Product.is_low_stock.
+
+O nível de um produto é o próprio reorder_level, senão o da categoria, senão
+DEFAULT_REORDER_LEVEL (settings). Estoque baixo = quantity < nível.
+
+is_low_stock é desnormalizada para as listagens e contagens usarem o índice
+parcial core_product_low_stock_idx (só as linhas marcadas) em vez de comparar
+quantidade e nível linha a linha:
+- Product.save() recalcula o produto salvo;
+- refresh_low_stock() recalcula em massa (duas UPDATEs, só nas linhas que
+  mudam), após bulk_update/bulk_create, mudança do nível de uma categoria e
+  na virada diária (que também aplica mudanças de DEFAULT_REORDER_LEVEL).
+"""
+
+from django.conf import settings
+from django.db.models import F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def default_level():
+    return getattr(settings, 'DEFAULT_REORDER_LEVEL', 10)
+
+
+def level_for(product):
+    """Nível de reposição efetivo de um produto (instância)"""
+    from .models import Category
+
+    if product.reorder_level is not None:
+        return product.reorder_level
+    if product.category_id is not None:
+        # Pelo id, não por product.category: a instância em cache pode estar incompleta
+        # (ex.: Category(pk=..., name=...) criada pelo widget da importação do admin)
+        level = Category.objects.filter(pk=product.category_id).values_list('reorder_level', flat=True).first()
+        if level is not None:
+            return level
+    return default_level()
+
+
+def level_expression():
+    """Nível efetivo em SQL (sem JOIN, utilizável em UPDATE)"""
+    from .models import Category
+
+    category_level = Category.objects.filter(pk=OuterRef('category_id')).values('reorder_level')[:1]
+    return Coalesce(
+        F('reorder_level'),
+        Subquery(category_level),
+        Value(default_level()),
+        output_field=IntegerField(),
+    )
+
+
+def refresh_low_stock(queryset=None):
+    """
+    Recalcula is_low_stock dos produtos do queryset (padrão: todos).
+    Retorna quantos produtos mudaram.
+    """
+    from .models import Product
+
+    queryset = (queryset if queryset is not None else Product.objects.all()).alias(level=level_expression())
+    # updated_at também muda: a marcação aparece na API e no feed de alterações (core.changes)
+    now = timezone.now()
+    changed = queryset.filter(is_low_stock=False, quantity__lt=F('level')).update(is_low_stock=True, updated_at=now)
+    changed += queryset.filter(is_low_stock=True, quantity__gte=F('level')).update(is_low_stock=False, updated_at=now)
+    return changed
@@ -1,19 +1,42 @@
 # core/serializers.py
 
 from rest_framework import serializers
-from .models import Product, Category, Notification, PushSubscription # Importe Category
+from .models import Product, Category, Brand, Lot, Notification, PushSubscription, InventorySummary, ProductForecast # Importe Category
+from .lookup_cache import brands, categories
+from . import changes
+from .fieldsets import SparseFieldsetSerializerMixin
 
 # --- NOVO SERIALIZER PARA CATEGORY ---
 class CategorySerializer(serializers.ModelSerializer):
+    # Contagens anotadas pela listagem (omitidas quando não foram calculadas, ex.: no POST)
+    products_count = serializers.IntegerField(read_only=True)
+    expired_count = serializers.IntegerField(read_only=True)
+    expiring_count = serializers.IntegerField(read_only=True)
+
     class Meta:
         model = Category
-        fields = ['id', 'name']
+        fields = ['id', 'name', 'reorder_level', 'products_count', 'expired_count', 'expiring_count']
+
 
+class BrandSerializer(serializers.ModelSerializer):
+    products_count = serializers.IntegerField(read_only=True)
+    expired_count = serializers.IntegerField(read_only=True)
+    expiring_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Brand
+        fields = ['id', 'name', 'products_count', 'expired_count', 'expiring_count']
 
-class ProductSerializer(serializers.ModelSerializer):
+
+class ProductSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     # Exibe o nome da categoria em vez de apenas o ID.
     # read_only=True significa que este campo é apenas para leitura na API de produto.
-    category_name = serializers.CharField(source='category.name', read_only=True, allow_null=True)
+    # O nome vem do cache local de categorias (core.lookup_cache), sem JOIN
+    category_name = serializers.SerializerMethodField()
+    # Anotados pelas listagens de validade (core.inventory.products_in_buckets):
+    # unidades e validade mais próxima dos lotes na faixa consultada
+    lot_quantity = serializers.IntegerField(read_only=True)
+    lot_expiration = serializers.DateField(read_only=True)
 
     class Meta:
         model = Product
@@ -26,12 +49,167 @@ class ProductSerializer(serializers.ModelSerializer):
             'quantity', 
             'expiration_date',
             'batch',
+            'sku', # SKU / código de barras (único)
+            'reorder_level', # Nível de reposição (vazio = o da categoria / padrão)
+            'is_low_stock', # Somente leitura, ver core.reorder
             'category', # ID da categoria, usado para criar/atualizar
             'category_name', # Nome da categoria, para exibição
+            'expiry_bucket', # Faixa de validade (somente leitura, ver core.expiry)
+            'version', # Somente leitura; vai no If-Match das alterações (core.http_cache)
+            'lot_quantity',
+            'lot_expiration',
             'created_at',
             'updated_at'
         ]
 
+    # Colunas usadas por campos que não são colunas (?fields= / ?omit=, core.fieldsets)
+    sparse_requires = {'category_name': ('category',)}
+
+    def get_category_name(self, obj):
+        return categories.name(obj.category_id)
+
+    def validate_sku(self, value):
+        # Vazio = sem código (NULL), para não colidir no índice único
+        return (value or '').strip() or None
+
+    def validate(self, attrs):
+        # Com lotes, quantidade e validade são calculadas a partir deles (core.inventory)
+        instance = self.instance
+        if instance is not None and any(
+            field in attrs and attrs[field] != getattr(instance, field)
+            for field in ('quantity', 'expiration_date')
+        ) and instance.lots.exists():
+            raise serializers.ValidationError(
+                'Este produto é controlado por lotes: altere quantidade e validade pelos lotes.'
+            )
+        return attrs
+
+
+class BarcodeLookupSerializer(serializers.Serializer):
+    """Valida o corpo de POST /api/products/lookup/"""
+    codes = serializers.ListField(
+        child=serializers.CharField(max_length=64, trim_whitespace=True),
+        allow_empty=False,
+        max_length=500,
+    )
+
+
+class ProductChangesQuerySerializer(serializers.Serializer):
+    """Parâmetros de /api/products/changes/"""
+    updated_since = serializers.CharField(required=False, max_length=64)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=changes.MAX_LIMIT, default=changes.DEFAULT_LIMIT)
+
+    def validate_updated_since(self, value):
+        try:
+            changes.decode_cursor(value)
+        except (ValueError, OverflowError):
+            raise serializers.ValidationError('Cursor inválido.')
+        return value
+
+
+class LotSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Lot
+        fields = ['id', 'product', 'code', 'expiration_date', 'quantity', 'created_at', 'updated_at']
+        read_only_fields = ['product', 'created_at', 'updated_at']
+
+
+class QuantityAdjustmentSerializer(serializers.Serializer):
+    """Valida o corpo de POST /api/products/<id>/adjust/"""
+    delta = serializers.IntegerField()
+
+    def validate_delta(self, value):
+        if not value:
+            raise serializers.ValidationError('Informe uma variação diferente de zero.')
+        return value
+
+
+class AllocationItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class AllocationSerializer(serializers.Serializer):
+    """Valida o corpo de POST /api/inventory/allocate/"""
+    items = AllocationItemSerializer(many=True, allow_empty=False, max_length=1000)
+    allow_expired = serializers.BooleanField(default=False)
+
+    def validate_items(self, items):
+        # Soma itens repetidos do mesmo produto
+        totals = {}
+        for item in items:
+            totals[item['product']] = totals.get(item['product'], 0) + item['quantity']
+        return totals
+
+
+class InventorySummarySerializer(serializers.ModelSerializer):
+    """Linha do resumo de estoque (id/nome da categoria ou marca; None = sem categoria/marca)"""
+    id = serializers.SerializerMethodField()
+    name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = InventorySummary
+        fields = [
+            'id',
+            'name',
+            'products_count',
+            'units',
+            'stock_value',
+            'expired_count',
+            'expired_units',
+            'expired_value',
+        ]
+
+    def get_id(self, obj):
+        return obj.key or None
+
+    def get_name(self, obj):
+        if not obj.key:
+            return None
+        lookup = categories if obj.dimension == 'category' else brands
+        return lookup.name(obj.key)
+
+
+class StockHistoryQuerySerializer(serializers.Serializer):
+    """Parâmetros de /api/dashboard/stock-history/"""
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    interval = serializers.ChoiceField(choices=['day', 'week', 'month'], default='day')
+    category = serializers.IntegerField(required=False, min_value=0)
+
+    def validate(self, data):
+        if data.get('start') and data.get('end') and data['start'] > data['end']:
+            raise serializers.ValidationError('A data inicial deve ser anterior à data final.')
+        return data
+
+
+class ProductForecastSerializer(serializers.ModelSerializer):
+    """Previsão de um produto (core.forecast)"""
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    quantity = serializers.IntegerField(source='product.quantity', read_only=True)
+    expiration_date = serializers.DateField(source='product.expiration_date', read_only=True)
+
+    class Meta:
+        model = ProductForecast
+        fields = [
+            'product',
+            'product_name',
+            'quantity',
+            'expiration_date',
+            'daily_rate',
+            'days_of_stock',
+            'stockout_date',
+            'expected_waste',
+            'waste_value',
+            'computed_at',
+        ]
+
+
+class AtRiskQuerySerializer(serializers.Serializer):
+    """Parâmetros de /api/products/at-risk/"""
+    days = serializers.IntegerField(required=False, min_value=0, max_value=365)
+    type = serializers.ChoiceField(choices=['all', 'stockout', 'waste'], default='all')
+
 
 class NotificationSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True, allow_null=True)
@@ -51,6 +229,28 @@ class NotificationSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
 
+class NotificationBatchFilterSerializer(serializers.Serializer):
+    """Filtro opcional para alterar notificações em lote sem informar IDs"""
+    notification_type = serializers.ChoiceField(choices=Notification.NOTIFICATION_TYPES, required=False)
+    product = serializers.IntegerField(required=False)
+    read = serializers.BooleanField(required=False, allow_null=True, default=None)
+    before = serializers.DateTimeField(required=False)
+
+
+class NotificationBatchSerializer(serializers.Serializer):
+    """Valida o corpo de POST /api/notifications/batch/"""
+    ACTIONS = ['mark_read', 'mark_unread', 'delete']
+
+    action = serializers.ChoiceField(choices=ACTIONS, default='mark_read')
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False, max_length=1000)
+    filter = NotificationBatchFilterSerializer(required=False)
+
+    def validate(self, attrs):
+        if 'ids' not in attrs and 'filter' not in attrs:
+            raise serializers.ValidationError("Informe 'ids' ou 'filter'.")
+        return attrs
+
+
 class PushSubscriptionSerializer(serializers.ModelSerializer):
     class Meta:
         model = PushSubscription
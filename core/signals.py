@@ -0,0 +1,173 @@
+# core/signals.py
+
+"""
+Receivers de sinais dos modelos do core (conectados em CoreConfig.ready).
+
+Operações em massa (queryset.update(), bulk_create) não disparam estes sinais;
+quem as usa deve invalidar os caches (e reconstruir o resumo de estoque,
+core.inventory_summary) explicitamente.
+"""
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import inventory, inventory_summary, lookup_cache, reorder
+from .barcode_cache import barcodes
+from .cache_utils import (
+    invalidate_brands,
+    invalidate_categories,
+    invalidate_notifications,
+    invalidate_products,
+    invalidate_skus,
+)
+from .models import Brand, Category, Lot, Notification, Product, ProductTombstone
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def notification_changed(sender, **kwargs):
+    invalidate_notifications()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, **kwargs):
+    invalidate_products()
+
+
+@receiver(pre_save, sender=Product)
+def remember_inventory_state(sender, instance, raw=False, **kwargs):
+    # Estado gravado antes do save, para aplicar só a diferença no resumo de estoque
+    if not raw and not inventory_summary.is_paused():
+        instance._inventory_before = inventory_summary.saved_snapshot(instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=Product)
+def update_inventory_summary_on_save(sender, instance, raw=False, **kwargs):
+    if not raw and not inventory_summary.is_paused():
+        before = getattr(instance, '_inventory_before', None)
+        inventory_summary.apply_change(before, inventory_summary.snapshot(instance))
+        if before is not None:
+            # Quantidade editada diretamente no produto (core.forecast usa as saídas)
+            inventory.record_movements([(instance.pk, before['quantity'], instance.quantity)], 'adjustment')
+
+
+@receiver(post_delete, sender=Product)
+def update_inventory_summary_on_delete(sender, instance, **kwargs):
+    if not inventory_summary.is_paused():
+        inventory_summary.apply_change(inventory_summary.snapshot(instance), None)
+
+
+@receiver(post_delete, sender=Product)
+def record_tombstone(sender, instance, **kwargs):
+    # Avisa os clientes offline da exclusão (feed de alterações, core.changes)
+    ProductTombstone.objects.create(product_id=instance.pk)
+
+
+@receiver(pre_save, sender=Lot)
+def open_lots_before_first_lot(sender, instance, raw=False, **kwargs):
+    # Primeiro lote de um produto: o estoque que já existia vira um lote inicial
+    if not raw and instance.pk is None:
+        inventory.open_lots([instance.product_id])
+
+
+@receiver(pre_save, sender=Product)
+def remember_sku(sender, instance, raw=False, update_fields=None, **kwargs):
+    # SKU gravado antes do save: só uma troca de SKU invalida os mapas dos outros processos
+    if raw or (update_fields is not None and 'sku' not in update_fields):
+        instance._sku_before = instance.sku
+    elif instance.pk:
+        instance._sku_before = Product.objects.filter(pk=instance.pk).values_list('sku', flat=True).first()
+    else:
+        instance._sku_before = None
+
+
+@receiver(post_save, sender=Product)
+def update_barcodes_on_save(sender, instance, **kwargs):
+    before = getattr(instance, '_sku_before', instance.sku)
+    if before != instance.sku:
+        barcodes.discard(before, instance.sku)
+        invalidate_skus()
+
+
+@receiver(post_delete, sender=Product)
+def update_barcodes_on_delete(sender, instance, **kwargs):
+    if instance.sku:
+        barcodes.discard(instance.sku)
+        invalidate_skus()
+
+
+@receiver(post_save, sender=Lot)
+def sync_product_on_lot_save(sender, instance, raw=False, **kwargs):
+    # Quantidade/validade do produto passam a refletir os lotes (core.inventory)
+    if not raw:
+        inventory.sync_products([instance.product_id])
+
+
+@receiver(post_delete, sender=Lot)
+def sync_product_on_lot_delete(sender, instance, origin=None, **kwargs):
+    # Lotes apagados junto com o produto: não há o que recalcular
+    if not isinstance(origin, Product) and getattr(origin, 'model', None) is not Product:
+        inventory.sync_products([instance.product_id])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, **kwargs):
+    invalidate_categories()
+    lookup_cache.categories.clear()
+
+
+@receiver(pre_save, sender=Category)
+def remember_category_name(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        instance._name_before = instance.name
+    else:
+        instance._name_before = Category.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Category)
+def touch_products_on_category_rename(sender, instance, raw=False, **kwargs):
+    # category_name vai no JSON de cada produto: o renome precisa entrar no feed de alterações (core.changes)
+    if not raw and getattr(instance, '_name_before', instance.name) != instance.name:
+        if Product.objects.filter(category_id=instance.pk).update(updated_at=timezone.now()):
+            invalidate_products()
+
+
+@receiver(pre_delete, sender=Category)
+def touch_products_on_category_delete(sender, instance, **kwargs):
+    # O SET_NULL do Django é um UPDATE em massa sem updated_at, e depois dele não dá mais
+    # para saber quais produtos eram da categoria: marca-os antes (mesma transação do delete)
+    Product.objects.filter(category_id=instance.pk).update(updated_at=timezone.now(), version=F('version') + 1)
+
+
+@receiver(post_save, sender=Category)
+def refresh_low_stock_on_category_save(sender, instance, raw=False, **kwargs):
+    # O nível de reposição da categoria vale para os produtos sem nível próprio
+    if not raw and reorder.refresh_low_stock(Product.objects.filter(category_id=instance.pk)):
+        invalidate_products()
+
+
+@receiver(post_delete, sender=Category)
+def refresh_low_stock_on_category_delete(sender, **kwargs):
+    # Os produtos ficaram sem categoria (UPDATE em massa): passam a usar o nível padrão
+    if reorder.refresh_low_stock(Product.objects.filter(category__isnull=True)):
+        invalidate_products()
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Brand)
+def rebuild_inventory_summary_on_delete(sender, **kwargs):
+    # Os produtos passam para "sem categoria/marca" via UPDATE em massa, sem sinais
+    if not inventory_summary.is_paused():
+        transaction.on_commit(inventory_summary.rebuild)
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+def brand_changed(sender, **kwargs):
+    invalidate_brands()
+    lookup_cache.brands.clear()
@@ -0,0 +1,81 @@
+# core/stock_history.py
+
+"""
+Histórico diário do estoque por categoria (tabela StockSnapshot).
+
+A task record_stock_snapshot grava uma linha por categoria por dia, com os
+mesmos totais do resumo de estoque (core.inventory_summary). As consultas por
+período agregam no banco por dia, semana ou mês, então um gráfico de vários
+anos cabe em poucas dezenas de pontos.
+"""
+
+from decimal import Decimal
+
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from . import inventory_summary
+from .models import StockSnapshot
+
+METRICS = inventory_summary.METRICS
+MONEY_METRICS = ('stock_value', 'expired_value')
+
+INTERVALS = {
+    'day': None,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def record_snapshot(today):
+    """
+    Grava a foto do dia. Somente inserção: se o dia já foi gravado, as linhas
+    existentes são mantidas. Retorna a quantidade de linhas novas.
+    """
+    rows = [
+        StockSnapshot(
+            date=today,
+            category=row.key,
+            **{metric: getattr(row, metric) for metric in METRICS},
+        )
+        for row in inventory_summary.compute_rows(today, dimensions=['category'])
+    ]
+    existing = StockSnapshot.objects.filter(date=today).count()
+    StockSnapshot.objects.bulk_create(rows, ignore_conflicts=True)
+    return StockSnapshot.objects.filter(date=today).count() - existing
+
+
+def history(start, end, interval='day', category=None):
+    """
+    Série agregada entre start e end (inclusive).
+
+    Em semanas/meses cada ponto é a média diária do período: soma das fotos
+    dividida pela quantidade de dias com foto (os totais são estoque, não fluxo).
+    category=None soma todas as categorias; 0 = produtos sem categoria.
+    """
+    queryset = StockSnapshot.objects.filter(date__gte=start, date__lte=end)
+    if category is not None:
+        queryset = queryset.filter(category=category)
+
+    trunc = INTERVALS[interval]
+    period = trunc('date') if trunc else F('date')
+    rows = (
+        queryset.order_by()
+        .annotate(period=period)
+        .values('period')
+        .annotate(days=Count('date', distinct=True), **{metric: Sum(metric) for metric in METRICS})
+        .order_by('period')
+    )
+
+    points = []
+    for row in rows:
+        days = row['days']
+        point = {'period': row['period'], 'days': days}
+        for metric in METRICS:
+            average = Decimal(row[metric] or 0) / days
+            if metric in MONEY_METRICS:
+                point[metric] = f"{average:.2f}"
+            else:
+                point[metric] = round(average)
+        points.append(point)
+    return points
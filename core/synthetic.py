@@ -0,0 +1,117 @@
+# core/synthetic.py
+
+"""
+Gerador de catálogos sintéticos reprodutíveis para testes de desempenho.
+
+A mesma semente sempre gera o mesmo catálogo, permitindo comparar
+benchmarks entre versões. As distribuições imitam um estoque real:
+poucas categorias/marcas concentram a maior parte dos produtos, a maioria
+dos itens vence em meses, e uma parcela pequena está vencida ou perto de vencer.
+"""
+
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from . import expiry
+
+CATEGORY_NAMES = [
+    'Cabelo', 'Finalização', 'Laticínios', 'Bebidas', 'Padaria', 'Hortifruti',
+    'Carnes', 'Congelados', 'Limpeza', 'Higiene', 'Mercearia', 'Enlatados',
+    'Cereais', 'Doces', 'Snacks', 'Pet', 'Bebê', 'Farmácia', 'Frios', 'Massas',
+]
+
+PRODUCT_WORDS = [
+    'Shampoo', 'Condicionador', 'Máscara', 'Creme', 'Leite', 'Iogurte', 'Queijo',
+    'Suco', 'Refrigerante', 'Pão', 'Biscoito', 'Arroz', 'Feijão', 'Macarrão',
+    'Sabonete', 'Detergente', 'Café', 'Chocolate', 'Molho', 'Azeite',
+]
+
+PRODUCT_QUALIFIERS = [
+    'Integral', 'Hidratante', 'Light', 'Tradicional', 'Premium', 'Orgânico',
+    'Zero', 'Reconstrutor', 'Natural', 'Especial', 'Extra', 'Original',
+]
+
+
+class SyntheticCatalog:
+    """
+    Gera categorias, marcas e produtos sintéticos de forma determinística.
+
+    Args:
+        seed: Semente do gerador aleatório
+        categories: Quantidade de categorias
+        brands: Quantidade de marcas
+    """
+
+    def __init__(self, seed=42, categories=20, brands=100):
+        self.seed = seed
+        self.category_count = categories
+        self.brand_count = brands
+        # Data local, como o resto do sistema (as faixas de validade dependem dela)
+        self.today = expiry.local_today()
+
+    def category_names(self):
+        names = []
+        for i in range(self.category_count):
+            base = CATEGORY_NAMES[i % len(CATEGORY_NAMES)]
+            names.append(base if i < len(CATEGORY_NAMES) else f"{base} {i // len(CATEGORY_NAMES) + 1}")
+        return names
+
+    def brand_names(self):
+        return [f"Marca {i + 1:04d}" for i in range(self.brand_count)]
+
+    def _zipf_weights(self, size):
+        # Poucos itens concentram a maior parte dos produtos (lei de Zipf)
+        return [1.0 / (rank + 1) for rank in range(size)]
+
+    def _expiration_date(self, rng):
+        roll = rng.random()
+        if roll < 0.05:
+            return None  # Sem validade
+        if roll < 0.15:
+            return self.today - timedelta(days=rng.randint(1, 120))  # Vencido
+        if roll < 0.22:
+            return self.today + timedelta(days=rng.randint(0, 7))  # Crítico
+        if roll < 0.35:
+            return self.today + timedelta(days=rng.randint(8, 30))  # Aviso
+        return self.today + timedelta(days=rng.randint(31, 720))
+
+    def _quantity(self, rng):
+        if rng.random() < 0.05:
+            return 0
+        return int(rng.expovariate(1 / 40))
+
+    def _price(self, rng):
+        return Decimal(str(round(min(rng.lognormvariate(3, 0.8), 99999), 2)))
+
+    def sku_prefix(self):
+        """Início comum dos SKUs desta semente"""
+        return f"{self.seed % 1000:03d}"
+
+    def sku(self, index):
+        """Código EAN-13 determinístico do produto `index` (a semente entra no código)"""
+        digits = f"{self.sku_prefix()}{index:09d}"
+        total = sum(int(d) * (3 if position % 2 else 1) for position, d in enumerate(digits))
+        return f"{digits}{(10 - total % 10) % 10}"
+
+    def iter_products(self, count, category_ids, brand_ids, start=0):
+        """
+        Gera `count` dicionários de produto. `start` permite retomar a sequência
+        sem perder a reprodutibilidade (cada índice tem sua própria semente).
+        """
+        category_weights = self._zipf_weights(len(category_ids))
+        brand_weights = self._zipf_weights(len(brand_ids))
+        for i in range(start, start + count):
+            rng = random.Random(self.seed * 1_000_003 + i)
+            name = f"{rng.choice(PRODUCT_WORDS)} {rng.choice(PRODUCT_QUALIFIERS)} {i + 1:07d}"
+            yield {
+                'name': name,
+                'description': f"{name} - item sintético para testes de desempenho" if rng.random() < 0.7 else None,
+                'price': self._price(rng),
+                'quantity': self._quantity(rng),
+                'expiration_date': self._expiration_date(rng),
+                'category_id': rng.choices(category_ids, category_weights)[0] if category_ids and rng.random() < 0.95 else None,
+                'brand_id': rng.choices(brand_ids, brand_weights)[0] if brand_ids and rng.random() < 0.9 else None,
+                'batch': f"LT{rng.randint(0, 99999999):08d}",
+                'sku': self.sku(i),
+            }
@@ -1,20 +1,36 @@
 # core/tasks.py
 
+from django.core.cache import cache
 from django.core.mail import send_mail
-from django.utils import timezone
-from datetime import timedelta
+from django.db.models import Max, Min, Value
+from datetime import date
 from .models import Product, Notification
 from .push_utils import send_push_notification, send_desktop_notification
+from .telemetry import TaskTelemetry
+from .cache_utils import invalidate_notifications, invalidate_products
+from .db_router import use_replica
+from .lookup_cache import brands
+from . import changes, expiry, forecast, inventory, inventory_summary, reorder, stock_history
 from django.conf import settings
 from django.contrib.auth.models import User
 import logging
+import time
+import uuid
 
 logger = logging.getLogger(__name__)
 
-def check_expiring_products_and_notify():
+# Máximo de linhas de produtos que cada lote devolve para o e-mail de resumo
+# (o resultado de cada lote fica salvo no banco do django-q)
+DIGEST_MAX_LINES = 500
+
+def check_expiring_products_and_notify(**kwargs):
     """
     Busca produtos próximos da validade (7 dias para críticos, 30 dias para avisos)
     e envia notificações por e-mail e push.
+
+    Args:
+        chunk_size: Tamanho (em faixa de IDs) dos lotes processados em paralelo
+                    (padrão: ALERT_TASK_CHUNK_SIZE; 0 processa tudo nesta task)
     """
     import sys
     print("\n" + "="*70, file=sys.stdout, flush=True)
@@ -23,97 +39,150 @@ def check_expiring_products_and_notify():
     logger.info("=" * 60)
     logger.info("🔔 EXECUTANDO: check_expiring_products_and_notify")
     logger.info("=" * 60)
-    today = timezone.now().date()
-    
-    # Produtos críticos: 0-7 dias
-    critical_limit = today + timedelta(days=7)
-    critical_products = Product.objects.filter(
-        expiration_date__gte=today,
-        expiration_date__lte=critical_limit,
-        quantity__gt=0
-    ).order_by('expiration_date')
-    
-    # Produtos em aviso: 8-30 dias
-    warning_limit = today + timedelta(days=30)
-    warning_products = Product.objects.filter(
-        expiration_date__gt=critical_limit,
-        expiration_date__lte=warning_limit,
-        quantity__gt=0
-    ).order_by('expiration_date')
-    
-    results = []
-    
-    # Processa produtos críticos
-    if critical_products.exists():
-        result_critical = _send_notifications_for_products(
-            critical_products, 
-            "CRÍTICO", 
-            "produtos críticos próximos da validade",
-            today
-        )
-        results.append(result_critical)
-    
-    # Processa produtos em aviso (apenas se não houver críticos, para evitar spam)
-    if warning_products.exists() and not critical_products.exists():
-        result_warning = _send_notifications_for_products(
-            warning_products,
-            "AVISO",
-            "produtos próximos da validade",
-            today
-        )
-        results.append(result_warning)
-    
-    if not results:
-        logger.info("Nenhum produto próximo da validade encontrado.")
-        return "✅ Nenhum produto próximo da validade encontrado. Tudo em ordem!"
-    
-    return " | ".join(results)
+    with TaskTelemetry('check_expiring_products_and_notify') as telemetry:
+        today = expiry.local_today()
+
+        with telemetry.phase('query'), use_replica():
+            telemetry.catalog_size = Product.objects.count()
+            critical_products = _expiring_products("CRÍTICO", today)
+            warning_products = _expiring_products("AVISO", today)
+            has_critical = critical_products.exists()
+            has_warning = warning_products.exists()
+
+        chunk_size = _chunk_size(kwargs)
+        if chunk_size and telemetry.catalog_size > chunk_size and (has_critical or has_warning):
+            # Mesma regra abaixo: avisos só quando não há críticos
+            severity = "CRÍTICO" if has_critical else "AVISO"
+            telemetry.result = _dispatch_chunks(
+                telemetry,
+                'core.tasks.process_expiring_chunk',
+                _expiring_products(severity, today),
+                chunk_size,
+                alert_task='check_expiring_products_and_notify',
+                severity=severity,
+                today=today.isoformat(),
+            )
+            return telemetry.result
+
+        results = []
+
+        # Processa produtos críticos
+        if has_critical:
+            result_critical = _send_notifications_for_products(
+                critical_products,
+                "CRÍTICO",
+                "produtos críticos próximos da validade",
+                today,
+                telemetry
+            )
+            results.append(result_critical)
 
-def _send_notifications_for_products(products, severity, description, today):
+        # Processa produtos em aviso (apenas se não houver críticos, para evitar spam)
+        if has_warning and not has_critical:
+            result_warning = _send_notifications_for_products(
+                warning_products,
+                "AVISO",
+                "produtos próximos da validade",
+                today,
+                telemetry
+            )
+            results.append(result_warning)
+
+        if not results:
+            logger.info("Nenhum produto próximo da validade encontrado.")
+            telemetry.result = "✅ Nenhum produto próximo da validade encontrado. Tudo em ordem!"
+        else:
+            telemetry.result = " | ".join(results)
+
+    return telemetry.result
+
+def _expiring_products(severity, today):
+    """
+    Produtos com estoque crítico (0-7 dias) ou em aviso (8-30 dias), avaliados
+    lote a lote (core.inventory), em ordem de validade
+    """
+    buckets = expiry.WEEK_BUCKETS if severity == "CRÍTICO" else [expiry.UPCOMING]
+    return inventory.products_in_buckets(buckets, today).order_by('lot_expiration', 'id')
+
+
+def _send_notifications_for_products(products, severity, description, today, telemetry):
     """Helper para enviar notificações de um grupo de produtos"""
-    count = products.count()
-    
-    # Prepara mensagens em português
-    if severity == "CRÍTICO":
-        title = f"⚠️ Alerta Crítico: {count} produto(s) próximo(s) da validade"
-        push_message = f"{count} produto(s) vence(m) nos próximos 7 dias! Ação urgente necessária."
-    else:
-        title = f"🔔 Aviso: {count} produto(s) próximo(s) da validade"
-        push_message = f"{count} produto(s) vence(m) nos próximos 30 dias."
-    
-    message_lines = [f"Os seguintes produtos estão próximos da data de validade ({severity}):\n"]
-    message_lines.append("=" * 60 + "\n")
-    
-    notifications_created = 0
+    with telemetry.phase('query'), use_replica():
+        products = list(products)
+    count = len(products)
+    telemetry.incr('products_scanned', count)
+
+    product_lines, notifications = _build_expiring_notifications(products, today)
+
+    recipients = _notification_recipients()
+    notifications = _fan_out(notifications, recipients)
+    with telemetry.phase('db_write'):
+        Notification.objects.bulk_create(notifications)
+        invalidate_notifications()
+    telemetry.incr('notifications_created', len(notifications))
+
+    return _send_expiring_digest(
+        severity, count, product_lines, [p.name for p in products[:3]], today, recipients, telemetry
+    )
+
+
+def _build_expiring_notifications(products, today):
+    """Monta as linhas do e-mail e as notificações (ainda não salvas) de cada produto"""
+    product_lines = []
+    notifications = []
     
     for product in products:
-        days_left = (product.expiration_date - today).days
+        # Validade e unidades dos lotes na faixa (produtos sem lotes: os próprios campos)
+        expiration_date = product.lot_expiration
+        quantity = product.lot_quantity
+        days_left = (expiration_date - today).days
+        brand_name = brands.name(product.brand_id)
         product_msg = (
             f"• {product.name}"
-            f"{f' - Marca: {product.brand.name}' if product.brand else ''}"
-            f"\n  Vence em: {days_left} dia(s) ({product.expiration_date.strftime('%d/%m/%Y')})"
-            f"\n  Quantidade em estoque: {product.quantity} unidade(s)\n"
+            f"{f' - Marca: {brand_name}' if brand_name else ''}"
+            f"\n  Vence em: {days_left} dia(s) ({expiration_date.strftime('%d/%m/%Y')})"
+            + (
+                f"\n  Quantidade em estoque: {quantity} unidade(s)\n" if quantity == product.quantity
+                else f"\n  Quantidade a vencer: {quantity} de {product.quantity} unidade(s) em estoque\n"
+            )
         )
-        message_lines.append(product_msg)
+        product_lines.append(product_msg)
         
         # Cria notificação no banco para cada produto com mensagem em português
         if days_left == 0:
             notification_title = f"⚠️ {product.name} - Vence HOJE!"
-            notification_msg = f"ATENÇÃO! {product.name} vence hoje ({product.expiration_date.strftime('%d/%m/%Y')}). Ação imediata necessária!"
+            notification_msg = f"ATENÇÃO! {product.name} vence hoje ({expiration_date.strftime('%d/%m/%Y')}). Ação imediata necessária!"
         elif days_left <= 3:
             notification_title = f"🚨 {product.name} - Vence em {days_left} dia(s)"
-            notification_msg = f"{product.name} vence em {days_left} dia(s) ({product.expiration_date.strftime('%d/%m/%Y')}). Quantidade: {product.quantity}."
+            notification_msg = f"{product.name} vence em {days_left} dia(s) ({expiration_date.strftime('%d/%m/%Y')}). Quantidade: {quantity}."
         else:
             notification_title = f"📅 {product.name} - Vence em {days_left} dias"
-            notification_msg = f"{product.name} vence em {days_left} dias ({product.expiration_date.strftime('%d/%m/%Y')}). Quantidade: {product.quantity}."
+            notification_msg = f"{product.name} vence em {days_left} dias ({expiration_date.strftime('%d/%m/%Y')}). Quantidade: {quantity}."
         
-        Notification.objects.create(
+        notifications.append(Notification(
             title=notification_title,
             message=notification_msg,
             notification_type='expiring_soon',
             product=product
-        )
-        notifications_created += 1
+        ))
+    return product_lines, notifications
+
+
+def _send_expiring_digest(severity, count, product_lines, sample_names, today, recipients, telemetry, omitted=0):
+    """Envia o resumo (e-mail, push e desktop) de um grupo de produtos próximos da validade"""
+    # Prepara mensagens em português
+    if severity == "CRÍTICO":
+        title = f"⚠️ Alerta Crítico: {count} produto(s) próximo(s) da validade"
+        push_message = f"{count} produto(s) vence(m) nos próximos 7 dias! Ação urgente necessária."
+    else:
+        title = f"🔔 Aviso: {count} produto(s) próximo(s) da validade"
+        push_message = f"{count} produto(s) vence(m) nos próximos 30 dias."
+    
+    message_lines = [f"Os seguintes produtos estão próximos da data de validade ({severity}):\n"]
+    message_lines.append("=" * 60 + "\n")
+    message_lines.extend(product_lines)
+    if omitted:
+        message_lines.append(f"... e mais {omitted} produto(s).\n")
     
     message = "\n".join(message_lines)
     message += "\n" + "=" * 60
@@ -122,7 +191,8 @@ def _send_notifications_for_products(products, severity, description, today):
     message += f"\nData da verificação: {today.strftime('%d/%m/%Y')}\n"
     
     # Envia e-mail
-    email_result = _send_email_notification(title, message)
+    with telemetry.phase('email'):
+        email_result = _send_email_notification(title, message)
     
     # Envia push notifications
     import sys
@@ -130,11 +200,13 @@ def _send_notifications_for_products(products, severity, description, today):
     print(f"🚀 ENVIANDO PUSH NOTIFICATION - Produtos Próximos da Validade", file=sys.stdout, flush=True)
     print(f"{'='*70}", file=sys.stdout, flush=True)
     logger.info(f"📤 Chamando send_push_notification para produtos próximos da validade...")
-    push_result = send_push_notification(
-        title=title,
-        message=push_message,
-        data={"type": "expiring_products", "count": count, "severity": severity.lower()}
-    )
+    with telemetry.phase('push'):
+        push_result = _send_push_to_recipients(
+            recipients,
+            title=title,
+            message=push_message,
+            data={"type": "expiring_products", "count": count, "severity": severity.lower()}
+        )
     print(f"✅ Push resultado: {push_result}", file=sys.stdout, flush=True)
     logger.info(f"📤 Resultado do push: {push_result}")
     
@@ -144,25 +216,19 @@ def _send_notifications_for_products(products, severity, description, today):
     duration = 15 if severity == "CRÍTICO" else 10
     
     # Prepara mensagem resumida para desktop
-    desktop_message = push_message
-    if count > 5:
-        # Se houver muitos produtos, mostra apenas os primeiros na notificação desktop
-        first_products = products[:3]
-        product_names = ", ".join([p.name for p in first_products])
-        if count > 3:
-            desktop_message = f"{product_names} e mais {count - 3} produto(s). {push_message}"
-        else:
-            desktop_message = f"{product_names}. {push_message}"
-    
-    desktop_result = send_desktop_notification(
-        title=title,
-        message=desktop_message,
-        duration=duration,
-        urgency=urgency
-    )
+    desktop_message = _desktop_message(push_message, count, sample_names)
+    
+    with telemetry.phase('desktop'):
+        desktop_result = send_desktop_notification(
+            title=title,
+            message=desktop_message,
+            duration=duration,
+            urgency=urgency
+        )
+    _record_channel_counters(telemetry, email_result, push_result, desktop_result)
     
     logger.info(
-        f"Notificações enviadas: {notifications_created} no banco, "
+        f"Notificações enviadas: {telemetry.counters.get('notifications_created', 0)} no banco, "
         f"Email: {email_result}, Push: {push_result.get('sent', 0)} enviados, "
         f"Desktop: {'✅' if desktop_result.get('sent') else '❌'}"
     )
@@ -172,12 +238,15 @@ def _send_notifications_for_products(products, severity, description, today):
 
 def check_low_stock_and_notify(**kwargs):
     """
-    Verifica produtos com estoque baixo (menos que min_quantity unidades)
-    e envia notificações por e-mail, push e desktop.
+    Verifica produtos com estoque baixo (abaixo do nível de reposição de cada
+    produto, ver core.reorder) e envia notificações por e-mail, push e desktop.
     
     Args:
-        min_quantity: Quantidade mínima para considerar estoque baixo (padrão: 2)
+        min_quantity: Limite único (legado) que substitui os níveis de reposição:
+                      estoque baixo = menos que min_quantity unidades.
                       Pode ser passado via kwargs do schedule
+        chunk_size: Tamanho (em faixa de IDs) dos lotes processados em paralelo
+                    (padrão: ALERT_TASK_CHUNK_SIZE; 0 processa tudo nesta task)
     """
     import sys
     print("\n" + "="*70, file=sys.stdout, flush=True)
@@ -186,41 +255,105 @@ def check_low_stock_and_notify(**kwargs):
     logger.info("=" * 60)
     logger.info("🔔 EXECUTANDO: check_low_stock_and_notify")
     logger.info("=" * 60)
-    # Obtém min_quantity dos kwargs (pode vir do schedule) ou usa padrão
-    min_quantity = kwargs.get('min_quantity', 2)
-    print(f"📊 Min quantity: {min_quantity}", file=sys.stdout, flush=True)
-    logger.info(f"📊 Min quantity: {min_quantity}")
-    # Busca produtos com quantidade menor que min_quantity
-    low_stock_products = Product.objects.filter(
+    # min_quantity dos kwargs (schedules antigos) substitui os níveis de reposição
+    min_quantity = kwargs.get('min_quantity')
+    if min_quantity is None:
+        print("📊 Limite: nível de reposição de cada produto", file=sys.stdout, flush=True)
+        logger.info("📊 Limite: nível de reposição de cada produto")
+    else:
+        print(f"📊 Min quantity: {min_quantity}", file=sys.stdout, flush=True)
+        logger.info(f"📊 Min quantity: {min_quantity}")
+    with TaskTelemetry('check_low_stock_and_notify') as telemetry:
+        telemetry.result = _notify_low_stock(min_quantity, telemetry, _chunk_size(kwargs))
+    return telemetry.result
+
+
+def _low_stock_products(min_quantity=None):
+    """
+    Produtos com estoque baixo (mas não zerado), do menor estoque para o maior.
+
+    Sem min_quantity usa a coluna is_low_stock (índice parcial, ver core.reorder);
+    reorder_point traz o nível usado na comparação, para o texto do alerta.
+    """
+    if min_quantity is None:
+        products = Product.objects.filter(is_low_stock=True).annotate(reorder_point=reorder.level_expression())
+    else:
+        products = Product.objects.filter(quantity__lt=min_quantity).annotate(reorder_point=Value(min_quantity))
+    return products.filter(
         quantity__gt=0,  # Apenas produtos com estoque > 0
-        quantity__lt=min_quantity
     ).order_by('quantity', 'name')
+
+
+def _low_stock_limit(min_quantity):
+    """Descrição do limite usado, para os textos do alerta"""
+    if min_quantity is None:
+        return "abaixo do nível de reposição"
+    return f"menos de {min_quantity} unidades"
+
+
+def _notify_low_stock(min_quantity, telemetry, chunk_size=0):
+    """Helper que busca os produtos com estoque baixo e envia as notificações"""
+    with telemetry.phase('query'), use_replica():
+        telemetry.catalog_size = Product.objects.count()
+        if chunk_size and telemetry.catalog_size > chunk_size:
+            low_stock_products = _low_stock_products(min_quantity)
+            if low_stock_products.exists():
+                return _dispatch_chunks(
+                    telemetry,
+                    'core.tasks.process_low_stock_chunk',
+                    low_stock_products,
+                    chunk_size,
+                    alert_task='check_low_stock_and_notify',
+                    min_quantity=min_quantity,
+                )
+            low_stock_products = []
+        else:
+            # Busca produtos com estoque baixo
+            low_stock_products = list(_low_stock_products(min_quantity))
     
-    if not low_stock_products.exists():
-        msg = f"Nenhum produto com estoque baixo encontrado (menos de {min_quantity} unidades)."
+    if not low_stock_products:
+        msg = f"Nenhum produto com estoque baixo encontrado ({_low_stock_limit(min_quantity)})."
         print(f"\n✅ {msg}")
         logger.info(msg)
         return f"✅ Nenhum produto com estoque baixo encontrado. Tudo em ordem!"
     
-    count = low_stock_products.count()
-    
-    # Prepara mensagens
-    title = f"📦 Alerta: {count} produto(s) com estoque baixo"
-    push_message = f"{count} produto(s) com menos de {min_quantity} unidade(s) em estoque!"
-    
-    message_lines = [f"Os seguintes produtos estão com estoque baixo (menos de {min_quantity} unidades):\n"]
-    message_lines.append("=" * 60 + "\n")
-    
-    notifications_created = 0
+    count = len(low_stock_products)
+    telemetry.incr('products_scanned', count)
+    
+    product_lines, notifications = _build_low_stock_notifications(low_stock_products)
+    
+    recipients = _notification_recipients()
+    notifications = _fan_out(notifications, recipients)
+    with telemetry.phase('db_write'):
+        Notification.objects.bulk_create(notifications)
+        invalidate_notifications()
+    telemetry.incr('notifications_created', len(notifications))
+    
+    return _send_low_stock_digest(
+        min_quantity,
+        count,
+        product_lines,
+        [p.name for p in low_stock_products[:3]],
+        min(p.quantity for p in low_stock_products),
+        recipients,
+        telemetry,
+    )
+
+
+def _build_low_stock_notifications(products):
+    """Monta as linhas do e-mail e as notificações (ainda não salvas) de cada produto"""
+    product_lines = []
+    notifications = []
     
-    for product in low_stock_products:
+    for product in products:
+        brand_name = brands.name(product.brand_id)
         product_msg = (
             f"• {product.name}"
-            f"{f' - Marca: {product.brand.name}' if product.brand else ''}"
-            f"\n  Quantidade atual: {product.quantity} unidade(s)"
+            f"{f' - Marca: {brand_name}' if brand_name else ''}"
+            f"\n  Quantidade atual: {product.quantity} unidade(s) (nível de reposição: {product.reorder_point})"
             f"\n  Preço: R$ {product.price:.2f}\n"
         )
-        message_lines.append(product_msg)
+        product_lines.append(product_msg)
         
         # Cria notificação no banco para cada produto
         if product.quantity == 0:
@@ -233,22 +366,39 @@ def check_low_stock_and_notify(**kwargs):
             notification_title = f"📦 {product.name} - Estoque baixo ({product.quantity} unidades)"
             notification_msg = f"{product.name} está com apenas {product.quantity} unidade(s) em estoque. Considere repor."
         
-        Notification.objects.create(
+        notifications.append(Notification(
             title=notification_title,
             message=notification_msg,
             notification_type='low_stock',
             product=product
-        )
-        notifications_created += 1
+        ))
+    return product_lines, notifications
+
+
+def _send_low_stock_digest(min_quantity, count, product_lines, sample_names, lowest_quantity, recipients, telemetry, omitted=0):
+    """Envia o resumo (e-mail, push e desktop) dos produtos com estoque baixo"""
+    # Prepara mensagens
+    title = f"📦 Alerta: {count} produto(s) com estoque baixo"
+    push_message = (
+        f"{count} produto(s) abaixo do nível de reposição!" if min_quantity is None
+        else f"{count} produto(s) com menos de {min_quantity} unidade(s) em estoque!"
+    )
+    
+    message_lines = [f"Os seguintes produtos estão com estoque baixo ({_low_stock_limit(min_quantity)}):\n"]
+    message_lines.append("=" * 60 + "\n")
+    message_lines.extend(product_lines)
+    if omitted:
+        message_lines.append(f"... e mais {omitted} produto(s).\n")
     
     message = "\n".join(message_lines)
     message += "\n" + "=" * 60
     message += f"\n\nTotal de produtos com estoque baixo: {count}"
-    message += f"\nLimite configurado: menos de {min_quantity} unidades"
-    message += f"\nData da verificação: {timezone.now().date().strftime('%d/%m/%Y')}\n"
+    message += f"\nLimite configurado: {_low_stock_limit(min_quantity)}"
+    message += f"\nData da verificação: {expiry.local_today().strftime('%d/%m/%Y')}\n"
     
     # Envia e-mail
-    email_result = _send_email_notification(title, message)
+    with telemetry.phase('email'):
+        email_result = _send_email_notification(title, message)
     
     # Envia push notifications
     import sys
@@ -256,37 +406,34 @@ def check_low_stock_and_notify(**kwargs):
     print(f"🚀 ENVIANDO PUSH NOTIFICATION - Estoque Baixo", file=sys.stdout, flush=True)
     print(f"{'='*70}", file=sys.stdout, flush=True)
     logger.info(f"📤 Chamando send_push_notification para estoque baixo...")
-    push_result = send_push_notification(
-        title=title,
-        message=push_message,
-        data={"type": "low_stock", "count": count, "min_quantity": min_quantity}
-    )
+    with telemetry.phase('push'):
+        push_result = _send_push_to_recipients(
+            recipients,
+            title=title,
+            message=push_message,
+            data={"type": "low_stock", "count": count, "min_quantity": min_quantity}
+        )
     print(f"✅ Push resultado: {push_result}", file=sys.stdout, flush=True)
     logger.info(f"📤 Resultado do push: {push_result}")
     
     # Envia notificação desktop (Windows)
-    urgency = 'critical' if any(p.quantity == 0 for p in low_stock_products) else 'normal'
-    duration = 15 if any(p.quantity <= 1 for p in low_stock_products) else 10
+    urgency = 'critical' if lowest_quantity == 0 else 'normal'
+    duration = 15 if lowest_quantity <= 1 else 10
     
     # Prepara mensagem resumida para desktop
-    desktop_message = push_message
-    if count > 5:
-        first_products = low_stock_products[:3]
-        product_names = ", ".join([p.name for p in first_products])
-        if count > 3:
-            desktop_message = f"{product_names} e mais {count - 3} produto(s). {push_message}"
-        else:
-            desktop_message = f"{product_names}. {push_message}"
-    
-    desktop_result = send_desktop_notification(
-        title=title,
-        message=desktop_message,
-        duration=duration,
-        urgency=urgency
-    )
+    desktop_message = _desktop_message(push_message, count, sample_names)
+    
+    with telemetry.phase('desktop'):
+        desktop_result = send_desktop_notification(
+            title=title,
+            message=desktop_message,
+            duration=duration,
+            urgency=urgency
+        )
+    _record_channel_counters(telemetry, email_result, push_result, desktop_result)
     
     logger.info(
-        f"Notificações de estoque baixo enviadas: {notifications_created} no banco, "
+        f"Notificações de estoque baixo enviadas: {telemetry.counters.get('notifications_created', 0)} no banco, "
         f"Email: {email_result}, Push: {push_result.get('sent', 0)} enviados, "
         f"Desktop: {'✅' if desktop_result.get('sent') else '❌'}"
     )
@@ -295,6 +442,321 @@ def check_low_stock_and_notify(**kwargs):
     return f"Estoque Baixo: {count} produto(s) - Email: {email_result}, Push: {push_result.get('sent', 0)} enviados, Desktop: {desktop_status}"
 
 
+def _desktop_message(push_message, count, sample_names):
+    """Mensagem resumida para o desktop: com muitos produtos, cita apenas os primeiros"""
+    if count <= 5:
+        return push_message
+    product_names = ", ".join(sample_names[:3])
+    return f"{product_names} e mais {count - 3} produto(s). {push_message}"
+
+
+# ---------------------------------------------------------------------------
+# Processamento em lotes (map/reduce) das tasks de alerta
+#
+# Com ALERT_TASK_CHUNK_SIZE > 0 (ou chunk_size nos kwargs do schedule), a task
+# agendada apenas divide o catálogo em faixas de ID e enfileira um lote por
+# faixa. Cada lote grava suas notificações e devolve contadores e as linhas do
+# e-mail; o hook de cada lote verifica se o grupo terminou e o último envia um
+# único resumo. Mais workers no qcluster = mais lotes em paralelo.
+# ---------------------------------------------------------------------------
+
+def _chunk_size(kwargs):
+    """Tamanho dos lotes: kwargs do schedule ou ALERT_TASK_CHUNK_SIZE (0 = sem lotes)"""
+    return int(kwargs.get('chunk_size', getattr(settings, 'ALERT_TASK_CHUNK_SIZE', 0)) or 0)
+
+
+def _dispatch_chunks(telemetry, func, products, chunk_size, **params):
+    """Enfileira um lote por faixa de IDs dos produtos candidatos (mesmo grupo do django-q)"""
+    from django_q.tasks import async_task
+
+    with telemetry.phase('query'), use_replica():
+        id_range = products.aggregate(first=Min('id'), last=Max('id'))
+    ranges = [
+        (id_from, id_from + chunk_size)
+        for id_from in range(id_range['first'], id_range['last'] + 1, chunk_size)
+    ]
+    group = f"{params['alert_task']}:{uuid.uuid4().hex[:12]}"
+
+    with telemetry.phase('dispatch'):
+        for id_from, id_to in ranges:
+            async_task(
+                func,
+                id_from,
+                id_to,
+                group=group,
+                hook='core.tasks.aggregate_alert_chunks',
+                chunks=len(ranges),
+                catalog_size=telemetry.catalog_size,
+                dispatched_at=time.time(),
+                **params,
+            )
+    telemetry.set('chunks', len(ranges))
+
+    msg = f"🧩 {len(ranges)} lote(s) de até {chunk_size} IDs enfileirado(s) (grupo {group})"
+    logger.info(msg)
+    return msg
+
+
+def process_expiring_chunk(id_from, id_to, severity, today, **kwargs):
+    """Lote de check_expiring_products_and_notify: produtos com id em [id_from, id_to)"""
+    today = date.fromisoformat(today)
+    products = _expiring_products(severity, today).filter(id__gte=id_from, id__lt=id_to)
+    return _process_chunk(
+        products,
+        lambda chunk: _build_expiring_notifications(chunk, today),
+        lambda product: (product.lot_expiration.isoformat(), product.name),
+    )
+
+
+def process_low_stock_chunk(id_from, id_to, min_quantity, **kwargs):
+    """Lote de check_low_stock_and_notify: produtos com id em [id_from, id_to)"""
+    products = _low_stock_products(min_quantity).filter(id__gte=id_from, id__lt=id_to)
+    return _process_chunk(
+        products,
+        _build_low_stock_notifications,
+        lambda product: (product.quantity, product.name),
+    )
+
+
+def _process_chunk(products, build, sort_key):
+    """Grava as notificações de um lote e devolve o resultado parcial para o resumo"""
+    started = time.perf_counter()
+    with use_replica():
+        products = list(products)
+    query_ms = (time.perf_counter() - started) * 1000
+
+    product_lines, notifications = build(products)
+    notifications = _fan_out(notifications, _notification_recipients())
+
+    started = time.perf_counter()
+    if notifications:
+        Notification.objects.bulk_create(notifications)
+        invalidate_notifications()
+    db_write_ms = (time.perf_counter() - started) * 1000
+
+    return {
+        'count': len(products),
+        'notifications_created': len(notifications),
+        'lowest_quantity': min((p.quantity for p in products), default=None),
+        # [chave de ordenação, nome, linha do e-mail] dos primeiros produtos do lote
+        'entries': [
+            [list(sort_key(product)), product.name, line]
+            for product, line in list(zip(products, product_lines))[:DIGEST_MAX_LINES]
+        ],
+        'phases_ms': {'chunk_query': round(query_ms, 3), 'chunk_db_write': round(db_write_ms, 3)},
+    }
+
+
+def aggregate_alert_chunks(task):
+    """
+    Hook de cada lote: quando todos os lotes do grupo terminaram, soma os
+    resultados e envia um único resumo por e-mail, push e desktop.
+    """
+    from django_q.models import Task
+
+    params = task.kwargs
+    if Task.get_group_count(task.group) < params['chunks']:
+        return
+    # O hook roda a cada resultado salvo (inclusive novas tentativas): só o primeiro envia
+    if not cache.add(f"alert_digest:{task.group}", True, timeout=24 * 60 * 60):
+        return
+
+    results = Task.objects.filter(group=task.group)
+    chunk_results = [t.result for t in results if t.success and isinstance(t.result, dict)]
+    failed = len(results) - len(chunk_results)
+
+    with TaskTelemetry(params['alert_task']) as telemetry:
+        telemetry.catalog_size = params.get('catalog_size')
+        telemetry.set('chunks', params['chunks'])
+        telemetry.set('chunks_failed', failed)
+        for chunk in chunk_results:
+            telemetry.incr('products_scanned', chunk['count'])
+            telemetry.incr('notifications_created', chunk['notifications_created'])
+            for name, elapsed_ms in chunk['phases_ms'].items():
+                telemetry.phases[name] = round(telemetry.phases.get(name, 0) + elapsed_ms, 3)
+
+        count = sum(chunk['count'] for chunk in chunk_results)
+        entries = sorted(
+            (entry for chunk in chunk_results for entry in chunk['entries']),
+            key=lambda entry: entry[0],
+        )[:DIGEST_MAX_LINES]
+        product_lines = [entry[2] for entry in entries]
+        sample_names = [entry[1] for entry in entries[:3]]
+
+        if not count:
+            telemetry.result = f"Nenhum produto encontrado nos lotes ({failed} lote(s) com falha)."
+        elif params['alert_task'] == 'check_low_stock_and_notify':
+            telemetry.result = _send_low_stock_digest(
+                params['min_quantity'],
+                count,
+                product_lines,
+                sample_names,
+                min(chunk['lowest_quantity'] for chunk in chunk_results if chunk['count']),
+                _notification_recipients(),
+                telemetry,
+                omitted=count - len(product_lines),
+            )
+        else:
+            telemetry.result = _send_expiring_digest(
+                params['severity'],
+                count,
+                product_lines,
+                sample_names,
+                date.fromisoformat(params['today']),
+                _notification_recipients(),
+                telemetry,
+                omitted=count - len(product_lines),
+            )
+        if failed:
+            telemetry.result += f" | ⚠️ {failed} lote(s) com falha"
+        # Tempo total desde o disparo (inclui a espera na fila e os lotes em paralelo)
+        telemetry.set('elapsed_since_dispatch_ms', round((time.time() - params['dispatched_at']) * 1000, 3))
+
+    logger.info(f"🧩 Resumo do grupo {task.group}: {telemetry.result}")
+    return telemetry.result
+
+
+def rollover_expiry_buckets():
+    """
+    Virada diária das faixas de validade (agendada logo após a meia-noite).
+
+    Só os produtos que mudaram de faixa são atualizados (ex.: 'critical' -> 'expired').
+    Também confere a marcação de estoque baixo (core.reorder), que muda se
+    DEFAULT_REORDER_LEVEL for alterado.
+    """
+    with TaskTelemetry('rollover_expiry_buckets') as telemetry:
+        with telemetry.phase('db_write'):
+            changed = expiry.rollover()
+            low_stock_changed = reorder.refresh_low_stock()
+        if low_stock_changed:
+            invalidate_products()
+        telemetry.set('products_changed', changed)
+        telemetry.set('low_stock_changed', low_stock_changed)
+        telemetry.result = (
+            f"✅ Faixas de validade atualizadas: {changed} produto(s) mudaram de faixa, "
+            f"{low_stock_changed} de estoque baixo"
+        )
+    logger.info(telemetry.result)
+    return telemetry.result
+
+
+def rebuild_inventory_summary():
+    """
+    Reconstrói o resumo de estoque por categoria/marca (agendada toda noite).
+
+    Corrige eventuais desvios das atualizações incrementais e move para os
+    totais de vencidos os produtos que venceram no dia.
+    """
+    with TaskTelemetry('rebuild_inventory_summary') as telemetry:
+        # No primário: as linhas substituem o resumo, e uma réplica atrasada apagaria
+        # as diferenças aplicadas nesse meio-tempo até a próxima noite
+        with telemetry.phase('query'):
+            telemetry.catalog_size = Product.objects.count()
+            rows = inventory_summary.compute_rows()
+        with telemetry.phase('db_write'):
+            inventory_summary.replace_rows(rows)
+        telemetry.set('summary_rows', len(rows))
+        telemetry.result = f"✅ Resumo de estoque reconstruído: {len(rows)} linha(s)"
+    logger.info(telemetry.result)
+    return telemetry.result
+
+
+def record_stock_snapshot():
+    """Grava a foto diária do estoque por categoria (histórico para os gráficos de tendência)"""
+    with TaskTelemetry('record_stock_snapshot') as telemetry:
+        today = expiry.local_today()
+        with telemetry.phase('db_write'):
+            created = stock_history.record_snapshot(today)
+        telemetry.set('snapshot_rows', created)
+        telemetry.result = f"✅ Foto do estoque de {today.strftime('%d/%m/%Y')}: {created} linha(s)"
+    logger.info(telemetry.result)
+    return telemetry.result
+
+
+def refresh_forecasts(full=False):
+    """
+    Atualiza as previsões de ruptura e de perda por vencimento (core.forecast).
+
+    De hora em hora só os produtos movimentados desde o último cálculo;
+    com full=True (agendada toda noite) o catálogo inteiro.
+    """
+    with TaskTelemetry('refresh_forecasts') as telemetry:
+        with telemetry.phase('compute'):
+            computed = forecast.refresh(full=full)
+        telemetry.set('forecasts_computed', computed)
+        telemetry.set('full', full)
+        telemetry.result = f"✅ Previsões de estoque atualizadas: {computed} produto(s){' (recálculo completo)' if full else ''}"
+    logger.info(telemetry.result)
+    return telemetry.result
+
+
+def purge_product_tombstones():
+    """Remove os registros de exclusão mais antigos que CHANGES_TOMBSTONE_DAYS (agendada toda noite)"""
+    with TaskTelemetry('purge_product_tombstones') as telemetry:
+        with telemetry.phase('db_write'):
+            deleted = changes.purge_tombstones()
+        telemetry.set('tombstones_deleted', deleted)
+        telemetry.result = f"✅ Registros de exclusão antigos removidos: {deleted}"
+    logger.info(telemetry.result)
+    return telemetry.result
+
+
+def _notification_recipients():
+    """
+    Usuários que recebem as notificações das tasks.
+
+    Com NOTIFICATION_PER_USER desativado (padrão) retorna [None]: uma única
+    notificação sem usuário, visível para todos, e push para todos os dispositivos.
+    Ativado, cada usuário da equipe (is_staff) recebe suas próprias notificações
+    e push apenas nos seus dispositivos (sem nenhum ativo, volta para [None]).
+    """
+    if not getattr(settings, 'NOTIFICATION_PER_USER', False):
+        return [None]
+    recipients = list(User.objects.filter(is_active=True, is_staff=True).order_by('id'))
+    if not recipients:
+        # Sem ninguém da equipe ativo, o alerta não pode sumir: vira notificação geral
+        logger.warning("⚠️ NOTIFICATION_PER_USER ativo, mas não há usuários da equipe ativos: enviando notificação geral.")
+        return [None]
+    return recipients
+
+
+def _fan_out(notifications, recipients):
+    """Replica as notificações (ainda não salvas) para cada destinatário"""
+    if recipients == [None]:
+        return notifications
+    return [
+        Notification(
+            title=notification.title,
+            message=notification.message,
+            notification_type=notification.notification_type,
+            product=notification.product,
+            user=user,
+        )
+        for user in recipients
+        for notification in notifications
+    ]
+
+
+def _send_push_to_recipients(recipients, **kwargs):
+    """Envia o push para cada destinatário e soma os resultados"""
+    total = {"sent": 0, "failed": 0}
+    for user in recipients:
+        result = send_push_notification(user=user, **kwargs)
+        total["sent"] += result.get("sent", 0)
+        total["failed"] += result.get("failed", 0)
+        if result.get("error"):
+            total["error"] = result["error"]
+    return total
+
+
+def _record_channel_counters(telemetry, email_result, push_result, desktop_result):
+    """Registra na telemetria o resultado de cada canal de envio"""
+    telemetry.incr('emails_sent', 1 if str(email_result).startswith('Enviado') else 0)
+    telemetry.incr('push_sent', push_result.get('sent', 0))
+    telemetry.incr('push_failed', push_result.get('failed', 0))
+    telemetry.incr('desktop_sent', 1 if desktop_result.get('sent') else 0)
+
+
 def _send_email_notification(subject, message):
     """Helper para enviar e-mail de notificação com timeout"""
     from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@yourdomain.com')
@@ -0,0 +1,102 @@
+# core/telemetry.py
+
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class TaskTelemetry:
+    """
+    Coleta telemetria estruturada de uma execução de task do django-q.
+
+    Mede o tempo de cada fase (consulta, escrita no banco, e-mail, push, desktop)
+    e acumula contadores (produtos analisados, linhas gravadas, pushes enviados...).
+    Ao final emite uma linha de log em JSON e grava um registro em TaskRun.
+
+    Uso:
+        with TaskTelemetry('check_low_stock_and_notify') as telemetry:
+            with telemetry.phase('query'):
+                ...
+            telemetry.incr('products_scanned', 10)
+            telemetry.result = "..."
+    """
+
+    def __init__(self, task_name):
+        self.task_name = task_name
+        self.started_at = None
+        self.phases = {}
+        self.counters = {}
+        self.catalog_size = None
+        self.result = ''
+        self._start = None
+
+    def __enter__(self):
+        self.started_at = timezone.now()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.result = f"{exc_type.__name__}: {exc}"
+            self.finish(status='error')
+        else:
+            self.finish(status='success')
+        # Não suprime a exceção: o django-q precisa registrar a falha
+        return False
+
+    @contextmanager
+    def phase(self, name):
+        """Cronometra uma fase da task (acumula se a fase se repetir)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.phases[name] = round(self.phases.get(name, 0) + elapsed_ms, 3)
+
+    def incr(self, name, amount=1):
+        """Incrementa um contador"""
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set(self, name, value):
+        """Define o valor de um contador"""
+        self.counters[name] = value
+
+    def as_dict(self, status, duration_ms):
+        return {
+            'event': 'task_run',
+            'task': self.task_name,
+            'status': status,
+            'started_at': self.started_at.isoformat(),
+            'duration_ms': duration_ms,
+            'catalog_size': self.catalog_size,
+            'phases_ms': self.phases,
+            'counters': self.counters,
+        }
+
+    def finish(self, status='success'):
+        """Emite a linha de log JSON e persiste o TaskRun"""
+        duration_ms = round((time.perf_counter() - self._start) * 1000, 3)
+        logger.info(json.dumps(self.as_dict(status, duration_ms), ensure_ascii=False))
+
+        # A telemetria nunca deve quebrar a task
+        try:
+            from .models import TaskRun
+            TaskRun.objects.create(
+                task_name=self.task_name,
+                status=status,
+                started_at=self.started_at,
+                finished_at=timezone.now(),
+                duration_ms=duration_ms,
+                catalog_size=self.catalog_size,
+                phases=self.phases,
+                counters=self.counters,
+                result=str(self.result or '')[:1000],
+            )
+        except Exception as e:
+            logger.error(f"Falha ao gravar TaskRun de {self.task_name}: {e}")
@@ -1,3 +1,1252 @@
-from django.test import TestCase
+import gzip
+import io
+import uuid
+from contextlib import redirect_stdout
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from tablib import Dataset
+
+from . import (
+    changes, db_router, expiry, forecast, inventory, inventory_summary, lookup_cache, reorder, stock_history, tasks,
+)
+from .admin import ProductResource
+from .barcode_cache import BarcodeCache, barcodes
+from .cache_utils import CATEGORIES, bump_cache_version, dashboard_stats_key
+from .fast_json import ORJSONParser, ORJSONRenderer
+from .http_cache import PreconditionFailed
+from .middleware import BROTLI_AVAILABLE, CompressionMiddleware
+from .models import (
+    Brand, Category, InventorySummary, Lot, Notification, Product, ProductForecast, ProductTombstone, StockMovement,
+    StockSnapshot, TaskRun,
+)
+from .telemetry import TaskTelemetry
+from .views import ProductDetailView
+
+
+def quietly(func, *args, **kwargs):
+    """Roda uma task sem o print do progresso no console"""
+    with redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+class TaskTelemetryTests(TestCase):
+
+    def test_success_records_phases_and_counters(self):
+        with TaskTelemetry('demo') as telemetry:
+            with telemetry.phase('query'):
+                pass
+            with telemetry.phase('query'):
+                pass
+            telemetry.incr('products_scanned', 3)
+            telemetry.incr('products_scanned')
+            telemetry.set('chunks', 2)
+            telemetry.catalog_size = 10
+            telemetry.result = 'ok'
+
+        run = TaskRun.objects.get()
+        self.assertEqual((run.task_name, run.status, run.result, run.catalog_size), ('demo', 'success', 'ok', 10))
+        self.assertEqual(list(run.phases), ['query'])
+        self.assertEqual(run.counters, {'products_scanned': 4, 'chunks': 2})
+        self.assertGreaterEqual(run.finished_at, run.started_at)
+
+    def test_error_is_recorded_and_reraised(self):
+        with self.assertRaises(RuntimeError):
+            with TaskTelemetry('demo'):
+                raise RuntimeError('falhou')
+        run = TaskRun.objects.get()
+        self.assertEqual((run.status, run.result), ('error', 'RuntimeError: falhou'))
+
+    def test_alert_task_records_a_run(self):
+        Product.objects.create(name='Arroz', price=Decimal('5.00'), quantity=2)
+        quietly(tasks.check_low_stock_and_notify, chunk_size=0)
+        run = TaskRun.objects.get(task_name='check_low_stock_and_notify')
+        self.assertEqual(run.status, 'success')
+        self.assertEqual(run.catalog_size, 1)
+        self.assertEqual(run.counters['products_scanned'], 1)
+        self.assertIn('query', run.phases)
+        self.assertEqual(Notification.objects.filter(notification_type='low_stock').count(), 1)
+
+
+@override_settings(NOTIFICATION_EMAILS=['estoque@example.com'])
+class AlertChunkAggregationTests(TestCase):
+    """Lotes das tasks de alerta: o resumo do grupo é enviado uma única vez"""
+    group = 'check_low_stock_and_notify:teste'
+
+    def setUp(self):
+        from django_q.models import Task
+
+        cache.clear()
+        products = [
+            Product.objects.create(name=f'Produto {i}', price=Decimal('1.00'), quantity=i % 3 + 1)
+            for i in range(6)
+        ]
+        first = products[0].pk
+        self.tasks = []
+        for id_from in (first, first + 3):
+            kwargs = {
+                'chunks': 2,
+                'catalog_size': 6,
+                'dispatched_at': 0,
+                'alert_task': 'check_low_stock_and_notify',
+                'min_quantity': 2,
+            }
+            result = quietly(tasks.process_low_stock_chunk, id_from, id_from + 3, **kwargs)
+            self.tasks.append(Task(
+                id=f'task{id_from}', name=f'task{id_from}', func='core.tasks.process_low_stock_chunk',
+                args=(id_from, id_from + 3), kwargs=kwargs, result=result, group=self.group,
+                started=timezone.now(), stopped=timezone.now(), success=True,
+            ))
+
+    def _digests(self):
+        return TaskRun.objects.filter(task_name='check_low_stock_and_notify')
+
+    def test_digest_waits_for_the_whole_group_and_runs_once(self):
+        self.tasks[0].save()
+        self.assertIsNone(quietly(tasks.aggregate_alert_chunks, self.tasks[0]))
+        self.assertFalse(self._digests().exists())
+
+        self.tasks[1].save()
+        # Os hooks dos dois lotes (e uma nova tentativa) disparam; só um envia o resumo
+        for task in (self.tasks[0], self.tasks[1], self.tasks[1]):
+            quietly(tasks.aggregate_alert_chunks, task)
+
+        run = self._digests().get()
+        self.assertEqual(run.counters['chunks'], 2)
+        self.assertEqual(run.counters['chunks_failed'], 0)
+        # Quantidades 1, 2, 3, 1, 2, 3: dois lotes com um produto abaixo de 2 unidades
+        self.assertEqual(run.counters['products_scanned'], 2)
+        self.assertEqual(run.counters['notifications_created'], 2)
+        self.assertEqual(Notification.objects.filter(notification_type='low_stock').count(), 2)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('2 produto(s)', mail.outbox[0].subject)
+
+
+class FastJSONTests(SimpleTestCase):
+    """ORJSONRenderer/ORJSONParser (core.fast_json) contra o JSON padrão do DRF"""
+
+    data = {
+        'price': Decimal('12.50'),
+        'date': date(2026, 10, 19),
+        'datetime': datetime(2026, 10, 19, 8, 30, 15, 123456, tzinfo=timezone.get_fixed_timezone(-180)),
+        'utc': datetime(2026, 10, 19, 11, 30, tzinfo=timezone.get_fixed_timezone(0)),
+        'time': time(8, 30, 15, 500000),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'lazy': gettext_lazy('Produto'),
+        'text': 'Pão de açúcar \u2028 linha',
+        'nested': [{'quantity': 3, 'ratio': 0.25, 'none': None, 'flag': True}],
+        1: 'chave inteira',
+    }
+
+    def test_output_matches_drf_json_renderer(self):
+        self.assertEqual(ORJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+    def test_non_finite_floats_are_rejected(self):
+        for value in (float('nan'), float('inf'), float('-inf')):
+            with self.assertRaises(ValueError):
+                ORJSONRenderer().render({'rows': [{'rate': value}]})
+        # null legítimo continua saindo como null
+        self.assertEqual(ORJSONRenderer().render({'rate': None}), b'{"rate":null}')
+
+    def test_parser_round_trip(self):
+        body = ORJSONRenderer().render(self.data)
+        parsed = ORJSONParser().parse(io.BytesIO(body))
+        self.assertEqual(parsed, JSONParser().parse(io.BytesIO(body)))
+        # Decimal fora de um serializer sai como número (mesmo comportamento do encoder do DRF)
+        self.assertEqual(parsed['price'], 12.5)
+        self.assertEqual(parsed['datetime'], '2026-10-19T08:30:15.123456-03:00')
+        self.assertEqual(parsed['utc'], '2026-10-19T11:30:00Z')
+        self.assertEqual(parsed['1'], 'chave inteira')
+
+    def test_parser_rejects_invalid_json(self):
+        for body in (b'{"a": ', b'{"rate": NaN}'):
+            with self.assertRaises(ParseError):
+                ORJSONParser().parse(io.BytesIO(body))
+
+
+@override_settings(COMPRESSION_ENABLED=True, COMPRESSION_MIN_SIZE=1024)
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Compressão das respostas da API (core.middleware.CompressionMiddleware)"""
+    body = b'{"name": "Produto", "quantity": 10}' * 100
+
+    def _process(self, response, accept_encoding='gzip, deflate, br', path='/api/products/'):
+        request = RequestFactory().get(path, HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response).process_response(request, response)
+
+    def _json(self, body=None, **headers):
+        response = HttpResponse(body if body is not None else self.body, content_type='application/json')
+        for name, value in headers.items():
+            response.headers[name] = value
+        return response
+
+    def test_encoding_follows_accept_encoding(self):
+        expected = 'br' if BROTLI_AVAILABLE else 'gzip'
+        self.assertEqual(self._process(self._json())['Content-Encoding'], expected)
+        self.assertEqual(self._process(self._json(), 'br;q=0.5, gzip')['Content-Encoding'], 'gzip')
+
+        response = self._process(self._json(), 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+
+        for accept_encoding in ('', 'identity', 'gzip;q=0, br;q=0'):
+            self.assertFalse(self._process(self._json(), accept_encoding).has_header('Content-Encoding'))
+
+    def test_minimum_size_and_skipped_responses(self):
+        small = self._process(self._json(b'{"ok": true}'), 'gzip')
+        self.assertEqual(small.content, b'{"ok": true}')
+        self.assertFalse(small.has_header('Content-Encoding'))
+
+        skipped = [
+            self._json(**{'Content-Encoding': 'gzip'}),
+            self._json(**{'Cache-Control': 'no-transform'}),
+            HttpResponse(self.body, content_type='image/png'),
+            StreamingHttpResponse(iter([self.body]), content_type='text/event-stream'),
+        ]
+        for response in skipped:
+            content_encoding = response.get('Content-Encoding')
+            processed = self._process(response, 'gzip')
+            self.assertEqual(processed.get('Content-Encoding'), content_encoding)
+        # Fora de COMPRESSION_PATHS
+        self.assertFalse(self._process(self._json(), 'gzip', path='/admin/').has_header('Content-Encoding'))
+
+    def test_streaming_response_is_compressed_chunk_by_chunk(self):
+        response = StreamingHttpResponse(iter([self.body, self.body]), content_type='application/json')
+        response.headers['Content-Length'] = str(2 * len(self.body))
+        response = self._process(response, 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.body * 2)
+
+    def test_vary_and_etag(self):
+        response = self._process(self._json(ETag='"abc"'), 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        # Os bytes mudaram: a ETag forte vira fraca; as fracas continuam iguais
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertEqual(self._process(self._json(ETag='W/"abc"'), 'gzip')['ETag'], 'W/"abc"')
+        # Vary vale mesmo quando o cliente não aceita compressão (caches intermediários)
+        self.assertIn('Accept-Encoding', self._process(self._json(), '')['Vary'])
+
+
+@override_settings(COMPRESSION_ENABLED=True, COMPRESSION_MIN_SIZE=200)
+class CompressedConditionalRequestTests(TestCase):
+    """A ETag de uma resposta comprimida continua valendo para If-None-Match e If-Match"""
+
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(
+            name='Arroz', description='Arroz tipo 1 ' * 30, price=Decimal('5.00'), quantity=10,
+        )
+        self.path = f'/api/products/{self.product.pk}/'
+
+    def test_etag_from_compressed_response(self):
+        response = self.client.get(self.path, headers={'accept-encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        etag = response['ETag']
+
+        response = self.client.get(self.path, headers={'accept-encoding': 'gzip', 'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.patch(
+            self.path, {'quantity': 9}, content_type='application/json', headers={'if-match': etag},
+        )
+        self.assertEqual(response.status_code, 200)
+        # A mesma ETag de novo: outra pessoa (a requisição acima) já alterou o produto
+        response = self.client.patch(
+            self.path, {'quantity': 8}, content_type='application/json', headers={'if-match': etag},
+        )
+        self.assertEqual(response.status_code, 412)
+
+
+class AsyncNotificationListTests(TestCase):
+    """A versão assíncrona da lista de notificações vê o mesmo usuário da síncrona"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('ana', password='senha')
+        other = User.objects.create_user('bia', password='senha')
+        Notification.objects.create(title='general', message='m')
+        Notification.objects.create(title='mine', message='m', user=self.user)
+        Notification.objects.create(title='other', message='m', user=other)
+
+    def _titles(self, path):
+        return sorted(item['title'] for item in self.client.get(path).json())
+
+    def test_logged_in_user_sees_own_notifications(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self._titles('/api/notifications/'), ['general', 'mine'])
+        self.assertEqual(self._titles('/api/async/notifications/'), self._titles('/api/notifications/'))
+
+    def test_anonymous_sees_general_only(self):
+        self.assertEqual(self._titles('/api/async/notifications/'), ['general'])
+        self.assertEqual(self._titles('/api/notifications/'), ['general'])
+
+
+class AsyncProductListTests(TestCase):
+    """A lista assíncrona de produtos devolve o mesmo JSON da síncrona, com as mesmas consultas"""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Grãos')
+        for i in range(20):
+            Product.objects.create(name=f'Produto {i}', price=Decimal('1.00'), quantity=i, category=category)
+
+    def test_sparse_fields_match_sync_view(self):
+        for query in ('', '?fields=name', '?omit=description,category_name', '?category=1&fields=name,quantity'):
+            sync = self.client.get(f'/api/products/{query}')
+            response = self.client.get(f'/api/async/products/{query}')
+            self.assertEqual(response.json(), sync.json(), query)
+        self.assertEqual(set(response.json()[0]), {'id', 'name', 'quantity'})
+
+    def test_sparse_fields_do_not_load_deferred_columns(self):
+        # Sem a requisição no contexto, cada campo adiado virava uma consulta por produto
+        self.client.get('/api/async/products/?fields=name')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/async/products/?fields=name')
+        self.assertEqual(len(response.json()), 20)
+
+    def test_rendered_with_the_default_renderer(self):
+        response = self.client.get('/api/async/products/?fields=price')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.content, self.client.get('/api/products/?fields=price').content)
+
+
+class NotificationRecipientsTests(TestCase):
+
+    @override_settings(NOTIFICATION_PER_USER=True)
+    def test_per_user_without_staff_falls_back_to_general(self):
+        User.objects.create_user('ana', is_staff=False)
+        with self.assertLogs('core.tasks', level='WARNING'):
+            self.assertEqual(tasks._notification_recipients(), [None])
+
+    @override_settings(NOTIFICATION_PER_USER=True)
+    def test_per_user_with_staff(self):
+        staff = User.objects.create_user('ana', is_staff=True)
+        self.assertEqual(tasks._notification_recipients(), [staff])
+
+
+class NotificationBatchTests(TestCase):
+    """POST /api/notifications/batch/ e o contador de não lidas em cache"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('ana', password='senha')
+        self.product = Product.objects.create(name='Arroz', price=Decimal('5.00'), quantity=2)
+        self.low = Notification.objects.create(
+            title='low', message='m', notification_type='low_stock', product=self.product
+        )
+        self.expired = Notification.objects.create(title='expired', message='m', notification_type='expired')
+        self.mine = Notification.objects.create(title='mine', message='m', user=self.user)
+        self.other = Notification.objects.create(
+            title='other', message='m', user=User.objects.create_user('bia', password='senha')
+        )
+        self.client.force_login(self.user)
+
+    def _batch(self, body):
+        return self.client.post('/api/notifications/batch/', body, content_type='application/json')
+
+    def _unread(self):
+        return set(Notification.objects.filter(read=False).values_list('title', flat=True))
+
+    def test_mark_read_by_ids_only_touches_visible_rows(self):
+        response = self._batch({'ids': [self.low.pk, self.mine.pk, self.other.pk]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['affected'], 2)
+        self.assertEqual(self._unread(), {'expired', 'other'})
+
+        # Já lidas: nenhuma linha muda
+        self.assertEqual(self._batch({'ids': [self.low.pk]}).json()['affected'], 0)
+        self.assertEqual(self._batch({'action': 'mark_unread', 'ids': [self.low.pk]}).json()['affected'], 1)
+        self.assertIn('low', self._unread())
+
+    def test_delete_by_filter(self):
+        response = self._batch({'action': 'delete', 'filter': {'notification_type': 'low_stock'}})
+        self.assertEqual(response.json()['affected'], 1)
+        self.assertFalse(Notification.objects.filter(pk=self.low.pk).exists())
+
+        response = self._batch({'action': 'delete', 'filter': {'product': self.product.pk}})
+        self.assertEqual(response.json()['affected'], 0)
+
+    def test_ids_or_filter_is_required(self):
+        self.assertEqual(self._batch({'action': 'mark_read'}).status_code, 400)
+        self.assertEqual(self._batch({'ids': list(range(1, 1002))}).status_code, 400)
+
+    def test_unread_count_is_cached_until_a_change(self):
+        path = '/api/notifications/unread-count/'
+        self.assertEqual(self.client.get(path).json(), {'unread': 3})
+        with self.assertNumQueries(2):  # sessão + usuário; o COUNT vem do cache
+            self.assertEqual(self.client.get(path).json(), {'unread': 3})
+
+        # UPDATE em lote não dispara signals: a própria view invalida o contador
+        self._batch({'ids': [self.low.pk]})
+        self.assertEqual(self.client.get(path).json(), {'unread': 2})
+
+        # Nova notificação (signal post_save)
+        Notification.objects.create(title='new', message='m')
+        self.assertEqual(self.client.get(path).json(), {'unread': 3})
+
+        self.client.post('/api/notifications/read-all/')
+        self.assertEqual(self.client.get(path).json(), {'unread': 0})
+
+
+class DashboardStatsCacheTests(TestCase):
+    """As estatísticas do dashboard ficam em cache até a próxima alteração de produto"""
+
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(name='Arroz', price=Decimal('5.00'), quantity=20)
+
+    def _stats(self):
+        return quietly(self.client.get, '/api/dashboard/stats/').json()
+
+    def test_product_write_invalidates_cached_stats(self):
+        self.assertEqual(self._stats()['total_products'], 1)
+        key = dashboard_stats_key(expiry.local_today())
+        self.assertEqual(cache.get(key)['total_products'], 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._stats()['total_products'], 1)
+
+        Product.objects.create(name='Feijão', price=Decimal('8.00'), quantity=20)
+        # Nova versão: a chave muda e a entrada antiga deixa de ser usada
+        self.assertNotEqual(dashboard_stats_key(expiry.local_today()), key)
+        self.assertEqual(self._stats()['total_products'], 2)
+
+        self.product.delete()
+        self.assertEqual(self._stats()['total_products'], 1)
+
+
+class ConditionalGetTests(TestCase):
+    """ETag / Last-Modified / 304 nas leituras do catálogo (core.http_cache)"""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Grãos')
+        self.product = Product.objects.create(
+            name='Arroz', price=Decimal('5.00'), quantity=10, category=self.category
+        )
+
+    def _get(self, path, **headers):
+        return self.client.get(path, headers=headers)
+
+    def test_list_not_modified_until_a_product_changes(self):
+        response = self._get('/api/products/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertIn('public', response['Cache-Control'])
+
+        with self.assertNumQueries(1):  # só o COUNT/MAX: nada é serializado
+            response = self._get('/api/products/', if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        # Outra query string, outra ETag
+        self.assertNotEqual(self._get('/api/products/?search=Arroz')['ETag'], etag)
+
+        self.product.quantity = 9
+        self.product.save()
+        response = self._get('/api/products/', if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        # Apagar não muda o MAX(updated_at), mas muda o COUNT
+        Product.objects.create(name='Feijão', price=Decimal('8.00'), quantity=1).delete()
+        self.assertEqual(self._get('/api/products/', if_none_match=etag).status_code, 304)
+        self.product.delete()
+        self.assertEqual(self._get('/api/products/', if_none_match=etag).status_code, 200)
+
+    def test_detail_etag_and_last_modified(self):
+        path = f'/api/products/{self.product.pk}/'
+        response = self._get(path)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        self.assertEqual(self._get(path, if_none_match=etag).status_code, 304)
+        self.assertEqual(self._get(path, if_modified_since=last_modified).status_code, 304)
+
+        # O produto serializa o nome da categoria: renomear invalida a ETag
+        self.category.name = 'Cereais'
+        self.category.save()
+        response = self._get(path, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['category_name'], 'Cereais')
+
+    def test_logged_in_responses_are_private(self):
+        self.client.force_login(User.objects.create_user('ana', password='senha'))
+        cache_control = self._get(f'/api/products/{self.product.pk}/')['Cache-Control']
+        self.assertIn('private', cache_control)
+        self.assertIn('must-revalidate', cache_control)
+
+
+class LookupCacheTests(TestCase):
+    """Mapa id <-> nome de categorias/marcas em memória (core.lookup_cache)"""
+
+    def setUp(self):
+        cache.clear()
+        lookup_cache.categories.clear()
+        self.category = Category.objects.create(name='Grãos')
+
+    def _load(self):
+        # O teste roda dentro de uma transação: o mapa só é guardado no COMMIT
+        with self.captureOnCommitCallbacks(execute=True):
+            return lookup_cache.categories.name(self.category.pk)
+
+    def test_names_come_from_memory_after_first_load(self):
+        self.assertEqual(self._load(), 'Grãos')
+        with self.assertNumQueries(0):
+            self.assertEqual(lookup_cache.categories.name(self.category.pk), 'Grãos')
+            self.assertEqual(lookup_cache.categories.id_for('Grãos'), self.category.pk)
+            self.assertIsNone(lookup_cache.categories.name(None))
+
+    def test_save_in_this_process_clears_the_map(self):
+        self._load()
+        self.category.name = 'Cereais'
+        self.category.save()
+        self.assertEqual(lookup_cache.categories.name(self.category.pk), 'Cereais')
+        self.assertIsNone(lookup_cache.categories.id_for('Grãos'))
+
+    def test_other_process_write_is_seen_after_version_bump(self):
+        self._load()
+        # Outro processo: UPDATE sem sinal neste processo, só a versão no cache compartilhado muda
+        Category.objects.filter(pk=self.category.pk).update(name='Cereais')
+        bump_cache_version(CATEGORIES)
+        self.assertEqual(lookup_cache.categories.name(self.category.pk), 'Grãos')  # ainda dentro do intervalo
+        lookup_cache.categories._checked_at = 0  # CHECK_INTERVAL passou
+        self.assertEqual(lookup_cache.categories.name(self.category.pk), 'Cereais')
+
+    def test_row_missing_from_the_map_is_fetched(self):
+        self._load()
+        # bulk_create não dispara sinais
+        new = Category.objects.bulk_create([Category(name='Bebidas')])[0]
+        self.assertEqual(lookup_cache.categories.name(new.pk), 'Bebidas')
+        self.assertEqual(lookup_cache.categories.id_for('Bebidas'), new.pk)
+
+
+class ProductGroupListTests(TestCase):
+    """Listas de categorias/marcas com contagens, paginação opcional e cache"""
+
+    def setUp(self):
+        cache.clear()
+        today = expiry.local_today()
+        self.grains = Category.objects.create(name='Grãos')
+        self.drinks = Category.objects.create(name='Bebidas')
+        brand = Brand.objects.create(name='Marca')
+        for name, days, quantity in (('Arroz', -1, 5), ('Feijão', 3, 5), ('Milho', 20, 0), ('Trigo', 90, 5)):
+            Product.objects.create(
+                name=name, price=Decimal('1.00'), quantity=quantity, category=self.grains, brand=brand,
+                expiration_date=today + timedelta(days=days),
+            )
+
+    def _counts(self, path):
+        return {row['name']: row for row in self.client.get(path).json()}
+
+    def test_counts(self):
+        rows = self._counts('/api/categories/?include=expiry')
+        self.assertEqual(
+            {name: (row['products_count'], row['expired_count'], row['expiring_count']) for name, row in rows.items()},
+            # Milho vence em 20 dias mas está sem estoque: não entra em expiring_count
+            {'Grãos': (4, 1, 1), 'Bebidas': (0, 0, 0)},
+        )
+        rows = self._counts('/api/categories/')
+        self.assertNotIn('expired_count', rows['Grãos'])
+        self.assertEqual(self._counts('/api/brands/')['Marca']['products_count'], 4)
+
+    def test_pagination_is_opt_in(self):
+        self.assertIsInstance(self.client.get('/api/categories/').json(), list)
+        page = self.client.get('/api/categories/?page_size=1').json()
+        self.assertEqual(page['count'], 2)
+        self.assertEqual([row['name'] for row in page['results']], ['Bebidas'])
+        page = self.client.get('/api/categories/?page_size=1&page=2').json()
+        self.assertEqual([row['name'] for row in page['results']], ['Grãos'])
+
+    def test_cached_until_products_or_categories_change(self):
+        path = '/api/categories/'
+        self._counts(path)
+        with self.assertNumQueries(1):  # só o COUNT da ETag; a lista vem do cache
+            self.assertEqual(self._counts(path)['Grãos']['products_count'], 4)
+
+        Product.objects.create(name='Aveia', price=Decimal('1.00'), quantity=1, category=self.grains)
+        self.assertEqual(self._counts(path)['Grãos']['products_count'], 5)
+
+        self.drinks.name = 'Sucos'
+        self.drinks.save()
+        self.assertIn('Sucos', self._counts(path))
+
+
+class InventorySummaryTests(TestCase):
+    """A manutenção incremental do resumo chega ao mesmo resultado da reconstrução"""
+
+    def setUp(self):
+        self.today = expiry.local_today()
+        self.grains = Category.objects.create(name='Grãos')
+        self.drinks = Category.objects.create(name='Bebidas')
+        self.brand = Brand.objects.create(name='Marca')
+
+    def _table(self):
+        # Linhas zeradas ficam na tabela incremental; a reconstrução não as cria
+        return {
+            (row.dimension, row.key): tuple(getattr(row, metric) for metric in inventory_summary.METRICS)
+            for row in InventorySummary.objects.all()
+            if row.products_count
+        }
+
+    def _rebuilt(self):
+        return {
+            (row.dimension, row.key): tuple(getattr(row, metric) for metric in inventory_summary.METRICS)
+            for row in inventory_summary.compute_rows(self.today)
+        }
+
+    def test_incremental_matches_rebuild(self):
+        rice = Product.objects.create(
+            name='Arroz', price=Decimal('5.50'), quantity=10, category=self.grains, brand=self.brand,
+            expiration_date=self.today - timedelta(days=1),
+        )
+        beans = Product.objects.create(
+            name='Feijão', price=Decimal('8.00'), quantity=3, category=self.grains,
+            expiration_date=self.today + timedelta(days=10),
+        )
+        juice = Product.objects.create(name='Suco', price=Decimal('4.25'), quantity=7, brand=self.brand)
+        self.assertEqual(self._table(), self._rebuilt())
+        self.assertEqual(
+            self._table()[('category', self.grains.pk)],
+            (2, 13, Decimal('79.00'), 1, 10, Decimal('55.00')),
+        )
+
+        # Troca de categoria, preço, quantidade e validade; depois uma exclusão
+        rice.category = self.drinks
+        rice.price = Decimal('6.00')
+        rice.quantity = 4
+        rice.expiration_date = self.today + timedelta(days=2)
+        rice.save()
+        beans.quantity = 0
+        beans.save()
+        juice.delete()
+        self.assertEqual(self._table(), self._rebuilt())
+        self.assertEqual(self._table()[('brand', self.brand.pk)][:2], (1, 4))
+
+    def test_category_delete_rebuilds_after_commit(self):
+        Product.objects.create(name='Arroz', price=Decimal('1.00'), quantity=2, category=self.grains)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.grains.delete()
+        # O produto ficou sem categoria (UPDATE em massa, sem sinais): a reconstrução corrige
+        self.assertEqual(self._table(), self._rebuilt())
+        self.assertIn(('category', 0), self._table())
+
+
+class StockHistoryTests(TestCase):
+    """Fotos diárias do estoque agregadas por dia, semana e mês (core.stock_history)"""
+
+    def setUp(self):
+        # 29/06/2026 é uma segunda-feira: oito dias, duas semanas, dois meses
+        start = date(2026, 6, 29)
+        rows = []
+        for offset in range(8):
+            day = start + timedelta(days=offset)
+            for category, units in ((1, 10 * (offset + 1)), (2, 100)):
+                rows.append(StockSnapshot(
+                    date=day, category=category, products_count=1, units=units,
+                    stock_value=Decimal(units) / 2,
+                ))
+        StockSnapshot.objects.bulk_create(rows)
+        self.start, self.end = start, start + timedelta(days=7)
+
+    def _series(self, interval, category=None, metric='units'):
+        return [
+            (point['period'], point['days'], point[metric])
+            for point in stock_history.history(self.start, self.end, interval, category)
+        ]
+
+    def test_weekly_average_of_daily_totals(self):
+        self.assertEqual(self._series('week'), [
+            (date(2026, 6, 29), 7, 140),  # (280 + 700) / 7
+            (date(2026, 7, 6), 1, 180),
+        ])
+        self.assertEqual(self._series('week', category=1), [
+            (date(2026, 6, 29), 7, 40),
+            (date(2026, 7, 6), 1, 80),
+        ])
+
+    def test_monthly_average_and_money_format(self):
+        self.assertEqual(self._series('month'), [
+            (date(2026, 6, 1), 2, 115),   # (30 + 200) / 2
+            (date(2026, 7, 1), 6, 155),   # (330 + 600) / 6
+        ])
+        self.assertEqual(
+            [value for *_, value in self._series('month', metric='stock_value')],
+            ['57.50', '77.50'],
+        )
+
+    def test_daily_series_and_view(self):
+        self.assertEqual(len(self._series('day')), 8)
+        response = self.client.get('/api/dashboard/stock-history/', {
+            'start': '2026-06-29', 'end': '2026-07-06', 'interval': 'week', 'category': 2,
+        })
+        self.assertEqual([point['units'] for point in response.json()['points']], [100, 100])
+        response = self.client.get('/api/dashboard/stock-history/', {'start': '2026-07-06', 'end': '2026-06-29'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_record_snapshot_is_insert_only(self):
+        category = Category.objects.create(name='Grãos')
+        Product.objects.create(name='Arroz', price=Decimal('2.00'), quantity=5, category=category)
+        today = date(2026, 8, 1)
+        self.assertEqual(stock_history.record_snapshot(today), 1)
+        Product.objects.create(name='Feijão', price=Decimal('2.00'), quantity=5, category=category)
+        self.assertEqual(stock_history.record_snapshot(today), 0)
+        self.assertEqual(StockSnapshot.objects.get(date=today).units, 5)
+
+
+class ExpiryBucketTests(TestCase):
+    """Faixas de validade (core.expiry) e a virada diária da coluna expiry_bucket"""
+
+    def test_bucket_limits(self):
+        today = date(2026, 10, 19)
+        expected = {
+            None: expiry.NONE, -1: expiry.EXPIRED, 0: expiry.CRITICAL, 3: expiry.CRITICAL,
+            4: expiry.WARNING, 7: expiry.WARNING, 8: expiry.UPCOMING, 30: expiry.UPCOMING, 31: expiry.OK,
+        }
+        for days, bucket in expected.items():
+            expiration_date = None if days is None else today + timedelta(days=days)
+            self.assertEqual(expiry.bucket_for(expiration_date, today), bucket, days)
+
+    def test_rollover_moves_only_products_that_changed_bucket(self):
+        today = expiry.local_today()
+        for days in (None, 0, 3, 4, 8, 31, 60):
+            Product.objects.create(
+                name=f'Produto {days}', price=Decimal('1.00'), quantity=1,
+                expiration_date=None if days is None else today + timedelta(days=days),
+            )
+        self.assertEqual(expiry.rollover(today), 0)
+
+        # Um dia depois: 0 vence, 4 vira crítico, 8 vira aviso e 31 vira próximo
+        tomorrow = today + timedelta(days=1)
+        self.assertEqual(expiry.rollover(tomorrow), 4)
+        for product in Product.objects.all():
+            self.assertEqual(product.expiry_bucket, expiry.bucket_for(product.expiration_date, tomorrow), product.name)
+        self.assertEqual(expiry.rollover(tomorrow), 0)
+
+    def test_rollover_task_invalidates_dashboard_stats(self):
+        cache.clear()
+        Product.objects.create(
+            name='Leite', price=Decimal('1.00'), quantity=1, expiration_date=expiry.local_today() - timedelta(days=1),
+        )
+        # Gravado pelo save() com a faixa certa; força uma faixa desatualizada (como na virada do dia)
+        Product.objects.update(expiry_bucket=expiry.CRITICAL)
+        key = dashboard_stats_key(expiry.local_today())
+        quietly(tasks.rollover_expiry_buckets)
+        self.assertEqual(Product.objects.get().expiry_bucket, expiry.EXPIRED)
+        self.assertNotEqual(dashboard_stats_key(expiry.local_today()), key)
+        run = TaskRun.objects.get(task_name='rollover_expiry_buckets')
+        self.assertEqual(run.counters['products_changed'], 1)
+
+
+class LotAllocationTests(TestCase):
+    """Estoque por lote e baixa FEFO (core.inventory)"""
+
+    def setUp(self):
+        self.today = expiry.local_today()
+        self.milk = Product.objects.create(name='Leite', price=Decimal('5.00'), quantity=0)
+        for code, days, quantity in (('SEM', None, 5), ('LONGE', 30, 4), ('VENCIDO', -2, 3), ('PERTO', 2, 2)):
+            Lot.objects.create(
+                product=self.milk, code=code, quantity=quantity,
+                expiration_date=None if days is None else self.today + timedelta(days=days),
+            )
+
+    def _lots(self, product):
+        return dict(Lot.objects.filter(product=product).values_list('code', 'quantity'))
+
+    def _allocate(self, items, allow_expired=False):
+        return self.client.post('/api/inventory/allocate/', {
+            'items': [{'product': product.pk, 'quantity': quantity} for product, quantity in items],
+            'allow_expired': allow_expired,
+        }, content_type='application/json')
+
+    def test_product_totals_come_from_lots(self):
+        self.milk.refresh_from_db()
+        self.assertEqual(self.milk.quantity, 14)
+        # Validade do produto = lote com estoque que vence primeiro (mesmo vencido)
+        self.assertEqual(self.milk.expiration_date, self.today - timedelta(days=2))
+        self.assertEqual(self.milk.expiry_bucket, expiry.EXPIRED)
+
+    def test_fefo_skips_expired_and_leaves_undated_for_last(self):
+        response = self._allocate([(self.milk, 7)])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['code'], row['quantity']) for row in response.json()['allocations']],
+            [('PERTO', 2), ('LONGE', 4), ('SEM', 1)],
+        )
+        self.assertEqual(self._lots(self.milk), {'SEM': 4, 'LONGE': 0, 'VENCIDO': 3, 'PERTO': 0})
+        self.milk.refresh_from_db()
+        self.assertEqual(self.milk.quantity, 7)
+        self.assertEqual(
+            StockMovement.objects.filter(product=self.milk, reason='allocation').get().delta, -7,
+        )
+
+    def test_allow_expired_takes_expired_lots_first(self):
+        allocations = inventory.allocate({self.milk.pk: 4}, allow_expired=True)
+        self.assertEqual([(row['code'], row['quantity']) for row in allocations], [('VENCIDO', 3), ('PERTO', 1)])
+
+    def test_shortage_rolls_back_the_whole_request(self):
+        # Produto sem lotes: a baixa converte o estoque em um lote inicial (desfeito junto)
+        bread = Product.objects.create(name='Pão', price=Decimal('1.00'), quantity=3, batch='L1')
+        response = self._allocate([(self.milk, 2), (bread, 5)])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['shortages'], [{'product': bread.pk, 'missing': 2}])
+        self.assertEqual(self._lots(self.milk), {'SEM': 5, 'LONGE': 4, 'VENCIDO': 3, 'PERTO': 2})
+        self.assertFalse(Lot.objects.filter(product=bread).exists())
+
+        # Só os lotes vencidos não bastam
+        self.assertEqual(self._allocate([(self.milk, 12)]).json()['shortages'], [{'product': self.milk.pk, 'missing': 1}])
+
+    def test_open_lots_and_sync_products(self):
+        bread = Product.objects.create(
+            name='Pão', price=Decimal('1.00'), quantity=3, batch='L1', expiration_date=self.today + timedelta(days=5),
+        )
+        self.assertEqual(inventory.open_lots([bread.pk, self.milk.pk]), 1)
+        self.assertEqual(self._lots(bread), {'L1': 3})
+
+        # UPDATE em massa nos lotes (sem sinais): sync_products recalcula o produto
+        Lot.objects.filter(product=self.milk, code__in=['VENCIDO', 'PERTO']).update(quantity=0)
+        self.assertEqual(inventory.sync_products([self.milk.pk, bread.pk]), 1)
+        self.milk.refresh_from_db()
+        self.assertEqual((self.milk.quantity, self.milk.expiration_date), (9, self.today + timedelta(days=30)))
+
+        # Sem estoque em nenhum lote: quantidade 0, validade mantida
+        Lot.objects.filter(product=self.milk).update(quantity=0)
+        inventory.sync_products([self.milk.pk])
+        self.milk.refresh_from_db()
+        self.assertEqual((self.milk.quantity, self.milk.expiration_date), (0, self.today + timedelta(days=30)))
+
+        # Só há estoque no lote sem validade: o produto fica sem validade
+        Lot.objects.filter(product=self.milk, code='SEM').update(quantity=5)
+        inventory.sync_products([self.milk.pk])
+        self.milk.refresh_from_db()
+        self.assertEqual((self.milk.quantity, self.milk.expiration_date, self.milk.expiry_bucket), (5, None, expiry.NONE))
+
+
+class BarcodeLookupTests(TestCase):
+    """Busca por SKU com o cache local código -> produto (core.barcode_cache)"""
+
+    def setUp(self):
+        cache.clear()
+        barcodes.clear()
+        self.rice = Product.objects.create(name='Arroz', price=Decimal('5.00'), quantity=3, sku='7891000000011')
+        self.beans = Product.objects.create(name='Feijão', price=Decimal('8.00'), quantity=1, sku='7891000000028')
+
+    def _get(self, code):
+        return self.client.get('/api/products/lookup/', {'code': code})
+
+    def test_repeated_reads_only_fetch_the_row(self):
+        self.assertEqual(self._get(self.rice.sku).json()['name'], 'Arroz')
+        with self.assertNumQueries(1):  # a linha por ID; o código já está em cache
+            found = barcodes.lookup([self.rice.sku])
+        self.assertEqual(found[self.rice.sku].pk, self.rice.pk)
+
+        # Código inexistente também fica em cache
+        self.assertEqual(self._get('000').status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(barcodes.lookup(['000']), {})
+
+    def test_sku_change_is_seen_immediately(self):
+        self._get(self.rice.sku)
+        old_sku = self.rice.sku
+        self.rice.sku = '7891000000035'
+        self.rice.save()
+        self.assertEqual(self._get(old_sku).status_code, 404)
+        self.assertEqual(self._get('7891000000035').json()['name'], 'Arroz')
+
+    def test_stale_mapping_never_returns_the_wrong_product(self):
+        self._get(self.rice.sku)
+        self._get(self.beans.sku)
+        # Outro processo troca os SKUs (sem sinais neste processo nem nova versão ainda)
+        Product.objects.filter(pk=self.rice.pk).update(sku='tmp')
+        Product.objects.filter(pk=self.beans.pk).update(sku=self.rice.sku)
+        Product.objects.filter(pk=self.rice.pk).update(sku=self.beans.sku)
+        self.assertEqual(self._get(self.rice.sku).json()['name'], 'Feijão')
+        self.assertEqual(self._get(self.beans.sku).json()['name'], 'Arroz')
+
+    def test_batch_lookup_and_lru_limit(self):
+        response = self.client.post(
+            '/api/products/lookup/', {'codes': [self.rice.sku, '000', self.rice.sku]}, content_type='application/json',
+        )
+        self.assertEqual(list(response.json()['found']), [self.rice.sku])
+        self.assertEqual(response.json()['missing'], ['000'])
+
+        small = BarcodeCache(maxsize=1)
+        small.resolve([self.rice.sku, self.beans.sku])
+        with self.assertNumQueries(1):  # só o último código ficou
+            small.resolve([self.rice.sku, self.beans.sku])
+
+
+@override_settings(DEFAULT_REORDER_LEVEL=10)
+class ReorderLevelTests(TestCase):
+    """Nível de reposição (produto > categoria > padrão) e a coluna is_low_stock"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Grãos', reorder_level=5)
+        self.own = Product.objects.create(
+            name='Próprio', price=Decimal('1.00'), quantity=6, reorder_level=7, category=self.category,
+        )
+        self.from_category = Product.objects.create(
+            name='Categoria', price=Decimal('1.00'), quantity=6, category=self.category,
+        )
+        self.default = Product.objects.create(name='Padrão', price=Decimal('1.00'), quantity=6)
+
+    def _low(self):
+        return set(Product.objects.filter(is_low_stock=True).values_list('name', flat=True))
+
+    def test_precedence_in_python_and_sql(self):
+        levels = {product.name: reorder.level_for(product) for product in Product.objects.all()}
+        self.assertEqual(levels, {'Próprio': 7, 'Categoria': 5, 'Padrão': 10})
+        sql_levels = dict(Product.objects.annotate(level=reorder.level_expression()).values_list('name', 'level'))
+        self.assertEqual(sql_levels, levels)
+        self.assertEqual(self._low(), {'Próprio', 'Padrão'})
+
+    def test_save_and_adjust_recompute_the_flag(self):
+        self.from_category.quantity = 4
+        self.from_category.save()
+        self.assertIn('Categoria', self._low())
+
+        response = self.client.post(
+            f'/api/products/{self.default.pk}/adjust/', {'delta': 4}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Padrão', self._low())
+        # Exatamente no nível não é estoque baixo
+        self.assertEqual(Product.objects.get(pk=self.default.pk).quantity, 10)
+
+    def test_category_level_change_refreshes_its_products(self):
+        self.category.reorder_level = 8
+        self.category.save()
+        self.assertEqual(self._low(), {'Próprio', 'Categoria', 'Padrão'})
+
+        # Categoria sem nível: vale o padrão
+        self.category.reorder_level = None
+        self.category.save()
+        self.assertIn('Categoria', self._low())
+
+        # Categoria apagada: os produtos passam ao padrão (UPDATE em massa, sem save())
+        self.own.reorder_level = None
+        self.own.save()
+        self.category.reorder_level = 3
+        self.category.save()
+        self.assertNotIn('Próprio', self._low())
+        self.category.delete()
+        self.assertIn('Próprio', self._low())
+
+    def test_default_level_change_applies_on_refresh(self):
+        with override_settings(DEFAULT_REORDER_LEVEL=5):
+            self.assertEqual(reorder.refresh_low_stock(), 1)
+            self.assertEqual(self._low(), {'Próprio'})
+
+
+@override_settings(FORECAST_WINDOW_DAYS=28)
+class ForecastTests(TestCase):
+    """Consumo, ruptura e perda prevista calculados a partir de StockMovement (core.forecast)"""
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.today = timezone.localdate(self.now)
+        # Produto antigo, com dois lotes: consumo de 56 unidades na janela de 28 dias = 2/dia
+        self.milk = Product.objects.create(name='Leite', price=Decimal('4.50'), quantity=0)
+        for days, quantity in ((2, 10), (30, 20)):
+            Lot.objects.create(product=self.milk, quantity=quantity, expiration_date=self.today + timedelta(days=days))
+        # Produto de 7 dias, sem lotes nem validade: 14 unidades em 7 dias = 2/dia
+        self.rice = Product.objects.create(name='Arroz', price=Decimal('5.00'), quantity=10)
+
+        Product.objects.filter(pk=self.milk.pk).update(created_at=self.now - timedelta(days=90))
+        Product.objects.filter(pk=self.rice.pk).update(created_at=self.now - timedelta(days=7))
+        StockMovement.objects.bulk_create([
+            StockMovement(product=self.milk, delta=-56, quantity_after=30, created_at=self.now - timedelta(days=3)),
+            # Fora da janela: não conta
+            StockMovement(product=self.milk, delta=-500, quantity_after=86, created_at=self.now - timedelta(days=40)),
+            StockMovement(product=self.rice, delta=-14, quantity_after=10, created_at=self.now - timedelta(days=1)),
+        ])
+
+    def test_rates_stockout_and_waste(self):
+        self.assertEqual(forecast.compute([self.milk.pk, self.rice.pk], self.now), 2)
+        milk = ProductForecast.objects.get(product=self.milk)
+        # 1º lote: 3 dias vendáveis (o dia do vencimento conta) = 6 unidades; perde 4
+        self.assertEqual(milk.daily_rate, 2)
+        self.assertEqual(milk.expected_waste, 4)
+        self.assertEqual(milk.waste_value, Decimal('18.00'))
+        # (30 - 4) / 2 = 13 dias
+        self.assertEqual(milk.days_of_stock, 13)
+        self.assertEqual(milk.stockout_date, self.today + timedelta(days=13))
+
+        rice = ProductForecast.objects.get(product=self.rice)
+        self.assertEqual((rice.daily_rate, rice.expected_waste, rice.days_of_stock), (2, 0, 5))
+
+        self.assertEqual([f.product_id for f in forecast.at_risk(horizon_days=14)], [self.rice.pk, self.milk.pk])
+        self.assertEqual([f.product_id for f in forecast.at_risk(horizon_days=7, kind='waste')], [self.milk.pk])
+
+    def test_python_fallback_matches_numpy(self):
+        stock_lots = [[(10, 3), (20, 31)], [(10, float('inf'))], [], [(5, 0), (5, 1)]]
+        rates = [2, 2, 1, 0]
+        self.assertEqual(forecast._simulate_python(stock_lots, rates), [4, 0, 0, 10])
+        if forecast.NUMPY_AVAILABLE:
+            self.assertEqual(forecast._simulate_numpy(stock_lots, rates), [4, 0, 0, 10])
+
+    def test_refresh_only_recomputes_changed_products(self):
+        self.assertEqual(forecast.refresh(full=True), 2)
+        self.assertEqual(forecast.refresh(), 0)
+        inventory.adjust_quantity(self.rice.pk, -2)
+        self.assertEqual(forecast.refresh(), 1)
+        self.assertEqual(ProductForecast.objects.get(product=self.rice).daily_rate, round(16 / 7, 4))
+
+
+@override_settings(CHANGES_SETTLE_SECONDS=60, CHANGES_TOMBSTONE_DAYS=30)
+class ProductChangesFeedTests(TestCase):
+    """Feed de alterações para a sincronização incremental (core.changes)"""
+
+    def setUp(self):
+        self.products = [
+            Product.objects.create(name=f'Produto {i}', price=Decimal('1.00'), quantity=1) for i in range(5)
+        ]
+        # Mesmo updated_at em todas as linhas (ex.: uma atualização em massa), fora da janela de acomodação
+        self.moment = timezone.now() - timedelta(hours=1)
+        Product.objects.update(updated_at=self.moment)
+
+    def _feed(self, cursor=None, limit=None):
+        params = {}
+        if cursor is not None:
+            params['updated_since'] = cursor
+        if limit is not None:
+            params['limit'] = limit
+        return self.client.get('/api/products/changes/', params)
+
+    def test_keyset_paging_over_identical_timestamps(self):
+        pages, cursor = [], None
+        while True:
+            batch = self._feed(cursor, limit=2).json()
+            pages.append([product['id'] for product in batch['changed']])
+            cursor = batch['cursor']
+            if not batch['has_more']:
+                break
+        ids = [product.pk for product in self.products]
+        self.assertEqual(pages, [ids[0:2], ids[2:4], ids[4:5]])
+        # Nada de novo depois do último cursor
+        self.assertEqual(self._feed(cursor).json()['changed'], [])
+
+    def test_deleted_products_come_as_tombstones(self):
+        cursor = self._feed().json()['cursor']
+        deleted = self.products[0]
+        deleted_pk = deleted.pk
+        deleted.delete()
+        ProductTombstone.objects.update(deleted_at=timezone.now() - timedelta(minutes=5))
+
+        batch = self._feed(cursor).json()
+        self.assertEqual((batch['changed'], batch['deleted']), ([], [deleted_pk]))
+        # Na sincronização inicial o cliente não tem nada a remover
+        self.assertEqual(self._feed().json()['deleted'], [])
+
+    def test_recent_writes_wait_for_the_settle_window(self):
+        cursor = self._feed().json()['cursor']
+        product = self.products[1]
+        product.quantity = 2
+        product.save()
+        self.assertEqual(self._feed(cursor).json()['changed'], [])
+
+        Product.objects.filter(pk=product.pk).update(updated_at=timezone.now() - timedelta(seconds=61))
+        self.assertEqual([row['id'] for row in self._feed(cursor).json()['changed']], [product.pk])
+
+    def test_cursor_older_than_tombstone_retention_is_gone(self):
+        stale = changes.encode_cursor(self.moment, 0, timezone.now() - timedelta(days=31))
+        response = self._feed(stale)
+        self.assertEqual(response.status_code, 410)
+        self.assertTrue(response.json()['full_resync'])
+
+    def test_invalid_cursor_is_rejected(self):
+        for cursor in ('abc', '1.2', '1.2.x'):
+            response = self._feed(cursor)
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertEqual(response.json(), {'updated_since': ['Cursor inválido.']})
+
+
+class OptimisticConcurrencyTests(TestCase):
+    """Escritas condicionais com If-Match e a coluna version (core.http_cache)"""
+
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(name='Arroz', price=Decimal('5.00'), quantity=10)
+        self.path = f'/api/products/{self.product.pk}/'
+
+    def _patch(self, data, if_match=None):
+        headers = {'if-match': if_match} if if_match is not None else {}
+        return self.client.patch(self.path, data, content_type='application/json', headers=headers)
+
+    def _adjust(self, delta, if_match=None):
+        headers = {'if-match': if_match} if if_match is not None else {}
+        return self.client.post(
+            f'{self.path}adjust/', {'delta': delta}, content_type='application/json', headers=headers,
+        )
+
+    def _version(self):
+        return Product.objects.get(pk=self.product.pk).version
+
+    def test_version_increments_on_save_and_adjust(self):
+        self.assertEqual(self.product.version, 1)
+        self.product.quantity = 9
+        self.product.save()
+        self.assertEqual(self._version(), 2)
+
+        response = self._adjust(-2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['quantity'], response.json()['version']), (7, 3))
+        # A ETag devolvida é a mesma do GET e encadeia o próximo ajuste
+        self.assertEqual(response['ETag'], self.client.get(self.path)['ETag'])
+        self.assertEqual(self._adjust(1, response['ETag']).status_code, 200)
+        self.assertEqual(self._version(), 4)
+
+    def test_if_match_match_and_mismatch(self):
+        etag = self.client.get(self.path)['ETag']
+        response = self._patch({'quantity': 9}, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self._version(), 2)
+
+        # ETag antiga: outra pessoa alterou antes
+        response = self._patch({'quantity': 1}, etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).quantity, 9)
+        self.assertEqual(self._adjust(-1, etag).status_code, 412)
+        self.assertEqual(self.client.delete(self.path, headers={'if-match': etag}).status_code, 412)
+
+        # A versão do JSON também serve, e '*' aceita qualquer uma
+        self.assertEqual(self._patch({'quantity': 8}, '"2"').status_code, 200)
+        self.assertEqual(self._patch({'quantity': 7}, '*').status_code, 200)
+        self.assertEqual(self._patch({'quantity': 6}, '"bogus"').status_code, 412)
+
+    @override_settings(API_REQUIRE_IF_MATCH=True)
+    def test_missing_precondition_is_required(self):
+        self.assertEqual(self._patch({'quantity': 9}).status_code, 428)
+        self.assertEqual(self._adjust(-1).status_code, 428)
+        self.assertEqual(self.client.delete(self.path).status_code, 428)
+        self.assertEqual(self._version(), 1)
+        self.assertEqual(self._patch({'quantity': 9}, '"1"').status_code, 200)
+
+    def test_conditional_update_that_loses_the_race(self):
+        # A view leu a versão 1 e o If-Match confere...
+        stale = Product.objects.get(pk=self.product.pk)
+        request = RequestFactory().patch(self.path, headers={'if-match': '"1"'})
+        view = ProductDetailView(request=request, kwargs={'pk': self.product.pk})
+        # ...mas outra requisição grava antes do UPDATE condicional
+        Product.objects.filter(pk=self.product.pk).update(quantity=3, version=2)
+
+        with self.assertRaises(PreconditionFailed):
+            with view._claim_version(stale):
+                stale.quantity = 99
+                stale.save()
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertEqual((product.quantity, product.version), (3, 2))
+
+
+class ProductImportTests(TransactionTestCase):
+    """Prévia (dry run) e depois a importação de verdade, como no admin"""
+
+    def setUp(self):
+        lookup_cache.categories.clear()
+        lookup_cache.brands.clear()
+
+    def _dataset(self):
+        dataset = Dataset(headers=['id', 'name', 'Categoria', 'Marca', 'price', 'quantity'])
+        dataset.append(['', 'Leite', 'Laticínios', 'Marca Nova', '5.00', '10'])
+        # Segunda linha com a mesma categoria: recarrega o mapa dentro da transação
+        dataset.append(['', 'Queijo', 'Laticínios', 'Marca Nova', '20.00', '3'])
+        return dataset
+
+    def test_dry_run_then_import_with_new_category(self):
+        preview = ProductResource().import_data(self._dataset(), dry_run=True, use_transactions=True)
+        self.assertFalse(preview.has_errors())
+        self.assertFalse(Category.objects.exists())
+
+        result = ProductResource().import_data(self._dataset(), dry_run=False, use_transactions=True)
+        self.assertFalse(result.has_errors())
+        category = Category.objects.get(name='Laticínios')
+        self.assertEqual(
+            sorted(Product.objects.values_list('name', 'category_id')),
+            [('Leite', category.pk), ('Queijo', category.pk)],
+        )
+        self.assertEqual(lookup_cache.categories.id_for('Laticínios'), category.pk)
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Roteamento para a réplica (core.db_router) com um segundo banco SQLite no
+    papel da réplica: a mesma linha tem nomes diferentes nos dois bancos, então
+    o nome lido mostra de qual banco veio.
+    """
+    databases = {'default', db_router.REPLICA}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # A réplica não recebe migrations (ReplicaRouter.allow_migrate): cria só as tabelas usadas
+        with connections[db_router.REPLICA].schema_editor() as editor:
+            for model in (Category, Brand, Product):
+                editor.create_model(model)
+
+    @classmethod
+    def tearDownClass(cls):
+        with connections[db_router.REPLICA].schema_editor() as editor:
+            for model in (Product, Brand, Category):
+                editor.delete_model(model)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(name='Primário', price=Decimal('1.00'), quantity=5)
+        # Réplica atrasada: a mesma linha, ainda com o nome antigo
+        Product.objects.using(db_router.REPLICA).bulk_create([
+            Product(pk=self.product.pk, name='Réplica', price=Decimal('1.00'), quantity=5),
+        ])
+
+    def tearDown(self):
+        with connections[db_router.REPLICA].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {Product._meta.db_table}')
+
+    def _name(self):
+        return Product.objects.get(pk=self.product.pk).name
+
+    def _api_name(self):
+        return self.client.get(f'/api/products/{self.product.pk}/').json()['name']
+
+    def test_get_reads_from_replica(self):
+        self.assertEqual(self._api_name(), 'Réplica')
+        # Fora da requisição tudo volta para o primário
+        self.assertEqual(self._name(), 'Primário')
+
+    def test_write_pins_reads_to_primary(self):
+        with db_router.use_replica():
+            self.assertEqual(self._name(), 'Réplica')
+            Product.objects.filter(pk=self.product.pk).update(quantity=4)
+            self.assertEqual(self._name(), 'Primário')
+
+        response = self.client.patch(
+            f'/api/products/{self.product.pk}/', {'description': 'x'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        cookie = response.cookies['db_pin']
+        self.assertEqual(cookie['samesite'], 'None')
+        self.assertTrue(cookie['secure'])
+
+    def test_open_transaction_stays_on_primary(self):
+        with db_router.use_replica(), transaction.atomic():
+            self.assertEqual(self._name(), 'Primário')
+
+    def test_pin_cookie_keeps_reads_on_primary(self):
+        self.client.cookies['db_pin'] = '1'
+        self.assertEqual(self._api_name(), 'Primário')
+
+    @override_settings(CHANGES_SETTLE_SECONDS=0)
+    def test_changes_feed_reads_from_primary(self):
+        response = self.client.get('/api/products/changes/')
+        self.assertEqual([product['name'] for product in response.json()['changed']], ['Primário'])
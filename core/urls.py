@@ -4,17 +4,30 @@ from django.urls import path
 from .views import (
     ProductListCreateView, 
     ProductDetailView,
+    product_lookup,
+    product_changes,
+    adjust_product_quantity,
     ExpiringProductsView, 
     ExpiredProductsView,
+    AtRiskProductsView,
+    LotListCreateView,
+    LotDetailView,
+    allocate_stock,
     CategoryListCreateView,
+    BrandListCreateView,
     dashboard_stats,
+    inventory_summary,
+    stock_history_view,
     NotificationListCreateView,
     NotificationDetailView,
     mark_notification_read,
     mark_all_notifications_read,
+    batch_update_notifications,
+    unread_notifications_count,
     PushSubscriptionListCreateView,
     unregister_push_subscription,
 )
+from . import async_views
 
 # Importa views de Schedule se disponível
 try:
@@ -31,24 +44,45 @@ urlpatterns = [
     # Produtos
     path('products/', ProductListCreateView.as_view(), name='product-list-create'),
     path('products/<int:pk>/', ProductDetailView.as_view(), name='product-detail'),
+    path('products/<int:pk>/adjust/', adjust_product_quantity, name='product-adjust'),
+    path('products/lookup/', product_lookup, name='product-lookup'),
+    path('products/changes/', product_changes, name='product-changes'),
     path('products/expiring-soon/', ExpiringProductsView.as_view(), name='expiring-products-list'),
     path('products/expired/', ExpiredProductsView.as_view(), name='expired-products-list'),
+    path('products/at-risk/', AtRiskProductsView.as_view(), name='at-risk-products-list'),
+
+    # Lotes e baixa de estoque (FEFO)
+    path('products/<int:pk>/lots/', LotListCreateView.as_view(), name='product-lot-list-create'),
+    path('lots/<int:pk>/', LotDetailView.as_view(), name='lot-detail'),
+    path('inventory/allocate/', allocate_stock, name='inventory-allocate'),
     
     # Categorias
     path('categories/', CategoryListCreateView.as_view(), name='category-list-create'),
+
+    # Marcas
+    path('brands/', BrandListCreateView.as_view(), name='brand-list-create'),
     
     # Dashboard
     path('dashboard/stats/', dashboard_stats, name='dashboard-stats'),
+    path('dashboard/inventory-summary/', inventory_summary, name='dashboard-inventory-summary'),
+    path('dashboard/stock-history/', stock_history_view, name='dashboard-stock-history'),
     
     # Notificações
     path('notifications/', NotificationListCreateView.as_view(), name='notification-list-create'),
     path('notifications/<int:pk>/', NotificationDetailView.as_view(), name='notification-detail'),
     path('notifications/<int:notification_id>/read/', mark_notification_read, name='mark-notification-read'),
     path('notifications/read-all/', mark_all_notifications_read, name='mark-all-notifications-read'),
+    path('notifications/batch/', batch_update_notifications, name='notification-batch'),
+    path('notifications/unread-count/', unread_notifications_count, name='notification-unread-count'),
     
     # Push Subscriptions
     path('push-subscriptions/', PushSubscriptionListCreateView.as_view(), name='push-subscription-list-create'),
     path('push-subscriptions/unregister/', unregister_push_subscription, name='unregister-push-subscription'),
+
+    # Versões assíncronas (ASGI) das leituras pesadas
+    path('async/dashboard/stats/', async_views.dashboard_stats, name='async-dashboard-stats'),
+    path('async/products/', async_views.product_list, name='async-product-list'),
+    path('async/notifications/', async_views.notification_list, name='async-notification-list'),
 ]
 
 # Adiciona rotas de Schedule se disponível
@@ -6,8 +6,27 @@ from rest_framework.response import Response
 from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import timedelta, date
-from .models import Product, Category, Notification, PushSubscription
-from .serializers import ProductSerializer, CategorySerializer, NotificationSerializer, PushSubscriptionSerializer
+from .models import Product, Category, Brand, Lot, Notification, PushSubscription, InventorySummary
+from .serializers import ProductSerializer, CategorySerializer, BrandSerializer, LotSerializer, AllocationSerializer, QuantityAdjustmentSerializer, BarcodeLookupSerializer, ProductChangesQuerySerializer, NotificationSerializer, PushSubscriptionSerializer, NotificationBatchSerializer, InventorySummarySerializer, StockHistoryQuerySerializer, ProductForecastSerializer, AtRiskQuerySerializer
+from .cache_utils import (
+    BRANDS,
+    CATALOG_GROUPS_TIMEOUT,
+    CATEGORIES,
+    DASHBOARD_STATS_TIMEOUT,
+    PRODUCTS,
+    dashboard_stats_key,
+    get_cache_version,
+    get_unread_notification_count,
+    invalidate_notifications,
+    versioned_key,
+)
+from .barcode_cache import barcodes
+from .http_cache import ConditionalGetMixin, PreconditionFailed, PreconditionRequired, if_match_versions
+from .fieldsets import SparseFieldsetMixin, only_requested
+from .pagination import OptInPageNumberPagination
+from . import changes, expiry, forecast, inventory, stock_history
+from django.conf import settings
+from django.core.cache import cache
 # django_q2 é importado como django_q
 # from django_q.tasks import async_task  # Não usado por enquanto
 
@@ -16,53 +35,292 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
 
 # View para listar e criar produtos
-class ProductListCreateView(generics.ListCreateAPIView):
+class ProductListCreateView(SparseFieldsetMixin, ConditionalGetMixin, generics.ListCreateAPIView):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['category', 'batch']
+    filterset_fields = ['category', 'batch', 'sku', 'is_low_stock']
     search_fields = ['name', 'description', 'batch']
     ordering_fields = ['name', 'price', 'expiration_date']
+    # O nome da categoria vai na resposta: renomear uma categoria também muda a ETag
+    cache_groups = (CATEGORIES,)
 
 # View para detalhes, atualizar e deletar produtos
-class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ProductDetailView(SparseFieldsetMixin, ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    cache_groups = (CATEGORIES,)
+    # PUT/PATCH/DELETE com If-Match: 412 se outra pessoa alterou o produto antes
+    version_field = 'version'
+
+@api_view(['POST'])
+def adjust_product_quantity(request, pk):
+    """
+    Soma (ou subtrai) unidades ao estoque de um produto sem lotes: {"delta": -3}
+
+    Um único UPDATE condicional (core.inventory.adjust_quantity): ajustes
+    simultâneos não se perdem e não há trava. If-Match opcional (ETag ou
+    versão): 412 se o produto mudou. 409 se faltar estoque ou o produto for
+    controlado por lotes.
+    """
+    serializer = QuantityAdjustmentSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    versions = if_match_versions(request)
+    if versions is None and getattr(settings, 'API_REQUIRE_IF_MATCH', False):
+        raise PreconditionRequired()
+
+    try:
+        product = inventory.adjust_quantity(pk, serializer.validated_data['delta'], versions)
+    except Product.DoesNotExist:
+        return Response({'error': 'Produto não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+    except inventory.StaleVersion:
+        raise PreconditionFailed()
+    except inventory.LotControlled:
+        return Response(
+            {'error': 'Este produto é controlado por lotes: altere o estoque pelos lotes.'},
+            status=status.HTTP_409_CONFLICT,
+        )
+    except inventory.InsufficientStock as exc:
+        return Response({
+            'error': 'Estoque insuficiente',
+            'shortages': [{'product': product, 'missing': missing} for product, missing in exc.shortages.items()],
+        }, status=status.HTTP_409_CONFLICT)
+
+    response = Response(ProductSerializer(product).data)
+    # Mesma ETag do GET do detalhe, para encadear o próximo If-Match
+    response['ETag'] = ProductDetailView(request=request, kwargs={'pk': pk}).detail_etag(product)
+    return response
+
+@api_view(['GET', 'POST'])
+def product_lookup(request):
+    """
+    Busca por SKU / código de barras, para os leitores do caixa e do recebimento
+    (cache local código -> produto, ver core.barcode_cache)
+
+    GET ?code=<código>: um produto (404 se não existir); aceita ?fields= / ?omit=
+    POST {"codes": [...]}: até 500 códigos; retorna found {código: produto} e missing
+    """
+    if request.method == 'GET':
+        code = request.query_params.get('code', '').strip()
+        if not code:
+            return Response({'error': "Informe o parâmetro 'code'"}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = only_requested(Product.objects.all(), request, ProductSerializer, extra=('sku',))
+        product = barcodes.lookup([code], queryset).get(code)
+        if product is None:
+            return Response({'error': 'Produto não encontrado', 'code': code}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ProductSerializer(product, context={'request': request}).data)
+
+    serializer = BarcodeLookupSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    codes = serializer.validated_data['codes']
+    found = barcodes.lookup(codes)
+    data = ProductSerializer(list(found.values()), many=True).data
+    return Response({
+        'found': dict(zip(found, data)),
+        'missing': [code for code in dict.fromkeys(codes) if code not in found],
+    })
+
+@api_view(['GET'])
+def product_changes(request):
+    """
+    Feed de alterações para a sincronização incremental do PWA (core.changes)
+
+    ?updated_since=<cursor> (omitido = sincronização inicial) e ?limit= (padrão 500).
+    Retorna changed (produtos), deleted (IDs), cursor e has_more; 410 se o
+    cursor for antigo demais e o cliente precisar baixar tudo de novo.
+    Aceita ?fields= / ?omit= (core.fieldsets).
+    """
+    serializer = ProductChangesQuerySerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    params = serializer.validated_data
+    try:
+        queryset = only_requested(Product.objects.all(), request, ProductSerializer, extra=('updated_at',))
+        batch = changes.changes(params.get('updated_since'), params['limit'], queryset)
+    except changes.ExpiredCursor:
+        return Response(
+            {'error': 'Cursor expirado: sincronize a lista completa novamente', 'full_resync': True},
+            status=status.HTTP_410_GONE,
+        )
+    batch['changed'] = ProductSerializer(batch['changed'], many=True, context={'request': request}).data
+    return Response(batch)
 
 # View para listar produtos próximos do vencimento
-class ExpiringProductsView(generics.ListAPIView):
+class ExpiringProductsView(SparseFieldsetMixin, generics.ListAPIView):
     serializer_class = ProductSerializer
 
     def get_queryset(self):
         """
-        Retorna produtos que irão expirar nos próximos 30 dias
+        Retorna produtos com estoque que irá expirar nos próximos 30 dias,
+        avaliando lote a lote (lot_quantity = unidades que vencem no período)
         """
-        today = timezone.now().date()
-        expiration_limit = today + timedelta(days=30)
-
-        return Product.objects.filter(
-            expiration_date__gte=today,
-            expiration_date__lte=expiration_limit,
-            quantity__gt=0
-        ).order_by('expiration_date')
+        return inventory.products_in_buckets(expiry.EXPIRING_BUCKETS).order_by('lot_expiration', 'id')
 
 # View para listar produtos vencidos
-class ExpiredProductsView(generics.ListAPIView):
+class ExpiredProductsView(SparseFieldsetMixin, generics.ListAPIView):
     serializer_class = ProductSerializer
 
     def get_queryset(self):
         """
-        Retorna produtos já vencidos
+        Retorna produtos já vencidos (com algum lote vencido em estoque)
         """
-        today = timezone.now().date()
-        return Product.objects.filter(
-            expiration_date__lt=today
-        ).order_by('expiration_date')
+        return inventory.products_in_buckets([expiry.EXPIRED], in_stock=False).order_by('lot_expiration', 'id')
+
+
+# View para listar produtos em risco de ruptura ou de perda por vencimento
+class AtRiskProductsView(generics.ListAPIView):
+    serializer_class = ProductForecastSerializer
+    pagination_class = OptInPageNumberPagination
+
+    def get_queryset(self):
+        """
+        Retorna as previsões (core.forecast) com ruptura em até ?days= dias
+        (padrão FORECAST_HORIZON_DAYS) e/ou perda prevista por vencimento;
+        ?type=stockout|waste filtra só um dos riscos
+        """
+        serializer = AtRiskQuerySerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        return forecast.at_risk(params.get('days'), params['type'])
+
+
+# Lotes de um produto
+class LotListCreateView(generics.ListCreateAPIView):
+    serializer_class = LotSerializer
+
+    def get_queryset(self):
+        return Lot.objects.filter(product_id=self.kwargs['pk']).order_by('expiration_date', 'id')
+
+    def perform_create(self, serializer):
+        # O estoque anterior do produto vira um lote inicial (core.signals)
+        product = generics.get_object_or_404(Product, pk=self.kwargs['pk'])
+        serializer.save(product=product)
+
+
+class LotDetailView(generics.RetrieveUpdateDestroyAPIView):
+    queryset = Lot.objects.all()
+    serializer_class = LotSerializer
+
+
+@api_view(['POST'])
+def allocate_stock(request):
+    """
+    Baixa estoque em ordem FEFO (lote que vence primeiro sai primeiro), tudo
+    em uma transação. Corpo: items [{product, quantity}] e allow_expired (padrão false)
+    """
+    serializer = AllocationSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+
+    try:
+        allocations = inventory.allocate(data['items'], allow_expired=data['allow_expired'])
+    except inventory.InsufficientStock as exc:
+        return Response({
+            'error': 'Estoque insuficiente',
+            'shortages': [{'product': product, 'missing': missing} for product, missing in exc.shortages.items()],
+        }, status=status.HTTP_409_CONFLICT)
+    return Response({'success': True, 'allocations': allocations})
+
+
+class ProductGroupListMixin(ConditionalGetMixin):
+    """
+    Listagem de categorias/marcas com a contagem de produtos de cada uma.
+
+    - products_count sempre; com ?include=expiry também expired_count e
+      expiring_count (0-30 dias, com estoque), tudo em uma única consulta agrupada
+    - paginada quando o cliente pede (?page= / ?page_size=)
+    - resposta em cache até a próxima alteração de produto ou do próprio grupo
+    """
+    pagination_class = OptInPageNumberPagination
+    # Category/Brand não têm updated_at: as versões no cache mudam a cada alteração (core.signals)
+    last_modified_field = None
+
+    def etag_parts(self):
+        # As contagens de vencidos/a vencer mudam à meia-noite
+        return [*super().etag_parts(), expiry.local_today()]
+
+    def list_response(self, queryset):
+        today = expiry.local_today()
+        key = versioned_key(
+            PRODUCTS,
+            'groups',
+            *[get_cache_version(group) for group in self.cache_groups if group != PRODUCTS],
+            today.isoformat(),
+            self.request.build_absolute_uri(),
+        )
+        data = cache.get(key)
+        if data is None:
+            include = self.request.query_params.get('include', '').split(',')
+            queryset = _with_product_counts(queryset, include_expiry='expiry' in include)
+            data = super().list_response(queryset).data
+            cache.set(key, data, CATALOG_GROUPS_TIMEOUT)
+        return Response(data)
+
+
+def _with_product_counts(queryset, include_expiry=False):
+    """Anota as contagens de produtos (GROUP BY) em um queryset de Category/Brand"""
+    annotations = {'products_count': Count('products')}
+    if include_expiry:
+        annotations['expired_count'] = Count('products', filter=Q(products__expiry_bucket=expiry.EXPIRED))
+        annotations['expiring_count'] = Count('products', filter=Q(
+            products__expiry_bucket__in=expiry.EXPIRING_BUCKETS,
+            products__quantity__gt=0,
+        ))
+    # Consultas agrupadas ignoram o Meta.ordering: ordena explicitamente (paginação estável)
+    return queryset.annotate(**annotations).order_by('name')
+
 
 # View para categorias
-class CategoryListCreateView(generics.ListCreateAPIView):
+class CategoryListCreateView(ProductGroupListMixin, generics.ListCreateAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    cache_groups = (CATEGORIES, PRODUCTS)
+
+
+# View para marcas
+class BrandListCreateView(ProductGroupListMixin, generics.ListCreateAPIView):
+    queryset = Brand.objects.all()
+    serializer_class = BrandSerializer
+    cache_groups = (BRANDS, PRODUCTS)
+
+def _dashboard_querysets(today):
+    """
+    Querysets usados nas estatísticas do dashboard (compartilhados pela view
+    síncrona e pela assíncrona em core.async_views). As faixas de validade já
+    estão calculadas para `today` (core.expiry), então basta filtrar a coluna.
+    """
+    return {
+        'total_products': Product.objects.all(),
+        'expired_products': Product.objects.filter(expiry_bucket=expiry.EXPIRED),
+        # Críticos: 0-3 dias
+        'critical_products': Product.objects.filter(expiry_bucket=expiry.CRITICAL),
+        # Aviso: 4-7 dias
+        'expiring_soon': Product.objects.filter(expiry_bucket=expiry.WARNING),
+        # Abaixo do nível de reposição de cada produto (core.reorder)
+        'low_stock': Product.objects.filter(is_low_stock=True),
+    }
+
+
+def _dashboard_units(today):
+    """Unidades vencidas / a vencer somadas lote a lote (core.inventory.bucket_units)"""
+    units = inventory.bucket_units(today)
+    return {
+        'expired_units': units[expiry.EXPIRED],
+        'critical_units': units[expiry.CRITICAL],
+        'expiring_soon_units': units[expiry.WARNING],
+    }
+
+
+def _dashboard_response_data(counts, today):
+    """Monta a resposta do dashboard a partir das contagens"""
+    # Log para debug
+    print(f"📊 Estatísticas calculadas - Data: {today}")
+    print(f"Total: {counts['total_products']}, Vencidos: {counts['expired_products']}, Críticos: {counts['critical_products']}, Aviso: {counts['expiring_soon']}")
+
+    return {
+        **counts,
+        'good_products': counts['total_products'] - counts['expired_products'] - counts['critical_products'] - counts['expiring_soon']
+    }
+
 
 # Endpoint para estatísticas do dashboard
 @api_view(['GET'])
@@ -75,45 +333,93 @@ def dashboard_stats(request):
     - Aviso: 4-7 dias
     - Bom: > 7 dias
     """
-    today = date.today()
-    
-    total_products = Product.objects.count()
-    expired_products = Product.objects.filter(expiration_date__lt=today).count()
-    
-    # Críticos: 0-3 dias
-    critical_products = Product.objects.filter(
-        expiration_date__gte=today,
-        expiration_date__lte=today + timedelta(days=3)
-    ).count()
-    
-    # Aviso: 4-7 dias
-    expiring_soon = Product.objects.filter(
-        expiration_date__gte=today + timedelta(days=4),
-        expiration_date__lte=today + timedelta(days=7)
-    ).count()
-    
-    low_stock = Product.objects.filter(quantity__lt=10).count()
-    
-    # Log para debug
-    print(f"📊 Estatísticas calculadas - Data: {today}")
-    print(f"Total: {total_products}, Vencidos: {expired_products}, Críticos: {critical_products}, Aviso: {expiring_soon}")
-    
+    today = expiry.local_today()
+    # Em cache até a próxima alteração de produto (ver core.signals)
+    key = dashboard_stats_key(today)
+    counts = cache.get(key)
+    if counts is None:
+        counts = {name: queryset.count() for name, queryset in _dashboard_querysets(today).items()}
+        counts.update(_dashboard_units(today))
+        cache.set(key, counts, DASHBOARD_STATS_TIMEOUT)
+    return Response(_dashboard_response_data(counts, today))
+
+
+@api_view(['GET'])
+def inventory_summary(request):
+    """
+    Totais de estoque por categoria e por marca (unidades, valor em estoque e
+    valor vencido), lidos da tabela materializada InventorySummary
+    """
+    rows = list(InventorySummary.objects.filter(products_count__gt=0))
+    by_category = [row for row in rows if row.dimension == 'category']
+    by_brand = [row for row in rows if row.dimension == 'brand']
+
+    totals = {
+        'products_count': sum(row.products_count for row in by_category),
+        'units': sum(row.units for row in by_category),
+        'stock_value': f"{sum(row.stock_value for row in by_category):.2f}",
+        'expired_count': sum(row.expired_count for row in by_category),
+        'expired_units': sum(row.expired_units for row in by_category),
+        'expired_value': f"{sum(row.expired_value for row in by_category):.2f}",
+    }
+    return Response({
+        'totals': totals,
+        'categories': InventorySummarySerializer(by_category, many=True).data,
+        'brands': InventorySummarySerializer(by_brand, many=True).data,
+        'updated_at': max((row.updated_at for row in rows), default=None),
+    })
+
+
+@api_view(['GET'])
+def stock_history_view(request):
+    """
+    Evolução do estoque ao longo do tempo (fotos diárias de StockSnapshot)
+
+    Parâmetros: start, end (padrão: últimos 90 dias), interval (day, week, month)
+    e category (ID; 0 = sem categoria; omitido = todas as categorias somadas)
+    """
+    serializer = StockHistoryQuerySerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    params = serializer.validated_data
+
+    end = params.get('end') or expiry.local_today()
+    start = params.get('start') or end - timedelta(days=90)
     return Response({
-        'total_products': total_products,
-        'expired_products': expired_products,
-        'critical_products': critical_products,
-        'expiring_soon': expiring_soon,
-        'low_stock': low_stock,
-        'good_products': total_products - expired_products - critical_products - expiring_soon
+        'start': start,
+        'end': end,
+        'interval': params['interval'],
+        'category': params.get('category'),
+        'points': stock_history.history(start, end, params['interval'], params.get('category')),
     })
 
 
+def _visible_notifications(request):
+    """
+    Notificações visíveis para quem fez a requisição: as do próprio usuário
+    e as gerais (sem usuário). Anônimos veem apenas as gerais.
+    """
+    queryset = Notification.objects.all()
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return queryset.filter(Q(user=user) | Q(user__isnull=True))
+    return queryset.filter(user__isnull=True)
+
+
+def _visible_push_subscriptions(request):
+    """Subscriptions do próprio usuário (ou as anônimas, para quem não está logado)"""
+    queryset = PushSubscription.objects.filter(active=True)
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return queryset.filter(user=user)
+    return queryset.filter(user__isnull=True)
+
+
 # Views para Notificações
 class NotificationListCreateView(generics.ListCreateAPIView):
     serializer_class = NotificationSerializer
     
     def get_queryset(self):
-        queryset = Notification.objects.all()
+        queryset = _visible_notifications(self.request)
         read = self.request.query_params.get('read', None)
         if read is not None:
             queryset = queryset.filter(read=read.lower() == 'true')
@@ -121,37 +427,92 @@ class NotificationListCreateView(generics.ListCreateAPIView):
 
 
 class NotificationDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
 
+    def get_queryset(self):
+        return _visible_notifications(self.request)
+
 
 @api_view(['POST'])
 def mark_notification_read(request, notification_id):
     """Marca uma notificação como lida"""
-    try:
-        notification = Notification.objects.get(id=notification_id)
-        notification.read = True
-        notification.save()
-        return Response({'success': True, 'message': 'Notificação marcada como lida'})
-    except Notification.DoesNotExist:
+    # UPDATE direto: não precisa carregar a linha inteira para alterar um campo
+    updated = _visible_notifications(request).filter(id=notification_id).update(read=True)
+    if not updated:
         return Response({'error': 'Notificação não encontrada'}, status=status.HTTP_404_NOT_FOUND)
+    invalidate_notifications()
+    return Response({'success': True, 'message': 'Notificação marcada como lida'})
 
 
 @api_view(['POST'])
 def mark_all_notifications_read(request):
     """Marca todas as notificações como lidas"""
-    Notification.objects.filter(read=False).update(read=True)
-    return Response({'success': True, 'message': 'Todas as notificações foram marcadas como lidas'})
+    affected = _visible_notifications(request).filter(read=False).update(read=True)
+    invalidate_notifications()
+    return Response({
+        'success': True,
+        'message': 'Todas as notificações foram marcadas como lidas',
+        'affected': affected,
+    })
+
+
+@api_view(['POST'])
+def batch_update_notifications(request):
+    """
+    Altera várias notificações com um único UPDATE/DELETE.
+
+    Corpo:
+        action: 'mark_read' (padrão), 'mark_unread' ou 'delete'
+        ids: lista de IDs (até 1000)
+        filter: alternativa aos IDs - notification_type, product, read, before (data/hora)
+    """
+    serializer = NotificationBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+
+    queryset = _visible_notifications(request)
+    if 'ids' in data:
+        queryset = queryset.filter(id__in=data['ids'])
+    filters_data = data.get('filter', {})
+    if 'notification_type' in filters_data:
+        queryset = queryset.filter(notification_type=filters_data['notification_type'])
+    if 'product' in filters_data:
+        queryset = queryset.filter(product_id=filters_data['product'])
+    if filters_data.get('read') is not None:
+        queryset = queryset.filter(read=filters_data['read'])
+    if 'before' in filters_data:
+        queryset = queryset.filter(created_at__lt=filters_data['before'])
+
+    action = data['action']
+    if action == 'delete':
+        affected, _ = queryset.delete()
+    else:
+        read = action == 'mark_read'
+        # Só altera as linhas que realmente mudam
+        affected = queryset.exclude(read=read).update(read=read)
+    invalidate_notifications()
+
+    return Response({'success': True, 'action': action, 'affected': affected})
+
+
+@api_view(['GET'])
+def unread_notifications_count(request):
+    """Retorna o total de notificações não lidas (em cache até a próxima alteração)"""
+    return Response({'unread': get_unread_notification_count(_visible_notifications(request), request.user)})
 
 
 # Views para Push Subscriptions
 class PushSubscriptionListCreateView(generics.ListCreateAPIView):
     serializer_class = PushSubscriptionSerializer
-    queryset = PushSubscription.objects.filter(active=True)
+
+    def get_queryset(self):
+        return _visible_push_subscriptions(self.request)
     
     def perform_create(self, serializer):
-        # Salva a subscription
-        serializer.save()
+        # Salva a subscription vinculada ao usuário logado (se houver),
+        # para que o push por usuário alcance seus dispositivos
+        user = self.request.user if self.request.user.is_authenticated else None
+        serializer.save(user=user)
 
 
 @api_view(['POST'])
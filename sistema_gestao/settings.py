@@ -50,6 +50,8 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Para servir arquivos estáticos
+    'core.middleware.CompressionMiddleware',  # gzip/brotli das respostas da API
+    'core.middleware.ReplicaReadMiddleware',  # Leituras da API na réplica do banco
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -101,9 +103,21 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Réplica de leitura (core.db_router). Em desenvolvimento, uma segunda
+    # conexão SQLite com o mesmo arquivo faz o papel da réplica; nos testes
+    # ela é um segundo banco SQLite, separado e sem migrations (os testes do
+    # roteamento criam as tabelas que usam, ver core.tests).
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DATABASE_REPLICA_PATH', BASE_DIR / 'db.sqlite3'),
+    },
 }
 
+# Leituras das listas, do dashboard e das varreduras das tasks vão para a
+# réplica; gravações e leituras logo depois de gravar ficam no primário.
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -188,24 +202,113 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    # JSON com orjson quando instalado (mesmos valores do padrão, ver core.fast_json)
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'core.fast_json.ORJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
+        'core.fast_json.ORJSONParser',
     ],
 }
 
+# Cache-Control das listagens/detalhes do catálogo (core.http_cache): por quantos
+# segundos navegador/CDN podem reutilizar a resposta sem revalidar (ETag/304).
+API_CACHE_MAX_AGE = int(os.environ.get('API_CACHE_MAX_AGE', '0'))
+
+# Alterações de produto (PUT/PATCH/DELETE e /adjust/) sem If-Match: com True,
+# respondem 428 em vez de sobrescrever sem conferir a versão (core.http_cache).
+API_REQUIRE_IF_MATCH = os.environ.get('API_REQUIRE_IF_MATCH', 'False').lower() == 'true'
+
+# Leitores de código de barras (core.barcode_cache): quantos códigos cada processo
+# guarda em memória (LRU) para resolver SKU -> produto sem consultar o índice.
+BARCODE_CACHE_SIZE = int(os.environ.get('BARCODE_CACHE_SIZE', '10000'))
+
+# Nível de reposição padrão (core.reorder): estoque baixo = menos que isso, para
+# produtos sem nível próprio cuja categoria também não define um.
+DEFAULT_REORDER_LEVEL = int(os.environ.get('DEFAULT_REORDER_LEVEL', '10'))
+
+# Previsões de estoque (core.forecast): consumo médio dos últimos
+# FORECAST_WINDOW_DAYS dias; /api/products/at-risk/ lista por padrão as
+# rupturas previstas para os próximos FORECAST_HORIZON_DAYS dias.
+FORECAST_WINDOW_DAYS = int(os.environ.get('FORECAST_WINDOW_DAYS', '28'))
+FORECAST_HORIZON_DAYS = int(os.environ.get('FORECAST_HORIZON_DAYS', '14'))
+
+# Feed de alterações do PWA (core.changes): por quantos dias as exclusões de
+# produtos ficam registradas. Clientes parados há mais tempo baixam tudo de novo.
+CHANGES_TOMBSTONE_DAYS = int(os.environ.get('CHANGES_TOMBSTONE_DAYS', '30'))
+# Atraso (segundos) do feed: só entram alterações mais antigas que isso, para que
+# uma transação longa (importação do admin, generate_catalog) termine o COMMIT
+# antes de o cursor passar por ela. Aumente se as importações demorarem mais.
+CHANGES_SETTLE_SECONDS = int(os.environ.get('CHANGES_SETTLE_SECONDS', '120'))
+
+# Compressão das respostas da API (core.middleware.CompressionMiddleware):
+# brotli (se instalado) ou gzip, a partir de COMPRESSION_MIN_SIZE bytes.
+COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'True').lower() == 'true'
+COMPRESSION_PATHS = ('/api/',)
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '4'))
+
+# Rotas cujas leituras (GET/HEAD/OPTIONS) usam a réplica (core.middleware.ReplicaReadMiddleware).
+# Depois de uma gravação, o cliente lê do primário por REPLICA_PIN_SECONDS segundos.
+REPLICA_READ_PATHS = (
+    '/api/products/',
+    '/api/categories/',
+    '/api/brands/',
+    '/api/dashboard/',
+    '/api/async/',
+)
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', '5'))
+
+# Redis (opcional): broker do django-q e cache compartilhado entre processos.
+# Sem REDIS_URL, a fila usa o banco (ORM) e o cache fica na memória de cada processo.
+REDIS_URL = os.environ.get('REDIS_URL', '')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'stock',
+            'TIMEOUT': 300,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'stock-system',
+        }
+    }
+
+# Workers do qcluster: padrão de 2 com Redis e 1 com o broker ORM (que consulta o
+# banco periodicamente). Não usa os.cpu_count(): em contêiner ele informa as CPUs
+# do host, não o limite do serviço. Aumente com Q_WORKERS se houver memória.
 Q_CLUSTER = {
     'name': 'stock_notifications',
-    'workers': 1,  # Número de processos que rodam as tarefas
+    'workers': int(os.environ.get('Q_WORKERS', 2 if REDIS_URL else 1)),  # Número de processos que rodam as tarefas
     'timeout': 180, # Tempo máximo (segundos) que uma tarefa pode rodar (aumentado para 180s)
-    'retry': 120,  # Tempo (segundos) para tentar novamente se falhar
+    'retry': 240,  # Tempo (segundos) para tentar novamente se falhar (deve ser maior que o timeout)
     'queue_limit': 50,
     'bulk': 10,
     'orm': 'default', # Usar o banco de dados padrão do Django
 }
 
+if REDIS_URL:
+    # Fila e agendamentos no Redis, sem polling no banco principal
+    Q_CLUSTER.pop('orm')
+    Q_CLUSTER['redis'] = REDIS_URL
+
+# Tasks de alerta em lotes (map/reduce): com ALERT_TASK_CHUNK_SIZE > 0 e um catálogo
+# maior que isso, o catálogo é dividido em faixas de ID processadas em paralelo pelos
+# workers, e um único resumo (e-mail/push/desktop) é enviado ao final. 0 desativa.
+ALERT_TASK_CHUNK_SIZE = int(os.environ.get('ALERT_TASK_CHUNK_SIZE', '0'))
+
+# Q_SYNC=true executa as tasks na hora, no próprio processo, sem broker nem qcluster
+# (substituto local para testes e desenvolvimento)
+if os.environ.get('Q_SYNC', 'False').lower() == 'true':
+    Q_CLUSTER['sync'] = True
+
 # Configuração para agendamento de tarefas
 # O django_q2 permite criar schedules através do admin ou via código
 # Adicione a task check_expiring_products_and_notify no admin em django_q2 > Schedule
@@ -240,6 +343,10 @@ else:
     # Configure aqui seus e-mails para receber notificações
     NOTIFICATION_EMAILS = ['msbonfim01@gmail.com']  # Adicione seus e-mails aqui
 
+# Notificações por usuário: cada usuário da equipe (is_staff) recebe suas próprias
+# notificações e push apenas nos seus dispositivos. Desativado = uma notificação para todos.
+NOTIFICATION_PER_USER = os.environ.get('NOTIFICATION_PER_USER', 'False').lower() == 'true'
+
 # Configurações VAPID para Push Notifications
 # Para gerar as chaves VAPID, execute: python gerar_chaves_vapid.py
 # Ou use um serviço como OneSignal, Firebase Cloud Messaging
@@ -3,6 +3,7 @@ Django settings for sistema_gestao project - Production settings for Render.com
 """
 
 import os
+import warnings
 import dj_database_url
 from pathlib import Path
 
@@ -37,6 +38,8 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Para servir arquivos estáticos
+    'core.middleware.CompressionMiddleware',  # gzip/brotli das respostas da API
+    'core.middleware.ReplicaReadMiddleware',  # Leituras da API na réplica do banco
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,12 +80,69 @@ X_FRAME_OPTIONS = 'SAMEORIGIN'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': dj_database_url.parse(
-        os.environ.get('DATABASE_URL', 'sqlite:///db.sqlite3')
+# Conexões com o banco
+# Sem configuração o Django abre uma conexão PostgreSQL nova a cada requisição.
+# - DB_CONN_MAX_AGE: segundos que uma conexão persistente é reaproveitada (padrão: 600)
+# - DB_POOL_ENABLED: usa o pool nativo do Django (5.1+ com psycopg 3). O pool é
+#   compartilhado por todas as threads do processo (gunicorn e cada worker do qcluster).
+#   Com o Django 4.2 de requirements.txt o pool não existe: a opção é ignorada
+#   (com um aviso no log) e valem as conexões persistentes.
+# Dimensionamento: (workers do gunicorn + workers do Q_CLUSTER + 1 do monitor do qcluster)
+# x DB_POOL_MAX_SIZE deve ficar abaixo do limite de conexões do banco gerenciado.
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '600'))
+DB_POOL_ENABLED = os.environ.get('DB_POOL_ENABLED', 'False').lower() == 'true'
+DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', '1'))
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', '10'))  # Espera máxima por uma conexão livre
+DB_POOL_MAX_IDLE = int(os.environ.get('DB_POOL_MAX_IDLE', '300'))  # Fecha conexões ociosas além do min_size
+
+
+def database_config(url):
+    """Monta a configuração de um banco com conexões persistentes ou pool"""
+    config = dj_database_url.parse(
+        url,
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=True,  # Testa a conexão persistente antes de reutilizá-la
     )
+    if DB_POOL_ENABLED and config['ENGINE'] == 'django.db.backends.postgresql':
+        try:
+            import django
+            from psycopg_pool import ConnectionPool
+            if django.VERSION >= (5, 1):
+                # O pool gerencia o ciclo de vida das conexões; o Django exige CONN_MAX_AGE = 0
+                config['CONN_MAX_AGE'] = 0
+                config['CONN_HEALTH_CHECKS'] = False
+                config.setdefault('OPTIONS', {})['pool'] = {
+                    'min_size': DB_POOL_MIN_SIZE,
+                    'max_size': DB_POOL_MAX_SIZE,
+                    'timeout': DB_POOL_TIMEOUT,
+                    'max_idle': DB_POOL_MAX_IDLE,
+                    'check': ConnectionPool.check_connection,  # Health check ao retirar do pool
+                }
+            else:
+                warnings.warn("DB_POOL_ENABLED ignorado: o pool de conexões exige Django 5.1+; usando conexões persistentes.")
+        except ImportError:
+            # Sem psycopg_pool: mantém conexões persistentes com health check
+            warnings.warn("DB_POOL_ENABLED ignorado: psycopg_pool não instalado; usando conexões persistentes.")
+    return config
+
+
+DATABASES = {
+    'default': database_config(os.environ.get('DATABASE_URL', 'sqlite:///db.sqlite3'))
 }
 
+# Réplica de leitura (opcional): com DATABASE_REPLICA_URL, as leituras das
+# listas, do dashboard e das varreduras das tasks vão para ela (core.db_router);
+# gravações e leituras logo depois de gravar ficam no primário.
+DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = {
+        **database_config(DATABASE_REPLICA_URL),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -159,25 +219,110 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    # JSON com orjson quando instalado (mesmos valores do padrão, ver core.fast_json)
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'core.fast_json.ORJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
+        'core.fast_json.ORJSONParser',
     ],
 }
 
+# Cache-Control das listagens/detalhes do catálogo (core.http_cache): por quantos
+# segundos navegador/CDN podem reutilizar a resposta sem revalidar (ETag/304).
+API_CACHE_MAX_AGE = int(os.environ.get('API_CACHE_MAX_AGE', '0'))
+
+# Alterações de produto (PUT/PATCH/DELETE e /adjust/) sem If-Match: com True,
+# respondem 428 em vez de sobrescrever sem conferir a versão (core.http_cache).
+API_REQUIRE_IF_MATCH = os.environ.get('API_REQUIRE_IF_MATCH', 'False').lower() == 'true'
+
+# Leitores de código de barras (core.barcode_cache): quantos códigos cada processo
+# guarda em memória (LRU) para resolver SKU -> produto sem consultar o índice.
+BARCODE_CACHE_SIZE = int(os.environ.get('BARCODE_CACHE_SIZE', '10000'))
+
+# Nível de reposição padrão (core.reorder): estoque baixo = menos que isso, para
+# produtos sem nível próprio cuja categoria também não define um.
+DEFAULT_REORDER_LEVEL = int(os.environ.get('DEFAULT_REORDER_LEVEL', '10'))
+
+# Previsões de estoque (core.forecast): consumo médio dos últimos
+# FORECAST_WINDOW_DAYS dias; /api/products/at-risk/ lista por padrão as
+# rupturas previstas para os próximos FORECAST_HORIZON_DAYS dias.
+FORECAST_WINDOW_DAYS = int(os.environ.get('FORECAST_WINDOW_DAYS', '28'))
+FORECAST_HORIZON_DAYS = int(os.environ.get('FORECAST_HORIZON_DAYS', '14'))
+
+# Feed de alterações do PWA (core.changes): por quantos dias as exclusões de
+# produtos ficam registradas. Clientes parados há mais tempo baixam tudo de novo.
+CHANGES_TOMBSTONE_DAYS = int(os.environ.get('CHANGES_TOMBSTONE_DAYS', '30'))
+# Atraso (segundos) do feed: só entram alterações mais antigas que isso, para que
+# uma transação longa (importação do admin, generate_catalog) termine o COMMIT
+# antes de o cursor passar por ela. Aumente se as importações demorarem mais.
+CHANGES_SETTLE_SECONDS = int(os.environ.get('CHANGES_SETTLE_SECONDS', '120'))
+
+# Compressão das respostas da API (core.middleware.CompressionMiddleware):
+# brotli (se instalado) ou gzip, a partir de COMPRESSION_MIN_SIZE bytes.
+COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'True').lower() == 'true'
+COMPRESSION_PATHS = ('/api/',)
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '4'))
+
+# Rotas cujas leituras (GET/HEAD/OPTIONS) usam a réplica (core.middleware.ReplicaReadMiddleware).
+# Depois de uma gravação, o cliente lê do primário por REPLICA_PIN_SECONDS segundos.
+REPLICA_READ_PATHS = (
+    '/api/products/',
+    '/api/categories/',
+    '/api/brands/',
+    '/api/dashboard/',
+    '/api/async/',
+)
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', '5'))
+
+# Redis (opcional): broker do django-q e cache compartilhado entre processos.
+# Sem REDIS_URL, a fila usa o banco (ORM) e o cache fica na memória de cada processo.
+REDIS_URL = os.environ.get('REDIS_URL', '')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'stock',
+            'TIMEOUT': 300,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'stock-system',
+        }
+    }
+
 # django-q2 Configuration
+# Workers: padrão de 2 com Redis e 1 com o broker ORM (que consulta o banco
+# periodicamente). Não usa os.cpu_count(): no Render ele informa as CPUs do host,
+# não o limite do plano, e tanto o serviço web quanto o worker rodam um cluster.
+# Aumente com Q_WORKERS se o plano tiver memória e conexões de banco sobrando.
 Q_CLUSTER = {
     'name': 'stock_notifications_prod',
-    'workers': 1,
+    'workers': int(os.environ.get('Q_WORKERS', 2 if REDIS_URL else 1)),
     'timeout': 180,  # Aumentado para 180s (3 minutos) para dar tempo ao envio de email
-    'retry': 120,
+    'retry': 240,  # Deve ser maior que o timeout, senão a task é reenfileirada ainda em execução
     'queue_limit': 50,
     'bulk': 10,
     'orm': 'default',
 }
 
+if REDIS_URL:
+    # Fila e agendamentos no Redis, sem polling no banco principal
+    Q_CLUSTER.pop('orm')
+    Q_CLUSTER['redis'] = REDIS_URL
+
+# Tasks de alerta em lotes (map/reduce): com ALERT_TASK_CHUNK_SIZE > 0 e um catálogo
+# maior que isso, o catálogo é dividido em faixas de ID processadas em paralelo pelos
+# workers, e um único resumo (e-mail/push/desktop) é enviado ao final. 0 desativa.
+ALERT_TASK_CHUNK_SIZE = int(os.environ.get('ALERT_TASK_CHUNK_SIZE', '0'))
+
 # Configuração de E-mail (Produção)
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
@@ -243,6 +388,10 @@ if notification_emails_env:
 else:
     NOTIFICATION_EMAILS = []
 
+# Notificações por usuário: cada usuário da equipe (is_staff) recebe suas próprias
+# notificações e push apenas nos seus dispositivos. Desativado = uma notificação para todos.
+NOTIFICATION_PER_USER = os.environ.get('NOTIFICATION_PER_USER', 'False').lower() == 'true'
+
 # Configurações VAPID para Push Notifications
 VAPID_PRIVATE_KEY = os.environ.get('VAPID_PRIVATE_KEY', '')
 VAPID_CLAIMS = {
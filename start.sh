@@ -1,30 +1,11 @@
 #!/bin/bash
-# start.sh - Inicia Django (Gunicorn) e QCluster juntos no mesmo processo
+# start.sh - Inicia Django (Gunicorn) e QCluster supervisionados pelo comando run_services
+# - Workers/threads do Gunicorn: WEB_CONCURRENCY / WEB_THREADS (padrão: 2 workers x 4 threads)
+# - ASGI_ENABLED=true: serve asgi.py com workers uvicorn (views assíncronas em /api/async/)
+# - RUN_QCLUSTER=false: não inicia o QCluster (quando ele roda em um serviço separado)
+# - O QCluster é reiniciado automaticamente se cair, e o SIGTERM da plataforma
+#   é repassado aos dois processos para terminarem o trabalho em andamento
 set -e
 
 echo "🚀 Iniciando serviços..."
-
-# Inicia QCluster em background
-echo "📅 Iniciando QCluster..."
-python manage.py qcluster &
-QCLUSTER_PID=$!
-
-# Aguarda um pouco para QCluster iniciar
-sleep 2
-
-# Verifica se QCluster está rodando
-if ! kill -0 $QCLUSTER_PID 2>/dev/null; then
-    echo "❌ Erro ao iniciar QCluster"
-    exit 1
-fi
-
-echo "✅ QCluster iniciado (PID: $QCLUSTER_PID)"
-
-# Inicia Gunicorn (web server) - usa exec para substituir o processo atual
-echo "🌐 Iniciando Gunicorn..."
-exec gunicorn sistema_gestao.wsgi:application --bind 0.0.0.0:$PORT
-
-# Quando Gunicorn parar, mata o QCluster também (não deve chegar aqui devido ao exec)
-echo "🛑 Encerrando QCluster..."
-kill $QCLUSTER_PID 2>/dev/null || true
-
+exec python manage.py run_services --bind 0.0.0.0:$PORT